@@ -1,23 +1,46 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import uuid
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from datetime import date, datetime, timedelta
-from typing import Optional
+from typing import Optional, Literal, Annotated
+from contextlib import asynccontextmanager
 import re
 import json
 import os
 from dotenv import load_dotenv
 
 from ..LLM_Model import llm_config as llm
+from ..LLM_Model import llm_client
 from ..LLM_Model import chatbot as cb
 from ..LLM_Model import agents as agt
 from ..LLM_Model import validate_maintenance as mval
+from ..LLM_Model import snapshot_store
 from ..Model import equipments as eq
 from ..Embedd import vecor_embedd as embedd
 from ..Embedd import vector_query as vector
+from ..Embedd import embedding_cache
+from ..Embedd import embedding_batcher
+from ..Observability import metrics
+from ..Observability import service_metrics
+from ..Observability import profiling
+from ..Observability import tracing
 
 load_dotenv()
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the vector index before the first chat turn needs it
+    try:
+        vector.retriever.current()
+    except Exception as e:
+        print(f"Vector index not loaded at startup: {e}")
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +50,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ============ METRICS ============
+app.middleware("http")(service_metrics.metrics_middleware)
+app.middleware("http")(profiling.profiling_middleware)
+app.middleware("http")(tracing.tracing_middleware)
+service_metrics.register_pool("equipments", eq.engine)
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    if request.url.path == "/monitoring/add":
+        service_metrics.record_ingest_reject("validation")
+    return await request_validation_exception_handler(request, exc)
+
 class EquipmentBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=100, description="Equipment name")
     manufacturer: str = Field(..., min_length=1, max_length=100, description="Manufacturer name")
@@ -63,12 +98,52 @@ def root():
     }
 
 @app.post("/response", tags=["AI_Analysis"])
-def response(input : str):
+async def response(input : str, session_id: Optional[str] = Query(None, max_length=64)):
     user_prompt = input
-    out_res = cb.chat_model(user_prompt)
+    session_id = session_id or uuid.uuid4().hex
+    try:
+        out_res = await cb.achat_model(user_prompt, session_id)
+    except llm_client.LLMUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except llm_client.LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     
     return {
-        "message": out_res
+        "message": out_res,
+        "session_id": session_id
+    }
+
+@app.post("/response/stream", tags=["AI_Analysis"])
+def response_stream(input : str, session_id: Optional[str] = Query(None, max_length=64), format: Literal["ndjson", "sse"] = "ndjson"):
+    """Stream node progress and LLM tokens as NDJSON lines or Server-Sent Events"""
+    session_id = session_id or uuid.uuid4().hex
+    events = cb.chat_model_stream(input, session_id)
+    
+    if format == "sse":
+        body = (f"event: {event['type']}\ndata: {json.dumps(event)}\n\n" for event in events)
+        media_type = "text/event-stream"
+    else:
+        body = (json.dumps(event) + "\n" for event in events)
+        media_type = "application/x-ndjson"
+    
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # Keep reverse proxies from buffering the stream
+        "X-Session-Id": session_id
+    })
+
+@app.delete("/response/session/{session_id}", tags=["AI_Analysis"])
+def end_chat_session(session_id: str):
+    cb.conversation_store.get_store().delete(session_id)
+    return {
+        "message": "Session cleared",
+        "session_id": session_id
+    }
+
+@app.get("/response/sessions/stats", tags=["Agent Monitoring"])
+def chat_session_stats():
+    return {
+        "stats": cb.conversation_store.get_store().stats()
     }
     
 @app.get("/equipments/list_all", tags=["Equipments"])
@@ -92,6 +167,27 @@ def fetch_all_equipments():
         "equipments": equipments_list
     }
 
+@app.get("/equipments/snapshots", tags=["Equipments"])
+def fetch_equipment_snapshots(serial: Optional[str] = None, attention_only: bool = False, include_text: bool = False):
+    """Precomputed status per equipment: latest readings, breach flags and recent maintenance"""
+    if serial:
+        snapshot = snapshot_store.get(serial)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail=f"Equipment {serial} not found")
+        snapshots = [snapshot]
+    else:
+        snapshots = snapshot_store.snapshots()
+    
+    if attention_only:
+        snapshots = [s for s in snapshots if s["attention"]]
+    if not include_text:
+        snapshots = [{k: v for k, v in s.items() if k not in ("detail_text", "monitoring_text")} for s in snapshots]
+    
+    return {
+        "snapshots": snapshots,
+        "store": snapshot_store.store.describe()
+    }
+
 @app.patch("/equipments/update_status/{serial_number}", tags=["Equipments"])
 def update_equipment_status(serial_number: str, status: Optional[str], maintenance_status:Optional[str]):
     try:
@@ -198,12 +294,13 @@ def add_monitoring_logs(monitoring: MonitoringLogsBase):
             monitoring.threshold_min,
             monitoring.threshold_max
         )
-        
+        service_metrics.record_ingest()
         
         return {
             "message": "Monitoring data added successfully"
         }
     except Exception as e:
+        service_metrics.record_ingest_reject("db_error")
         raise HTTPException(status_code=500, detail=str(e))
     
 @app.get("/maintenance/logs", tags=["Maintenance"])
@@ -897,7 +994,7 @@ def add_maintenance_log(log: MaintenanceLogBase):
     
     try:
         print("hi: ", log.date_predicted)
-        eq.insert_maintenance_log(
+        log_id = eq.insert_maintenance_log(
             log.raised_by,
             log.equipment_serial,
             log.issue_description,
@@ -907,7 +1004,8 @@ def add_maintenance_log(log: MaintenanceLogBase):
         )
         
         return {
-            "message": "Maintenance log added successfully"
+            "message": "Maintenance log added successfully",
+            "id": log_id
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -915,9 +1013,9 @@ def add_maintenance_log(log: MaintenanceLogBase):
 # Agentic Mamla
 
 @app.get("/ai_analysis", tags=["AI_Analysis"])
-def trigger_ai_analysis():
+def trigger_ai_analysis(incremental: bool = False):
     
-    response = agt.execute_maintenance_workflow()
+    response = agt.execute_maintenance_workflow(incremental=incremental)
     
     
     return {
@@ -936,6 +1034,67 @@ def trigger_ai_validation():
         "status": response
     }
 
+@app.get("/metrics", tags=["Agent Monitoring"], response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+# ============ PROFILING ============
+def require_profiling(request: Request):
+    if not profiling.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling.is_authorized(profiling.request_token(request)):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+@app.get("/debug/profiles", tags=["Debug"])
+def list_profiles(request: Request):
+    require_profiling(request)
+    return {
+        "profiles": profiling.list_profiles()
+    }
+
+@app.get("/debug/profiles/{profile_id}", tags=["Debug"], response_class=PlainTextResponse)
+def fetch_profile(profile_id: str, request: Request):
+    require_profiling(request)
+    profile = profiling.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile["collapsed"])
+
+@app.get("/debug/tracemalloc", tags=["Debug"])
+def tracemalloc_snapshot(request: Request, action: str = "diff", top: int = 20, frames: int = 1):
+    require_profiling(request)
+    if action not in ("start", "snapshot", "diff", "top", "stop"):
+        raise HTTPException(status_code=400, detail="action must be one of start, snapshot, diff, top, stop")
+    return profiling.tracemalloc_action(action, top=top, frames=frames)
+
+# ============ TRACING ============
+# Span attributes carry exception text and request details: same admin gate as the profiles
+@app.get("/debug/traces", tags=["Debug"])
+def list_traces(request: Request, limit: int = 50):
+    require_profiling(request)
+    return {
+        "traces": tracing.memory_exporter.list_traces(limit)
+    }
+
+@app.get("/debug/traces/{trace_id}", tags=["Debug"])
+def fetch_trace(trace_id: str, request: Request):
+    require_profiling(request)
+    spans = tracing.waterfall(trace_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return {
+        "trace_id": trace_id,
+        "spans": spans
+    }
+
+@app.get("/llm/metrics", tags=["Agent Monitoring"])
+def llm_metrics():
+    
+    return {
+        "message": "LLM call layer metrics",
+        "metrics": llm_client.client_metrics()
+    }
+
 @app.get("/testing/agentlist", tags=["Agent Monitoring"])
 def list_out_agents():
     
@@ -967,6 +1126,7 @@ def embedd_safety_docs():
     
     try:
         embedd.save_vectors()
+        vector.retriever.reload()  # Other workers pick the new files up on their next check
         
         return{
             "response":"vector embedded created"
@@ -986,6 +1146,18 @@ def retrieve(input:str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+@app.get("/retrieve_chunks/index", tags=["Embedds"])
+def vector_index_status():
+    
+    return {
+        "message": "Vector index served to queries",
+        "index": vector.retriever.describe(),
+        "embeddings": {
+            "cache": embedding_cache.cache.describe(),
+            "batcher": embedding_batcher.batcher.describe()
+        }
+    }
+
 class ChunkInput(BaseModel):
     input: str = Field(..., min_length=1, description="User Input")
     
@@ -1001,4 +1173,26 @@ def retrieve_chunk(user_input:ChunkInput):
         }
     
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+class BatchChunkInput(BaseModel):
+    queries: list[Annotated[str, Field(min_length=1)]] = Field(..., min_length=1, max_length=1000, description="User inputs, one result list each")
+    top_k: int = Field(3, ge=1, le=20, description="Chunks per query")
+    threshold: Optional[float] = Field(None, ge=0, le=1, description="Minimum cosine similarity of a returned chunk")
+
+
+@app.post("/retrieve_chunks/batch", tags=["Embedds"])
+def retrieve_chunks_batch(batch_input: BatchChunkInput):
+    try:
+        
+        results = vector.search_queries(batch_input.queries, top_k=batch_input.top_k, threshold=batch_input.threshold)
+        
+        return {
+            "results": [
+                {"query": query, "chunks": chunks}
+                for query, chunks in zip(batch_input.queries, results)
+            ]
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -6,10 +6,17 @@ from langchain_openai import AzureOpenAIEmbeddings
 
 load_dotenv()
 
-embedding_model = AzureOpenAIEmbeddings(
-    model=os.getenv("EMBEDD_MODEL"),
-    dimensions=os.getenv("EMBEDD_DIMENSIONS"),
-    api_version=os.getenv("EMBEDD_VERSION"),
-    azure_endpoint=os.getenv("EMBED_ENDPOINT"),
-    api_key=os.getenv("EMBED_KEY")
-)
\ No newline at end of file
+# EMBEDD_BACKEND: "azure" (default, needs EMBED_ENDPOINT/EMBED_KEY) or "stub" (offline, see embedd_stub.py)
+EMBEDD_BACKEND = os.getenv("EMBEDD_BACKEND", "azure")
+
+if EMBEDD_BACKEND == "stub":
+    from ..Embedd.embedd_stub import StubEmbeddings
+    embedding_model = StubEmbeddings.from_env()
+else:
+    embedding_model = AzureOpenAIEmbeddings(
+        model=os.getenv("EMBEDD_MODEL"),
+        dimensions=os.getenv("EMBEDD_DIMENSIONS"),
+        api_version=os.getenv("EMBEDD_VERSION"),
+        azure_endpoint=os.getenv("EMBED_ENDPOINT"),
+        api_key=os.getenv("EMBED_KEY")
+    )
\ No newline at end of file
@@ -0,0 +1,62 @@
+import hashlib
+import os
+import threading
+import time
+from typing import List
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+
+# ============ STUB EMBEDDINGS ============
+class StubEmbeddings(Embeddings):
+    """Offline embedding model: deterministic unit vectors per text, a fixed per-request latency plus a
+    per-text cost, and an optional cap on concurrent requests like a provider's rate limit"""
+
+    def __init__(self, dimensions: int = 1536, latency_ms: float = 80.0, ms_per_text: float = 0.2, max_concurrency: int = 0):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+        self.ms_per_text = ms_per_text
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "texts": 0, "latency_s": 0.0}
+
+    @classmethod
+    def from_env(cls) -> "StubEmbeddings":
+        """Build the stub from STUB_EMBEDD_* environment variables"""
+        return cls(
+            dimensions=int(os.getenv("EMBEDD_DIMENSIONS") or 1536),
+            latency_ms=float(os.getenv("STUB_EMBEDD_LATENCY_MS", "80")),
+            ms_per_text=float(os.getenv("STUB_EMBEDD_MS_PER_TEXT", "0.2")),
+            max_concurrency=int(os.getenv("STUB_EMBEDD_MAX_CONCURRENCY", "0")),
+        )
+
+    def vector(self, text: str) -> List[float]:
+        """Same text, same vector"""
+        seed = int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+        values = np.random.default_rng(seed).standard_normal(self.dimensions)
+        return (values / np.linalg.norm(values)).tolist()
+
+    def _request(self, texts: List[str]) -> List[List[float]]:
+        delay = (self.latency_ms + self.ms_per_text * len(texts)) / 1000
+        if self._slots is not None:
+            self._slots.acquire()
+        try:
+            time.sleep(delay)
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["texts"] += len(texts)
+            self.stats["latency_s"] += delay
+        return [self.vector(text) for text in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._request(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._request([text])[0]
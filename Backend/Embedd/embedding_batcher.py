@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from ..Embedd import embedd_config as embedd
+from ..Observability.service_metrics import timed_embedding
+
+load_dotenv()
+
+# ============ CONFIG ============
+EMBED_BATCH_ENABLED = os.getenv("EMBED_BATCH_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "64"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))          # how long the first request waits for company
+EMBED_BATCH_MAX_INFLIGHT = int(os.getenv("EMBED_BATCH_MAX_INFLIGHT", "4"))  # concurrent batch requests to the provider
+EMBED_BATCH_TIMEOUT_S = float(os.getenv("EMBED_BATCH_TIMEOUT_S", "60"))       # longest a caller waits for its vector
+
+
+# ============ BATCHER ============
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding requests into embed_documents batches.
+    With nothing in flight a request is sent at once; otherwise a batch closes when it is full or
+    EMBED_BATCH_WAIT_MS after its first request. While the provider is busy with EMBED_BATCH_MAX_INFLIGHT
+    batches, requests keep queueing and the next batch grows"""
+
+    def __init__(self, embed_batch, max_size: int = None, wait_ms: float = None, max_inflight: int = None, timeout_s: float = None):
+        self._embed_batch = embed_batch
+        self.timeout_s = EMBED_BATCH_TIMEOUT_S if timeout_s is None else timeout_s
+        self.max_size = max_size or EMBED_BATCH_MAX_SIZE
+        self.wait_s = (EMBED_BATCH_WAIT_MS if wait_ms is None else wait_ms) / 1000
+        max_inflight = max_inflight or EMBED_BATCH_MAX_INFLIGHT
+        self._queue = deque()  # (text, future, enqueued)
+        self._cond = threading.Condition()
+        self._inflight = threading.BoundedSemaphore(max_inflight)
+        self._pool = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="embed-batch")
+        self._thread = None
+        self._busy = 0  # batches sent and not yet answered
+        self.stats = {"requests": 0, "batches": 0, "texts_sent": 0, "largest_batch": 0, "failed_batches": 0}
+
+    def embed(self, text: str):
+        """Vector for one text; blocks until the batch it joined comes back, at most timeout_s.
+        Raises the provider's error, or TimeoutError"""
+        future = Future()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._thread.start()
+            self._queue.append((text, future, time.monotonic()))
+            self.stats["requests"] += 1
+            self._cond.notify()
+        return future.result(timeout=self.timeout_s)
+
+    def _next_batch(self) -> list:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            # A lone caller on an idle provider has nobody to wait for
+            deadline = self._queue[0][2] + (self.wait_s if self._busy else 0)
+            while len(self._queue) < self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            self._busy += 1
+            return [self._queue.popleft() for _ in range(min(self.max_size, len(self._queue)))]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            self._inflight.acquire()  # Provider busy: later requests pile up into a bigger batch meanwhile
+            self._pool.submit(self._send, batch)
+
+    def _send(self, batch: list):
+        texts = list(dict.fromkeys(text for text, _, _ in batch))  # Identical concurrent texts embedded once
+        try:
+            vectors = self._embed_batch(texts)
+            if len(vectors) != len(texts):
+                raise RuntimeError(f"Embedding provider returned {len(vectors)} vectors for {len(texts)} texts")
+            by_text = dict(zip(texts, vectors))
+            with self._cond:
+                self.stats["batches"] += 1
+                self.stats["texts_sent"] += len(texts)
+                self.stats["largest_batch"] = max(self.stats["largest_batch"], len(texts))
+            for text, future, _ in batch:
+                future.set_result(by_text[text])
+        except Exception as e:
+            with self._cond:
+                self.stats["failed_batches"] += 1
+            # Every caller of the batch gets the error; none is left waiting
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._inflight.release()
+            with self._cond:
+                self._busy -= 1
+
+    def describe(self) -> dict:
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "mean_batch": round(self.stats["texts_sent"] / self.stats["batches"], 2) if self.stats["batches"] else 0.0,
+                **self.stats
+            }
+
+
+# ============ PROCESS-WIDE BATCHER ============
+@timed_embedding("batch")
+def embed_batch(texts: list) -> list:
+    return embedd.embedding_model.embed_documents(texts)
+
+batcher = EmbeddingBatcher(embed_batch)
+
+
+# ============ BENCHMARK ============
+def benchmark_batcher(callers: int = 64, rounds: int = 4, latency_ms: float = 80, provider_concurrency: int = 8, wait_ms: float = None) -> dict:
+    """Concurrent callers each embedding distinct texts against the offline stub (fixed latency, capped
+    provider concurrency): one embed_query per text vs coalesced batches"""
+    from ..Embedd.embedd_stub import StubEmbeddings
+
+    def run(embed_one) -> dict:
+        latencies = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(callers)
+
+        def caller(i):
+            barrier.wait()
+            for r in range(rounds):
+                start = time.perf_counter()
+                embed_one(f"caller {i} question {r}")
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall_s = time.perf_counter() - start
+        latencies.sort()
+        return {
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+            "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 1),
+            "wall_s": round(wall_s, 2),
+        }
+
+    direct_stub = StubEmbeddings(latency_ms=latency_ms, max_concurrency=provider_concurrency)
+    direct = run(direct_stub.embed_query)
+
+    batched_stub = StubEmbeddings(latency_ms=latency_ms, max_concurrency=provider_concurrency)
+    bench = EmbeddingBatcher(batched_stub.embed_documents, wait_ms=wait_ms, max_inflight=provider_concurrency)
+    batched = run(bench.embed)
+
+    return {
+        "texts": callers * rounds,
+        "direct": {"provider_requests": direct_stub.stats["requests"], **direct},
+        "batched": {"provider_requests": batched_stub.stats["requests"], **batched, "mean_batch": bench.describe()["mean_batch"]},
+    }
+
+
+if __name__ == "__main__":
+    print(benchmark_batcher())
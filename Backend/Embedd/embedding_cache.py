@@ -0,0 +1,230 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+from ..Observability import service_metrics
+
+load_dotenv()
+
+# ============ CONFIG ============
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))              # vectors kept in memory
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")                      # SQLite file; empty = memory only
+EMBEDDING_CACHE_DISK_ROWS = int(os.getenv("EMBEDDING_CACHE_DISK_ROWS", "100000"))  # oldest rows pruned beyond this
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+# ============ HELPER FUNCTIONS ============
+def normalize_text(text: str) -> str:
+    """'  What is   PPE? ' and 'what is ppe?' embed as one entry"""
+    return WHITESPACE_RE.sub(" ", text).strip().casefold()
+
+def model_key() -> str:
+    # Vectors are only interchangeable within one model and dimension count
+    return f"{os.getenv('EMBEDD_MODEL')}|{os.getenv('EMBEDD_DIMENSIONS')}"
+
+
+# ============ DISK TIER ============
+class DiskTier:
+    """SQLite table of float32 vector blobs, so embeddings survive restarts and are shared by workers"""
+
+    def __init__(self, path: str, max_rows: int = None):
+        self.path = path
+        self.max_rows = max_rows or EMBEDDING_CACHE_DISK_ROWS
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # Workers read while one writes
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, created REAL NOT NULL, "
+            "PRIMARY KEY (model, text))"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, model: str, text: str):
+        with self._lock:
+            row = self._conn.execute("SELECT vector FROM embeddings WHERE model = ? AND text = ?", (model, text)).fetchone()
+        return np.frombuffer(row[0], dtype="float32") if row else None
+
+    def put(self, model: str, text: str, vector: np.ndarray):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (model, text, vector, created) VALUES (?, ?, ?, ?)",
+                (model, text, vector.tobytes(), time.time())
+            )
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN ("
+                    "SELECT rowid FROM embeddings ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,)
+                )
+            self._conn.commit()
+
+    def rows(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+# ============ CACHE ============
+class EmbeddingCache:
+    """LRU of normalized text -> read-only float32 vector, in front of an optional disk tier"""
+
+    def __init__(self, size: int = None, path: str = None):
+        self.size = size or EMBEDDING_CACHE_SIZE
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        path = EMBEDDING_CACHE_PATH if path is None else path
+        self.disk = None
+        if path:
+            try:
+                self.disk = DiskTier(path)
+            except sqlite3.Error as e:
+                print(f"Embedding disk cache unavailable, memory only: {e}")
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _remember(self, key: tuple, vector: np.ndarray):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get(self, text: str):
+        """Cached vector or None; disk hits are promoted to memory"""
+        key = (model_key(), normalize_text(text))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return vector
+
+        if self.disk is not None:
+            try:
+                vector = self.disk.get(*key)
+            except sqlite3.Error as e:
+                print(f"Embedding disk cache read failed: {e}")
+                vector = None
+            if vector is not None:
+                self._remember(key, vector)
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                return vector
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, text: str, embedding) -> np.ndarray:
+        key = (model_key(), normalize_text(text))
+        vector = np.array(embedding, dtype="float32")
+        vector.flags.writeable = False  # Shared by every caller of the same text
+        self._remember(key, vector)
+        if self.disk is not None:
+            try:
+                self.disk.put(*key, vector)
+            except sqlite3.Error as e:
+                print(f"Embedding disk cache write failed: {e}")
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def describe(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            served = self.stats["hits"] + self.stats["disk_hits"]
+            return {
+                "entries": len(self._entries),
+                "size": self.size,
+                "disk": self.disk.path if self.disk else None,
+                "hit_rate": round(served / lookups, 3) if lookups else 0.0,
+                **self.stats
+            }
+
+
+# ============ PROCESS-WIDE CACHE ============
+cache = EmbeddingCache()
+
+# Disk hits count as hits: the network round-trip was skipped either way
+service_metrics.register_cache("embeddings", lambda: {
+    "hits": cache.stats["hits"] + cache.stats["disk_hits"],
+    "misses": cache.stats["misses"]
+})
+
+
+def cached_embedding(text: str, embed):
+    """embed(text) through the cache; returns a float32 vector"""
+    if not EMBEDDING_CACHE_ENABLED:
+        return np.asarray(embed(text), dtype="float32")
+    vector = cache.get(text)
+    if vector is None:
+        vector = cache.put(text, embed(text))
+    return vector
+
+def cached_embeddings(texts: list, embed_batch) -> np.ndarray:
+    """(texts x dims) matrix; only texts missing from the cache go to embed_batch, each once, in one call"""
+    if not EMBEDDING_CACHE_ENABLED:
+        return np.asarray(embed_batch(list(texts)), dtype="float32")
+    vectors = [cache.get(text) for text in texts]
+    missing = {}  # normalized key -> first text sent for it
+    for text, vector in zip(texts, vectors):
+        if vector is None:
+            missing.setdefault(normalize_text(text), text)
+    if missing:
+        batch = embed_batch(list(missing.values()))
+        embedded = {key: cache.put(text, vector) for (key, text), vector in zip(missing.items(), batch)}
+        vectors = [vector if vector is not None else embedded[normalize_text(text)] for text, vector in zip(texts, vectors)]
+    return np.vstack(vectors)
+
+
+# ============ BENCHMARK ============
+def benchmark_embedding_cache(questions: int = 500, distinct: int = 100, latency_ms: float = 40, dims: int = 1536, path: str = "") -> dict:
+    """Chat-like traffic (each distinct question asked several times, with case and spacing variations)
+    against a stub provider with fixed latency; reports provider calls and mean time per lookup"""
+    rng = np.random.default_rng(0)
+    asked = [f"What is the procedure for task {int(i)}?" for i in rng.integers(0, distinct, questions)]
+    asked = [q.upper() if i % 3 == 0 else f"  {q} " if i % 3 == 1 else q for i, q in enumerate(asked)]
+    calls = []
+
+    def stub_embed(text):
+        calls.append(text)
+        time.sleep(latency_ms / 1000)
+        return rng.standard_normal(dims)
+
+    start = time.perf_counter()
+    for question in asked:
+        stub_embed(question)
+    uncached_s = time.perf_counter() - start
+    calls.clear()
+
+    bench = EmbeddingCache(path=path)
+    start = time.perf_counter()
+    for question in asked:
+        vector = bench.get(question)
+        if vector is None:
+            bench.put(question, stub_embed(question))
+    cached_s = time.perf_counter() - start
+
+    return {
+        "questions": questions,
+        "provider_calls": len(calls),
+        "uncached_ms_per_question": round(uncached_s / questions * 1000, 2),
+        "cached_ms_per_question": round(cached_s / questions * 1000, 2),
+        **bench.describe()
+    }
+
+
+if __name__ == "__main__":
+    print(benchmark_embedding_cache())
@@ -1,10 +1,13 @@
 # create_vectors.py
 import json
+import os
 import numpy as np
 import faiss
 from docx import Document
 
 from ..Embedd import embedd_config as embedd
+from ..Embedd import vector_query
+from ..Observability.service_metrics import timed_embedding
 
 def load_docx(file_path):
     """Load text from DOCX file"""
@@ -35,6 +38,7 @@ def split_text(text, chunk_size=500, chunk_overlap=100):
     
     return chunks
 
+@timed_embedding("documents")
 def create_embeddings(chunks):
     """Create embeddings for text chunks"""
     embedding_model = embedd.embedding_model
@@ -71,9 +75,6 @@ def save_vectors():
     index.add(embeddings_array)
     
     print("Saving files...")
-    # Save FAISS index
-    faiss.write_index(index,"Backend/Resources/equipment_index.faiss")
-    
     # Save chunks
     metadata = []
     for i, chunk in enumerate(chunks):
@@ -82,8 +83,12 @@ def save_vectors():
             "text": chunk
         })
     
-    with open("Backend/Resources/metadata.json", "w", encoding="utf-8") as f:
+    # Write beside the live files and rename over them: running retrievers never read a half-written file
+    faiss.write_index(index, vector_query.INDEX_PATH + ".tmp")
+    with open(vector_query.METADATA_PATH + ".tmp", "w", encoding="utf-8") as f:
         json.dump(metadata, f, indent=2)
+    os.replace(vector_query.INDEX_PATH + ".tmp", vector_query.INDEX_PATH)
+    os.replace(vector_query.METADATA_PATH + ".tmp", vector_query.METADATA_PATH)
     
     print("✅ Done! Files created:")
     print("- equipment_index.faiss")
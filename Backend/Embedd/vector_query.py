@@ -1,56 +1,252 @@
 # query_vectors.py
+import asyncio
 import json
+import os
+import threading
+import time
 import numpy as np
 import faiss
+from dotenv import load_dotenv
 
 from ..Embedd import embedd_config as embedd
+from ..Embedd import embedding_cache
+from ..Embedd import embedding_batcher
+from ..Observability.service_metrics import timed_embedding
+from ..Observability import tracing
 
-def get_embedding(text):
-    """Get embedding for a single text"""
+load_dotenv()
+
+# ============ CONFIG ============
+INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "Backend/Resources/equipment_index.faiss")
+METADATA_PATH = os.getenv("VECTOR_METADATA_PATH", "Backend/Resources/metadata.json")
+# Memory-mapped pages are shared by every worker; Windows cannot replace a mapped file, so it reads into memory there
+VECTOR_INDEX_MMAP = os.getenv("VECTOR_INDEX_MMAP", "false" if os.name == "nt" else "true").lower() in ("1", "true", "yes", "on")
+VECTOR_INDEX_CHECK_S = float(os.getenv("VECTOR_INDEX_CHECK_S", "5"))  # how often queries look for a rewritten index
+
+@timed_embedding("query")
+def embed_query(text):
+    """One embedding request to the provider"""
     client = embedd.embedding_model
     
     response = client.embed_query(text)
     return response
 
+@tracing.traced("embedding.query")
+def embed_remote(text):
+    """Embedding from the provider; concurrent calls are coalesced into batch requests"""
+    if embedding_batcher.EMBED_BATCH_ENABLED:
+        return embedding_batcher.batcher.embed(text)
+    return embed_query(text)
+
+def get_embedding(text):
+    """Get embedding for a single text as a read-only float32 vector; repeated texts skip the provider"""
+    return embedding_cache.cached_embedding(text, embed_remote)
+
 def load_vectors():
     """Load FAISS index and metadata"""
-    index = faiss.read_index("Backend/Resources/equipment_index.faiss")
+    index = faiss.read_index(INDEX_PATH)
     
-    with open("Backend/Resources/metadata.json", "r", encoding="utf-8") as f:
+    with open(METADATA_PATH, "r", encoding="utf-8") as f:
         metadata = json.load(f)
     
     return index, metadata
 
-def search_query(query, top_k=3):
-    """Search for similar text"""
-    index, metadata = load_vectors()
-    
+def file_version() -> str:
+    """Changes whenever the index or metadata file is rewritten"""
+    stats = [os.stat(path) for path in (INDEX_PATH, METADATA_PATH)]
+    return ":".join(f"{s.st_mtime_ns}-{s.st_size}" for s in stats)
+
+
+# ============ RETRIEVER ============
+class LoadedIndex:
+    """One generation of the index: FAISS index, chunk ids and texts, and the file version they were read from.
+    Never mutated; a reload builds a new one"""
+    __slots__ = ("index", "ids", "texts", "version")
+
+    def __init__(self, index, ids: np.ndarray, texts: tuple, version: str):
+        self.index = index
+        self.ids = ids
+        self.texts = texts
+        self.version = version
+
+def read_index(path: str):
+    if VECTOR_INDEX_MMAP:
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP)
+        except RuntimeError as e:
+            print(f"Memory-mapped index load failed, reading into memory: {e}")
+    return faiss.read_index(path)
+
+def load_index() -> LoadedIndex:
+    """Index and metadata as one consistent generation; fails if the files change while being read"""
+    version = file_version()
+    index = read_index(INDEX_PATH)
+    with open(METADATA_PATH, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    if index.ntotal != len(metadata) or file_version() != version:
+        raise RuntimeError("Vector index and metadata changed while loading")
+    return LoadedIndex(
+        index,
+        np.array([chunk["id"] for chunk in metadata], dtype="int64"),
+        tuple(chunk["text"] for chunk in metadata),
+        version
+    )
+
+
+class Retriever:
+    """Process-wide index: loaded once, then swapped for a new generation when the files on disk change.
+    Queries always run against the generation they picked up, so a reload never blocks or breaks one"""
+
+    def __init__(self, loader=load_index):
+        self._loader = loader
+        self._current = None
+        self._load_lock = threading.Lock()
+        self._checked_at = 0.0
+        self.loaded_at = None
+        self.stats = {"loads": 0, "failed_reloads": 0}
+
+    @property
+    def loaded(self) -> bool:
+        return self._current is not None
+
+    def _swap(self, loaded: LoadedIndex):
+        self._current = loaded
+        self._checked_at = self.loaded_at = time.monotonic()
+        self.stats["loads"] += 1
+
+    def _reload_locked(self):
+        with tracing.span("faiss.load"):
+            self._swap(self._loader())
+
+    def reload(self):
+        """Load the files now, e.g. right after this worker rewrote them"""
+        with self._load_lock:
+            self._reload_locked()
+
+    def _reload_in_background(self):
+        if not self._load_lock.acquire(blocking=False):
+            return  # Already reloading
+        def run():
+            try:
+                self._reload_locked()
+            except Exception as e:
+                # Typically caught between the two file writes; the next check retries
+                self.stats["failed_reloads"] += 1
+                print(f"Vector index reload failed, serving the previous one: {e}")
+            finally:
+                self._load_lock.release()
+        threading.Thread(target=run, daemon=True).start()
+
+    def current(self) -> LoadedIndex:
+        current = self._current
+        if current is None:
+            with self._load_lock:
+                if self._current is None:
+                    self._reload_locked()
+            return self._current
+
+        now = time.monotonic()
+        if now - self._checked_at >= VECTOR_INDEX_CHECK_S:
+            self._checked_at = now
+            try:
+                changed = file_version() != current.version
+            except OSError:
+                changed = False  # Mid-rewrite; keep serving what we have
+            if changed:
+                self._reload_in_background()
+        return current
+
+    def search(self, query_embedding, top_k: int = 3) -> list:
+        return self.search_many([query_embedding], top_k)[0]
+
+    def search_many(self, query_embeddings, top_k: int = 3, threshold: float = None) -> list:
+        """One FAISS search over the (queries x dims) matrix; a result list per query, best first"""
+        loaded = self.current()
+        query_vectors = np.array(query_embeddings).astype('float32')
+        
+        # NORMALIZE query vectors for cosine similarity
+        faiss.normalize_L2(query_vectors)
+        
+        # Search in FAISS (now returns cosine similarity scores)
+        with tracing.span("faiss.search", top_k=top_k, queries=len(query_vectors)):
+            scores, indices = loaded.index.search(query_vectors, top_k)  # scores will be 0-1
+        
+        # Get results; FAISS pads with -1 when the index holds fewer than top_k chunks
+        all_results = []
+        for row_scores, row_indices in zip(scores, indices):
+            results = []
+            for score, idx in zip(row_scores, row_indices):
+                if 0 <= idx < len(loaded.texts) and (threshold is None or score >= threshold):
+                    results.append({
+                        "text": loaded.texts[idx],
+                        "similarity": float(score),  # Already 0-1, higher is better
+                        "id": int(loaded.ids[idx])
+                    })
+            all_results.append(results)
+        
+        return all_results
+
+    def describe(self) -> dict:
+        loaded = self._current
+        return {
+            "chunks": len(loaded.texts) if loaded else 0,
+            "version": loaded.version if loaded else None,
+            "mmap": VECTOR_INDEX_MMAP,
+            "age_s": round(time.monotonic() - self.loaded_at, 1) if loaded else None,
+            **self.stats
+        }
+
+
+retriever = Retriever()
+
+def index_version() -> str:
+    """Version of the index queries are served from"""
+    return retriever.current().version
+
+def search_query(query, top_k=3, embedding=None):
+    """Search for similar text; pass embedding to reuse one already computed for this query"""
     # Create query embedding
-    query_embedding = get_embedding(query)
-    query_vector = np.array([query_embedding]).astype('float32')
+    query_embedding = embedding if embedding is not None else get_embedding(query)
+    return retriever.search(query_embedding, top_k)
+
+async def asearch_query(query, top_k=3, embedding=None):
+    """search_query() for coroutines; only the first query of the process waits for the index load"""
+    if not retriever.loaded:
+        if embedding is None:
+            _, embedding = await asyncio.gather(
+                asyncio.to_thread(retriever.current),
+                asyncio.to_thread(get_embedding, query)
+            )
+        else:
+            await asyncio.to_thread(retriever.current)
+    elif embedding is None:
+        embedding = await asyncio.to_thread(get_embedding, query)
+    return retriever.search(embedding, top_k)
+
+def get_embeddings(texts):
+    """Embeddings for many texts: cached ones reused, the rest in a single provider batch"""
+    return embedding_cache.cached_embeddings(texts, embedding_batcher.embed_batch)
+
+def search_queries(queries, top_k=3, threshold=None):
+    """search_query() for many queries at once: one embedding batch and one FAISS search.
+    Returns a result list per query, in order; threshold drops chunks below that similarity"""
+    if not queries:
+        return []
+    return retriever.search_many(get_embeddings(queries), top_k, threshold)
+
+def ask_question(question, embedding=None):
     
-    # NORMALIZE query vector for cosine similarity
-    faiss.normalize_L2(query_vector)
+    results = search_query(question, top_k=2, embedding=embedding)
     
-    # Search in FAISS (now returns cosine similarity scores)
-    scores, indices = index.search(query_vector, top_k)  # scores will be 0-1
+    return _join_relevant(results)
+
+async def aask_question(question, embedding=None):
     
-    # Get results
-    results = []
-    for i in range(top_k):
-        idx = indices[0][i]
-        if idx < len(metadata):
-            results.append({
-                "text": metadata[idx]["text"],
-                "similarity": float(scores[0][i]),  # Already 0-1, higher is better
-                "id": metadata[idx]["id"]
-            })
+    results = await asearch_query(question, top_k=2, embedding=embedding)
     
-    return results
+    return _join_relevant(results)
 
-def ask_question(question):
-    
-    results = search_query(question, top_k=2)
+def _join_relevant(results):
     
     resp = ""
     
@@ -72,4 +268,72 @@ def get_retrieved_chunk(question):
             out_list.append(res["text"])
             
     return out_list
-    
\ No newline at end of file
+    
+
+# ============ BENCHMARK ============
+def benchmark_retrieval(queries: int = 200, top_k: int = 3) -> dict:
+    """Search latency with the index reloaded from disk per query (the old path) vs the resident retriever.
+    Uses random query vectors, so the embedding call is left out of both"""
+    bench = Retriever()
+    start = time.perf_counter()
+    loaded = bench.current()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((queries, loaded.index.d)).astype("float32")
+
+    start = time.perf_counter()
+    for query_vector in vectors:
+        index, metadata = load_vectors()
+        scores, indices = index.search(query_vector[None, :] / np.linalg.norm(query_vector), top_k)
+        [metadata[i]["text"] for i in indices[0] if 0 <= i < len(metadata)]
+    per_query_load_us = (time.perf_counter() - start) / queries * 1e6
+
+    start = time.perf_counter()
+    for query_vector in vectors:
+        bench.search(query_vector, top_k)
+    resident_us = (time.perf_counter() - start) / queries * 1e6
+
+    return {
+        "chunks": len(loaded.texts),
+        "mmap": VECTOR_INDEX_MMAP,
+        "initial_load_ms": round(load_ms, 2),
+        "search_with_reload_us": round(per_query_load_us, 1),
+        "search_resident_us": round(resident_us, 1),
+    }
+
+def benchmark_batch_retrieval(queries: int = 200, top_k: int = 3, latency_ms: float = 20) -> dict:
+    """Serial search_query() round-trips vs one search_queries() call, with the offline stub embedder
+    (fixed per-request latency) standing in for the provider; every query text is new to the cache"""
+    from ..Embedd.embedd_stub import StubEmbeddings
+
+    stub = StubEmbeddings(dimensions=retriever.current().index.d, latency_ms=latency_ms)
+    previous_model, embedd.embedding_model = embedd.embedding_model, stub
+    run = time.time_ns()
+    try:
+        serial_queries = [f"safety procedure {i} for asset group {run}-serial" for i in range(queries)]
+        start = time.perf_counter()
+        serial = [search_query(query, top_k) for query in serial_queries]
+        serial_s = time.perf_counter() - start
+        serial_requests = stub.stats["requests"]
+
+        batch_queries = [f"safety procedure {i} for asset group {run}-batch" for i in range(queries)]
+        start = time.perf_counter()
+        batched = search_queries(batch_queries, top_k)
+        batch_s = time.perf_counter() - start
+    finally:
+        embedd.embedding_model = previous_model
+
+    return {
+        "queries": queries,
+        "serial_s": round(serial_s, 3),
+        "serial_provider_requests": serial_requests,
+        "batch_s": round(batch_s, 3),
+        "batch_provider_requests": stub.stats["requests"] - serial_requests,
+        "same_results": [[r["id"] for r in rows] for rows in serial] == [[r["id"] for r in rows] for rows in search_queries(serial_queries, top_k)],
+    }
+
+
+if __name__ == "__main__":
+    print(benchmark_retrieval())
+    print(benchmark_batch_retrieval())
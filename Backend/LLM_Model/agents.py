@@ -1,4 +1,8 @@
-from ..LLM_Model import llm_config as llm
+from ..LLM_Model import llm_client
+from ..LLM_Model import prompt_payload as payload
+from ..LLM_Model import prescreen
+from ..LLM_Model import forecasting
+from ..Observability.instrumentation import instrument_node, run_report
 
 from langchain.tools import tool
 from langgraph.graph import StateGraph, START, END
@@ -11,6 +15,7 @@ from pydantic import BaseModel
 import operator
 
 from ..Controller import Controller as ctrl
+from ..Model import equipments as eq
 
 from typing import TypedDict, Annotated, List, Optional
 from langgraph.graph import StateGraph, END
@@ -36,6 +41,8 @@ class MaintenanceDecision(BaseModel):
     confidence: float = Field(ge=0.0, le=1.0)
     date_decided: datetime = Field(default_factory=datetime.now)
     date_predicted: datetime = None
+    date_predicted_lower: datetime = None
+    date_predicted_upper: datetime = None
 
 class MaintenanceLogBase(BaseModel):
     raised_by: str = "system_ai"
@@ -63,6 +70,15 @@ class State(TypedDict):
     current_step: str
     errors: Annotated[List[str], operator.add]
     processed_count: int
+    
+    # Pre-screen
+    llm_candidates: Optional[List[str]]  # Serials routed to the LLM, None = all
+    prescreen_results: dict  # {serial: verdict}
+    
+    # Incremental mode
+    incremental: bool
+    change_reasons: dict  # {serial: [reasons]}
+    analyzed_serials: Annotated[List[str], operator.add]
 
 # ============ HELPER FUNCTIONS ============
 def parse_json_response(text: str) -> dict:
@@ -111,9 +127,33 @@ def determine_severity(reason: str, confidence: float) -> str:
     else:
         return "low"  # Low confidence = low severity
 
+def monitoring_watermark(monitoring_logs) -> tuple:
+    """Latest monitoring id and timestamp seen in the fetched logs."""
+    if not isinstance(monitoring_logs, list) or not monitoring_logs:
+        return (0, None)
+    
+    latest = max(monitoring_logs, key=lambda log: log.get("id") or 0)
+    timestamp = latest.get("timestamp")
+    try:
+        timestamp = datetime.fromisoformat(timestamp) if timestamp else None
+    except ValueError:
+        timestamp = None
+    
+    return (latest.get("id") or 0, timestamp)
+
+def maintenance_fingerprint(maintenance_logs, created_ids=()) -> tuple:
+    """Highest maintenance log id and log count in the fetched logs, plus the logs this run created."""
+    ids = [log.get("id") or 0 for log in maintenance_logs] if isinstance(maintenance_logs, list) else []
+    ids.extend(created_ids)
+    return (max(ids, default=0), len(ids))
+
 # ============ NODE 1: FETCH EQUIPMENTS ============
+@instrument_node("agents")
 def fetch_equipments_node(state: State) -> dict:
     """Node 1: Fetch all equipments from database"""
+    if state.get("incremental"):
+        return fetch_changed_equipments_node(state)
+    
     try:
         # Assuming you have a controller module 'ctrl'
         ctrl_response = ctrl.fetch_all_equipments()
@@ -140,7 +180,50 @@ def fetch_equipments_node(state: State) -> dict:
             "errors": [f"Failed to fetch equipments: {str(e)}"]
         }
 
+def fetch_changed_equipments_node(state: State) -> dict:
+    """Node 1 (incremental): Fetch only equipments changed since their analysis watermark"""
+    try:
+        rows = eq.list_changed_equipments()
+        
+        equipments = []
+        change_reasons = {}
+        for row in rows:
+            equipments.append(Equipment(serial=row.serial, name=row.name))
+            
+            reasons = []
+            if row.never_analyzed:
+                reasons.append("never_analyzed")
+            if row.new_readings:
+                reasons.append(f"new_readings:{row.new_readings}")
+            if row.new_breaches:
+                reasons.append(f"new_breaches:{row.new_breaches}")
+            if row.maintenance_changed:
+                reasons.append("maintenance_changed")
+            change_reasons[row.serial] = reasons
+        
+        return {
+            "equipments": equipments,
+            "change_reasons": change_reasons,
+            "current_step": "equipments_fetched",
+            "processed_count": 0,
+            "summaries": [f"Incremental run: {len(equipments)} equipments changed since last analysis"]
+        }
+        
+    except Exception as e:
+        return {
+            "equipments": [],
+            "current_step": "error",
+            "errors": [f"Failed to fetch changed equipments: {str(e)}"]
+        }
+
+def route_after_fetch_equipments(state: State) -> str:
+    """Skip straight to the report when an incremental run finds nothing to analyze"""
+    if state.get("incremental") and not state.get("equipments") and not state.get("errors"):
+        return "final_report"
+    return "fetch_monitoring"
+
 # ============ NODE 2: FETCH MONITORING LOGS ============
+@instrument_node("agents")
 def fetch_monitoring_node(state: State) -> dict:
     """Node 2: Fetch monitoring logs for each equipment"""
     if not state.get("equipments"):
@@ -177,9 +260,52 @@ def fetch_monitoring_node(state: State) -> dict:
         "summaries": [f"Fetched monitoring data for {len(monitoring_logs)} equipments"]
     }
 
-# ============ NODE 3: ANALYZE & DECIDE ============
+# ============ NODE 3: RULE-BASED PRE-SCREEN ============
+@instrument_node("agents")
+def prescreen_node(state: State) -> dict:
+    """Node 3: Record rule-based decisions for clearly healthy equipment, route the rest to the LLM"""
+    rules = prescreen.PrescreenRules.from_env()
+    if not rules.enabled or not state.get("monitoring_logs"):
+        return {"llm_candidates": None, "current_step": "prescreen_skipped"}
+    
+    try:
+        results = prescreen.prescreen_fleet(state["monitoring_logs"], rules)
+    except Exception as e:
+        return {
+            "llm_candidates": None,
+            "current_step": "prescreen_failed",
+            "errors": [f"Pre-screen failed, analyzing all equipments with the LLM: {str(e)}"]
+        }
+    
+    decisions = []
+    candidates = []
+    for equipment in state["equipments"]:
+        result = results.get(equipment.serial)
+        if result is None or result.needs_llm:
+            candidates.append(equipment.serial)
+            continue
+        decisions.append(MaintenanceDecision(
+            equipment_serial=equipment.serial,
+            needs_maintenance=False,
+            reason=result.reason,
+            confidence=rules.healthy_confidence,
+            date_predicted=None
+        ))
+    
+    skipped = [d.equipment_serial for d in decisions]
+    return {
+        "maintenance_decisions": decisions,
+        "analyzed_serials": skipped,
+        "llm_candidates": candidates,
+        "prescreen_results": {serial: result.verdict for serial, result in results.items()},
+        "current_step": "prescreen_complete",
+        "summaries": [f"Pre-screen: {len(skipped)} equipments healthy by rule, {len(candidates)} routed to LLM analysis"]
+    }
+
+# ============ NODE 4: ANALYZE & DECIDE ============
+@instrument_node("agents")
 def analyze_and_decide_node(state: State) -> dict:
-    """Node 3: Analyze logs and decide if maintenance is needed"""
+    """Node 4: Analyze logs and decide if maintenance is needed"""
     if not state.get("monitoring_logs"):
         return {
             "current_step": "error",
@@ -188,49 +314,64 @@ def analyze_and_decide_node(state: State) -> dict:
     
     decisions = []
     summaries = []
+    analyzed_serials = []
     
-    for equipment in state["equipments"]:
+    candidates = state.get("llm_candidates")
+    equipments = [e for e in state["equipments"] if candidates is None or e.serial in candidates]
+    
+    # Numeric threshold-crossing forecast is the primary date estimate; the LLM only supplies the narrative
+    try:
+        # Read as numeric columns from the database; the API-shaped logs cost seconds to unpack for a large fleet
+        fetched = [e.serial for e in equipments if isinstance(state["monitoring_logs"].get(e.serial), list)]
+        forecasts = forecasting.forecast_fleet_from_db(fetched)
+    except Exception as e:
+        forecasts = {}
+        summaries.append(f"Forecasting failed, no predicted dates: {str(e)}")
+    
+    for equipment in equipments:
         serial = equipment.serial
         monitoring_logs = state["monitoring_logs"].get(serial, {})
         maintenance_logs = state["maintenance_logs"].get(serial, {})
         
+        # Compact statistics instead of raw rows, bounded regardless of history length
+        data_payload = payload.build_prompt_payload(monitoring_logs, maintenance_logs)
+        forecast = forecasts.get(serial)
+        
         # 1. Create summary
         summary_prompt = f"""
         Equipment: {equipment.name or 'Unknown'} ({serial})
         Type: {equipment.type or 'Unknown'}
-        Monitoring Data: {monitoring_logs}
-        Maintenance Data: {maintenance_logs}
+        {data_payload}
         
         Provide a brief 1-2 sentence summary of this equipment's current status.
         """
         
         try:
-            summary_response = llm.llm_model.invoke(summary_prompt)
+            summary_response = llm_client.invoke(summary_prompt)
             summaries.append(f"{serial}: {summary_response.content.strip()}")
         except Exception as e:
             summaries.append(f"{serial}: Error generating summary: {str(e)}")
         
         # 2. Maintenance decision
         decision_prompt = f"""
-        Based on this monitoring data and Maintenance Log decide if maintenance is required in future and when from today which is {datetime.utcnow().date()}. Strictly predict the date and date should be in this DD-MM-YYYY format.:
+        Based on this monitoring data and Maintenance Log decide if maintenance is required in future. Today is {datetime.utcnow().date()}.
         Strictly if the equipment is already under maintenance or open state then do not suggest maintenance.
         Equipment: {equipment.name or 'Unknown'} ({serial})
-        Monitoring Data: {monitoring_logs}
-        Maintenance Data: {maintenance_logs}
+        {data_payload}
+        Trend forecast: {forecasting.describe_forecast(forecast)}
         
         Return a JSON object with this exact structure:
         {{
             "needs_maintenance": true/false,
             "reason": "brief explanation here",
-            "confidence": decimal between 0.0 and 1.0,
-            "date_predicted": "DD-MM-YYYY"
+            "confidence": decimal between 0.0 and 1.0
         }}
         
         Only return the JSON object, nothing else.
         """
         
         try:
-            decision_response = llm.llm_model.invoke(decision_prompt)
+            decision_response = llm_client.invoke(decision_prompt)
             decision_data = parse_json_response(decision_response.content)
             
             # Ensure all required fields are present
@@ -239,9 +380,12 @@ def analyze_and_decide_node(state: State) -> dict:
                 needs_maintenance=decision_data.get("needs_maintenance", False),
                 reason=decision_data.get("reason", "No analysis provided"),
                 confidence=decision_data.get("confidence", 0.0),
-                date_predicted=datetime.strptime(decision_data.get("date_predicted", datetime.utcnow().strftime("%d-%m-%Y")), "%d-%m-%Y")
+                date_predicted=forecast.date_predicted if forecast else None,
+                date_predicted_lower=forecast.date_lower if forecast else None,
+                date_predicted_upper=forecast.date_upper if forecast else None
             )
             decisions.append(decision)
+            analyzed_serials.append(serial)
             
         except Exception as e:
             # Fallback decision
@@ -256,13 +400,15 @@ def analyze_and_decide_node(state: State) -> dict:
     return {
         "maintenance_decisions": decisions,
         "summaries": summaries,
+        "analyzed_serials": analyzed_serials,
         "current_step": "analysis_complete",
         "processed_count": len(decisions)
     }
 
-# ============ NODE 4: CREATE MAINTENANCE LOGS ============
+# ============ NODE 5: CREATE MAINTENANCE LOGS ============
+@instrument_node("agents")
 def create_maintenance_logs_node(state: State) -> dict:
-    """Node 4: Create maintenance logs for equipment needing maintenance"""
+    """Node 5: Create maintenance logs for equipment needing maintenance"""
     if not state.get("maintenance_decisions"):
         return {
             "current_step": "error",
@@ -311,9 +457,14 @@ def create_maintenance_logs_node(state: State) -> dict:
             created_logs.append({
                 "equipment_serial": decision.equipment_serial,
                 "log_created": True,
+                "log_id": result.get("id"),
                 "severity": severity,
                 "message": result.get("message", "Log created"),
                 "date_predicted": str(maintenance_log.date_predicted) if maintenance_log.date_predicted else None,
+                "date_predicted_interval": [
+                    str(decision.date_predicted_lower) if decision.date_predicted_lower else None,
+                    str(decision.date_predicted_upper) if decision.date_predicted_upper else None
+                ],
                 "timestamp": str(maintenance_log.date_reported),
             })
             
@@ -332,9 +483,46 @@ def create_maintenance_logs_node(state: State) -> dict:
         "summaries": [f"Created maintenance logs for {len(created_logs)} equipments"]
     }
 
-# ============ NODE 5: FINAL REPORT ============
+# ============ NODE 6: UPDATE WATERMARKS ============
+@instrument_node("agents")
+def update_watermarks_node(state: State) -> dict:
+    """Node 6: Advance the analysis watermark of every successfully analyzed equipment"""
+    monitoring_logs = state.get("monitoring_logs", {})
+    maintenance_logs = state.get("maintenance_logs", {})
+    
+    # Logs written by this run are part of what was analyzed; anything else added meanwhile is not
+    created_ids = {}
+    for log in state.get("created_logs", []):
+        if log.get("log_id") is not None:
+            created_ids.setdefault(log["equipment_serial"], []).append(log["log_id"])
+    
+    # Watermarks come from the data fetched before the analysis, so rows written while it ran stay "changed"
+    watermarks = {}
+    for serial in state.get("analyzed_serials", []):
+        logs = monitoring_logs.get(serial)
+        if not isinstance(logs, list):
+            continue  # Fetch failed, leave the watermark so the next run retries
+        watermarks[serial] = (
+            *monitoring_watermark(logs),
+            *maintenance_fingerprint(maintenance_logs.get(serial), created_ids.get(serial, ()))
+        )
+    
+    try:
+        eq.upsert_analysis_watermarks(watermarks)
+        return {
+            "current_step": "watermarks_updated",
+            "summaries": [f"Updated analysis watermarks for {len(watermarks)} equipments"]
+        }
+    except Exception as e:
+        return {
+            "current_step": "error",
+            "errors": [f"Failed to update analysis watermarks: {str(e)}"]
+        }
+
+# ============ NODE 7: FINAL REPORT ============
+@instrument_node("agents")
 def final_report_node(state: State) -> dict:
-    """Node 5: Generate final report"""
+    """Node 7: Generate final report"""
     summary_stats = {
         "total_equipments": len(state.get("equipments", [])),
         "needs_maintenance": len([d for d in state.get("maintenance_decisions", []) if d.needs_maintenance]),
@@ -382,24 +570,39 @@ workflow = StateGraph(State)
 # Add nodes
 workflow.add_node("fetch_equipments", fetch_equipments_node)
 workflow.add_node("fetch_monitoring", fetch_monitoring_node)
+workflow.add_node("prescreen", prescreen_node)
 workflow.add_node("analyze_and_decide", analyze_and_decide_node)
 workflow.add_node("create_maintenance_logs", create_maintenance_logs_node)
+workflow.add_node("update_watermarks", update_watermarks_node)
 workflow.add_node("final_report", final_report_node)
 
 # Define flow
 workflow.set_entry_point("fetch_equipments")
-workflow.add_edge("fetch_equipments", "fetch_monitoring")
-workflow.add_edge("fetch_monitoring", "analyze_and_decide")
+workflow.add_conditional_edges(
+    "fetch_equipments",
+    route_after_fetch_equipments,
+    {
+        "fetch_monitoring": "fetch_monitoring",
+        "final_report": "final_report"
+    }
+)
+workflow.add_edge("fetch_monitoring", "prescreen")
+workflow.add_edge("prescreen", "analyze_and_decide")
 workflow.add_edge("analyze_and_decide", "create_maintenance_logs")
-workflow.add_edge("create_maintenance_logs", "final_report")
+workflow.add_edge("create_maintenance_logs", "update_watermarks")
+workflow.add_edge("update_watermarks", "final_report")
 workflow.add_edge("final_report", END)
 
 # Compile the app
 app = workflow.compile()
 
 # ============ EXECUTION FUNCTION ============
-def execute_maintenance_workflow():
-    """Execute the entire workflow (call this on button click)"""
+def execute_maintenance_workflow(incremental: bool = False):
+    """Execute the entire workflow (call this on button click).
+    
+    With incremental=True only equipments changed since their analysis watermark are analyzed,
+    so scheduled runs cost O(changed assets) instead of O(fleet).
+    """
     
     # Initial state
     initial_state = {
@@ -410,35 +613,47 @@ def execute_maintenance_workflow():
         "created_logs": [],
         "current_step": "started",
         "errors": [],
-        "processed_count": 0
+        "processed_count": 0,
+        "incremental": incremental,
+        "change_reasons": {},
+        "analyzed_serials": [],
+        "llm_candidates": None,
+        "prescreen_results": {}
     }
     
     try:
         # Execute the graph
-        final_state = app.invoke(initial_state)
+        with run_report("agents") as report:
+            final_state = app.invoke(initial_state)
         
         # Return structured result
         return {
             "success": True,
             "summary": final_state.get("summaries", [])[-1] if final_state.get("summaries") else "No summary",
             "statistics": {
+                "mode": "incremental" if incremental else "full",
                 "equipments_processed": len(final_state.get("equipments", [])),
                 "maintenance_decisions": len(final_state.get("maintenance_decisions", [])),
                 "logs_created": len(final_state.get("created_logs", [])),
                 "errors": len(final_state.get("errors", [])),
-                "final_step": final_state.get("current_step", "unknown")
+                "final_step": final_state.get("current_step", "unknown"),
+                "llm_analyzed": len(final_state["llm_candidates"]) if final_state.get("llm_candidates") is not None else len(final_state.get("equipments", [])),
+                "prescreen": prescreen.prescreen_metrics()
             },
             "decisions": [
                 {
                     "equipment_serial": d.equipment_serial,
                     "needs_maintenance": d.needs_maintenance,
                     "reason": d.reason,
-                    "confidence": d.confidence
+                    "confidence": d.confidence,
+                    "date_predicted": str(d.date_predicted) if d.date_predicted else None
                 }
                 for d in final_state.get("maintenance_decisions", [])
             ],
             "created_logs": final_state.get("created_logs", []),
-            "errors": final_state.get("errors", [])
+            "change_reasons": final_state.get("change_reasons", {}),
+            "errors": final_state.get("errors", []),
+            "instrumentation": report.summary()
         }
         
     except Exception as e:
@@ -0,0 +1,217 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from ..LLM_Model import intent_engine
+from ..LLM_Model import serial_index
+from ..Embedd import vector_query as vector
+from ..Model import equipments as eq
+from ..Observability import service_metrics
+from ..Observability import tracing
+
+load_dotenv()
+
+# ============ CONFIG ============
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity of a near-duplicate question
+ANSWER_CACHE_TTL_S = float(os.getenv("ANSWER_CACHE_TTL_S", "600"))  # bounds staleness from writes that bypass Backend/Model/equipments.py
+ANSWER_CACHE_COOLDOWN_S = float(os.getenv("ANSWER_CACHE_COOLDOWN_S", "30"))  # bypass after an embedding failure
+
+# What each intent's answer is built from; a cached answer is served only while these are unchanged
+INTENT_DEPENDENCIES = {
+    "general_chat": ("docs",),
+    "list_equipments": ("equipment",),
+    "fetch_equipment_details_node": ("equipment", "monitoring", "maintenance"),
+    "batch_equipment_details": ("equipment", "monitoring", "maintenance"),
+    "list_all_maintenance": ("equipment", "maintenance"),
+    "list_all_monitoring": ("equipment", "monitoring"),
+    "maintenance_query": ("equipment", "maintenance"),
+    "monitoring_query": ("equipment", "monitoring"),
+}
+
+
+# ============ DATA VERSIONS ============
+class DataVersions:
+    """Versions read at most once per turn: the doc index from its files, the tables from one watermark query"""
+
+    def __init__(self):
+        self._values = {}
+
+    def get(self, name: str):
+        if name not in self._values:
+            if name == "docs":
+                self._values["docs"] = vector.index_version()
+            else:
+                self._values.update(eq.data_watermarks())
+        return self._values[name]
+
+    def capture(self, names) -> dict:
+        return {name: self.get(name) for name in names}
+
+
+# ============ CACHE ============
+class AnswerCache:
+    """Near-duplicate question lookup over a fixed-size matrix of normalized embeddings, LRU evicted.
+    Entries only match questions with the same keyword intent and serial, so 'status of SN-1' never answers 'status of SN-2'"""
+
+    def __init__(self, size: int = None, threshold: float = None, ttl_s: float = None):
+        self.size = size or ANSWER_CACHE_SIZE
+        self.threshold = ANSWER_CACHE_THRESHOLD if threshold is None else threshold
+        self.ttl_s = ANSWER_CACHE_TTL_S if ttl_s is None else ttl_s
+        self._entries = OrderedDict()          # entry id -> entry, least recently used first
+        self._matrix = None                    # (size x dims), one row per slot
+        self._owner = np.full(self.size, -1)   # slot -> entry id, -1 when free
+        self._free = list(range(self.size))
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "stores": 0}
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        values = np.asarray(embedding, dtype="float32")
+        norm = np.linalg.norm(values)
+        return values / norm if norm else values
+
+    def _candidates(self, query: np.ndarray) -> list:
+        """Entry ids above the threshold, most similar first"""
+        if self._matrix is None or self._matrix.shape[1] != query.shape[0]:
+            return []
+        scores = self._matrix @ query
+        scores[self._owner < 0] = -1.0
+        slots = np.flatnonzero(scores >= self.threshold)
+        return [int(self._owner[slot]) for slot in slots[np.argsort(-scores[slots])]]
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        self._owner[entry["slot"]] = -1
+        self._free.append(entry["slot"])
+
+    def find(self, embedding, key: tuple, versions: DataVersions):
+        """Freshest matching entry, or None; entries whose data changed or that expired are dropped"""
+        query = self._normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            for entry_id in self._candidates(query):
+                entry = self._entries[entry_id]
+                if entry["key"] != key:
+                    continue
+                try:
+                    fresh = now - entry["created"] < self.ttl_s and versions.capture(entry["versions"]) == entry["versions"]
+                except Exception as e:
+                    print(f"Answer cache could not read data versions: {e}")
+                    fresh = False
+                if not fresh:
+                    self._remove(entry_id)
+                    self.stats["stale"] += 1
+                    continue
+                self._entries.move_to_end(entry_id)
+                self.stats["hits"] += 1
+                return entry
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, embedding, key: tuple, intent: str, question: str, answer: str, versions: dict):
+        query = self._normalize(embedding)
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != query.shape[0]:
+                # First entry, or the embedding model changed: start over
+                self._matrix = np.zeros((self.size, query.shape[0]), dtype="float32")
+                self._entries.clear()
+                self._owner[:] = -1
+                self._free = list(range(self.size))
+            # A near-duplicate of the same question replaces the older answer
+            for entry_id in self._candidates(query):
+                if self._entries[entry_id]["key"] == key:
+                    self._remove(entry_id)
+            if not self._free:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+            slot = self._free.pop()
+            entry_id = next(self._ids)
+            self._matrix[slot] = query
+            self._owner[slot] = entry_id
+            self._entries[entry_id] = {
+                "slot": slot,
+                "key": key,
+                "intent": intent,
+                "question": question,
+                "answer": answer,
+                "versions": versions,
+                "created": time.monotonic()
+            }
+            self.stats["stores"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._matrix = None
+            self._entries.clear()
+            self._owner[:] = -1
+            self._free = list(range(self.size))
+
+    def describe(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                "entries": len(self._entries),
+                "size": self.size,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                **self.stats
+            }
+
+
+# ============ PROCESS-WIDE CACHE ============
+cache = AnswerCache()
+service_metrics.register_cache("answers", lambda: dict(cache.stats))
+
+_unavailable_until = 0.0
+
+
+def lookup(question: str) -> dict:
+    """Embed the question and look for a fresh cached answer.
+    Returns 'answer' (None on a miss) and what store() needs; on a miss the data versions are captured now,
+    before the answer is built, so an answer can never be tagged with data newer than it saw"""
+    global _unavailable_until
+    result = {"answer": None, "embedding": None, "key": None, "versions": None, "question": question}
+    if not ANSWER_CACHE_ENABLED or time.monotonic() < _unavailable_until:
+        return result
+
+    classified = intent_engine.classify(question, serial_resolver=serial_index.resolve_serial)
+    key = (classified["intent"], classified["serial_number"])
+    try:
+        with tracing.span("answer_cache.lookup"):
+            embedding = vector.get_embedding(question)
+    except Exception as e:
+        print(f"Answer cache unavailable: {e}")
+        _unavailable_until = time.monotonic() + ANSWER_CACHE_COOLDOWN_S
+        return result
+
+    versions = DataVersions()
+    entry = cache.find(embedding, key, versions)
+    if entry is not None:
+        return {**result, "answer": entry["answer"], "embedding": embedding, "key": key, "intent": entry["intent"]}
+
+    try:
+        captured = versions.capture({name for names in INTENT_DEPENDENCIES.values() for name in names})
+    except Exception as e:
+        print(f"Answer cache could not read data versions: {e}")
+        captured = None
+    return {**result, "embedding": embedding, "key": key, "versions": captured}
+
+def store(lookup_result: dict, intent: str, serial_number: Optional[str], answer: str, standalone: bool = True):
+    """Cache the answer built after a lookup miss, under the (intent, serial_number) the graph actually answered.
+    Only standalone turns are reused: with earlier turns in context any answer may lean on them.
+    An answer is skipped when the graph routed differently than the lookup key (e.g. the semantic router),
+    later lookups of the same question would never find it and a mismatched key could serve the wrong serial"""
+    if lookup_result.get("versions") is None or not answer or intent not in INTENT_DEPENDENCIES or not standalone:
+        return
+    if (intent, serial_number) != lookup_result["key"]:
+        return
+    versions = {name: lookup_result["versions"][name] for name in INTENT_DEPENDENCIES[intent]}
+    cache.put(lookup_result["embedding"], lookup_result["key"], intent, lookup_result["question"], answer, versions)
@@ -0,0 +1,105 @@
+import os
+from dotenv import load_dotenv
+
+from ..LLM_Model import llm_client
+from ..LLM_Model import prompt_payload as payload
+
+load_dotenv()
+
+# ============ CONFIG ============
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "6"))                 # user/assistant pairs kept verbatim
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))  # for the verbatim window
+CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "300"))
+CHAT_SUMMARY_FOLD_MIN = int(os.getenv("CHAT_SUMMARY_FOLD_MIN", "4"))  # fold only once this many messages fell out of the window
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+
+
+# ============ HELPER FUNCTIONS ============
+def _role(message) -> str:
+    if isinstance(message, dict):
+        return message.get("role", "user")
+    return {"human": "user", "ai": "assistant"}.get(getattr(message, "type", ""), getattr(message, "type", "user"))
+
+def _content(message) -> str:
+    if isinstance(message, dict):
+        return str(message.get("content", ""))
+    return str(getattr(message, "content", message))
+
+def window_start(messages: list, turns: int = None, token_budget: int = None) -> int:
+    """Index of the oldest message kept verbatim: at most K turns, newest first, within the token budget"""
+    turns = turns or CHAT_HISTORY_TURNS
+    token_budget = token_budget or CHAT_HISTORY_TOKEN_BUDGET
+
+    used = 0
+    user_turns = 0
+    start = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        if _role(messages[i]) == "system":
+            break  # Summary message, handled separately
+        cost = payload.estimate_tokens(_content(messages[i])) + 4
+        if start < len(messages) and used + cost > token_budget:
+            break  # The newest message is always kept
+        used += cost
+        start = i
+        if _role(messages[i]) == "user":
+            user_turns += 1
+            if user_turns >= turns:
+                break
+    return start
+
+
+# ============ CONTEXT ============
+def build_turn_messages(conversation: dict, user_message: dict) -> list:
+    """Graph input for one turn: cached summary (if any), the verbatim window, then the new question"""
+    combined = conversation["messages"] + [user_message]
+    window = combined[window_start(combined):-1]
+
+    messages = []
+    summary = conversation.get("data", {}).get("summary")
+    if summary:
+        messages.append({"role": "system", "content": f"{SUMMARY_PREFIX} {summary}"})
+    return messages + window + [user_message]
+
+def context(state) -> list:
+    """Trimmed context shared by every chat node: summary message plus the verbatim window"""
+    messages = state["messages"]
+    summary = [m for m in messages[:1] if _role(m) == "system" and _content(m).startswith(SUMMARY_PREFIX)]
+    return summary + messages[window_start(messages):]
+
+
+# ============ ROLLING SUMMARY ============
+def summarize(previous: str, messages: list) -> str:
+    """Fold messages into the running summary with one LLM call"""
+    transcript = "\n".join(f"{_role(m)}: {_content(m)[:1000]}" for m in messages)
+    prompt = f"""
+    Update the running summary of a maintenance assistant conversation.
+    Keep equipment serial numbers, decisions, dates and open questions. At most {CHAT_SUMMARY_TOKEN_BUDGET * 3 // 4} words.
+
+    Current summary:
+    {previous or "(none)"}
+
+    New messages:
+    {transcript}
+
+    Return only the updated summary text.
+    """
+    response = llm_client.invoke(prompt, priority="interactive")
+    return str(response.content).strip()
+
+def fold_history(conversation: dict) -> dict:
+    """Move messages that left the window into the cached per-session summary and drop them"""
+    messages = conversation["messages"]
+    start = window_start(messages)
+    if start < CHAT_SUMMARY_FOLD_MIN:
+        return conversation
+
+    data = conversation.setdefault("data", {})
+    try:
+        data["summary"] = summarize(data.get("summary", ""), messages[:start])
+    except llm_client.LLMError:
+        return conversation  # Keep the raw messages, fold again on a later turn
+
+    data["summarized_messages"] = data.get("summarized_messages", 0) + start
+    conversation["messages"] = messages[start:]
+    return conversation
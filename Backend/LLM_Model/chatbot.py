@@ -1,4 +1,14 @@
-from ..LLM_Model import llm_config as llm
+from ..LLM_Model import llm_client
+from ..LLM_Model import prompt_payload as payload
+from ..LLM_Model import conversation_store
+from ..LLM_Model import chat_history
+from ..LLM_Model import intent_engine
+from ..LLM_Model import serial_index
+from ..LLM_Model import semantic_router
+from ..LLM_Model import fleet_report
+from ..LLM_Model import snapshot_store
+from ..LLM_Model import answer_cache
+from ..Observability.instrumentation import instrument_node, run_report
 from ..Controller import Controller as ctrl
 from ..Embedd import vector_query as vector
 
@@ -12,7 +22,11 @@ import operator
 from typing_extensions import TypedDict
 
 from datetime import datetime
+import asyncio
+import contextvars
 import json
+import queue
+import threading
 
 
 class Equipment(BaseModel):
@@ -43,100 +57,57 @@ class State(TypedDict):
     current_batch_index: Optional[int]
     batch_results: Optional[list]
     user_prompt: Optional[str]
+    query_embedding: Optional[list]
+    errors: Optional[list]
 
 # ============ IMPROVED INTENT CLASSIFIER ============
 def classify_intent(state: State) -> dict:
     """Classify user intent to route to appropriate branch"""
     user_message = state["messages"][-1].content if state["messages"] else ""
     
-    user_lower = user_message.lower()
-    
-    # Extract serial number if present
-    import re
-    # Look for serial number patterns
-    serial_match = re.search(r'(?:serial|sn|#)\s*([A-Za-z0-9\-]+)', user_lower, re.IGNORECASE)
-    if not serial_match:
-        # Also check for "serial ABC123" pattern
-        serial_match = re.search(r'\b([A-Z][A-Z0-9\-]{2,})\b', user_lower)
-    
-    serial_number = serial_match.group(1) if serial_match else None
-    
-    # Check for specific equipment queries
-    has_specific_equipment = bool(serial_number)
-    
-    # Check for specific keywords in context
-    list_keywords = ["list all", "show all", "get all", "fetch all", "display all", "all equipment", "equipments list"]
-    maintenance_keywords = ["maintenance", "repair", "service", "fix", "issue", "maintain"]
-    monitoring_keywords = ["monitor", "health", "status", "performance", "condition", "sensor", "temperature", "pressure", "vibration"]
-    equipment_keywords = ["equipment", "device", "machine", "asset", "serial", "sn"]
-    
-    # Check for batch processing requests
-    batch_phrases = [
-        "details of all equipment",
-        "all equipment details",
-        "detailed report of all",
-        "comprehensive details for all",
-        "give me details of all equipment",
-        "show details for all equipment"
-    ]
-    
-    # Check for maintenance list
-    maintenance_list_phrases = [
-        "list all maintenance",
-        "show all maintenance",
-        "all maintenance logs",
-        "maintenance list",
-        "all maintenance records"
-    ]
-    
-    # Check for monitoring list
-    monitoring_list_phrases = [
-        "list all monitoring",
-        "show all monitoring",
-        "all monitoring data",
-        "monitoring list",
-        "all monitoring records"
-    ]
-    
-    # Determine intent
-    if any(phrase in user_lower for phrase in batch_phrases):
-        intent = "batch_equipment_details"
-    elif any(phrase in user_lower for phrase in maintenance_list_phrases):
-        intent = "list_all_maintenance"
-    elif any(phrase in user_lower for phrase in monitoring_list_phrases):
-        intent = "list_all_monitoring"
-    elif any(keyword in user_lower for keyword in list_keywords):
-        intent = "list_equipments"
-    elif has_specific_equipment:
-        # Check what type of query for specific equipment
-        if any(keyword in user_lower for keyword in maintenance_keywords):
-            intent = "maintenance_query"
-        elif any(keyword in user_lower for keyword in monitoring_keywords):
-            intent = "monitoring_query"
-        else:
-            # General equipment details query
-            intent = "fetch_equipment_details_node"
-    else:
-        intent = "general_chat"
+    # Phrase and keyword tables live in Backend/Resources/intent_rules.json, compiled once;
+    # only serials known to the equipments table count, so unknown strings never reach the DB
+    result = intent_engine.classify(user_message, serial_resolver=serial_index.resolve_serial)
+    # Optional: paraphrases the keywords missed are routed by embedding similarity
+    result = semantic_router.route(user_message, result, embedding=state.get("query_embedding"))
+    intent = result["intent"]
+    serial_number = result["serial_number"]
     
     return {
         "intent": intent,
         "serial_number": serial_number,
-        "has_specific_equipment": has_specific_equipment,
-        "query_type": "list" if intent == "list_equipments" else "details"
+        "has_specific_equipment": bool(serial_number),
+        "query_type": "list" if intent == "list_equipments" else "details",
+        # Reused by the RAG lookup of this turn
+        "query_embedding": result["embedding"] if result["embedding"] is not None else state.get("query_embedding")
     }
 
 # ============ NODE 1: INTENT CLASSIFICATION ============
+@instrument_node("chatbot")
 def intent_classifier_node(state: State) -> dict:
     """Route based on user intent"""
     intent_info = classify_intent(state)
     return intent_info
 
 # ============ NODE 2: GENERAL CHAT ============
+@instrument_node("chatbot")
 def general_chat_node(state: State) -> dict:
     """Handle general conversation"""
     
-    retrieved_context = vector.ask_question(state["user_prompt"])
+    retrieved_context = vector.ask_question(state["user_prompt"], embedding=state.get("query_embedding"))
+    
+    return general_chat_reply(state, retrieved_context)
+
+@instrument_node("chatbot", node="general_chat")
+async def ageneral_chat_node(state: State) -> dict:
+    """Async general conversation: index load and query embedding run concurrently"""
+    
+    retrieved_context = await vector.aask_question(state["user_prompt"], embedding=state.get("query_embedding"))
+    
+    return await asyncio.to_thread(general_chat_reply, state, retrieved_context)
+
+def general_chat_reply(state: State, retrieved_context: str) -> dict:
+    """LLM answer for general conversation with the retrieved context"""
     print("Response_Type: ", retrieved_context)
     
     system_prompt = f"""You are a helpful assistant for equipment management system. 
@@ -167,17 +138,18 @@ def general_chat_node(state: State) -> dict:
     - "To check maintenance history, please provide the equipment serial number."
     - "I can help you with equipment management. What would you like to know?"""
     
-    bot_response = llm.llm_model.invoke([
+    bot_response = llm_client.invoke([
         {
             "role": "system",
             "content": system_prompt
         },
-        *state["messages"]
-    ])
+        *chat_history.context(state)
+    ], priority="interactive")
     
     return {"messages": [bot_response]}
 
 # ============ NODE 3: LIST EQUIPMENTS ============
+@instrument_node("chatbot")
 def list_equipments_node(state: State) -> dict:
     """Fetch and list all equipments"""
     try:
@@ -186,13 +158,13 @@ def list_equipments_node(state: State) -> dict:
         
         if not equipments_data:
             system_prompt = "There are no equipments in the system. Please inform the user that no equipment data is currently available."
-            bot_response = llm.llm_model.invoke([
+            bot_response = llm_client.invoke([
                 {
                     "role": "system",
                     "content": system_prompt
                 },
-                *state["messages"][-1:]
-            ])
+                *chat_history.context(state)
+            ], priority="interactive")
             return {"messages": [bot_response]}
         
         # Format equipment list for display
@@ -215,13 +187,13 @@ def list_equipments_node(state: State) -> dict:
 Please provide this information to the user in a helpful way.
 IMPORTANT: Only mention equipment from this list. Do not add, modify, or invent any equipment data."""
         
-        bot_response = llm.llm_model.invoke([
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
+            *chat_history.context(state)
+        ], priority="interactive")
         
         equipments = [
             Equipment(
@@ -241,16 +213,17 @@ IMPORTANT: Only mention equipment from this list. Do not add, modify, or invent
     except Exception as e:
         print(f"Error in list_equipments_node: {str(e)}")
         system_prompt = "I encountered an issue while fetching the equipment list. Please try again later."
-        bot_response = llm.llm_model.invoke([
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
+            *chat_history.context(state)
+        ], priority="interactive")
         return {"messages": [bot_response], "errors": [str(e)]}
 
 # ============ NODE 4: FETCH EQUIPMENT DETAILS ============
+@instrument_node("chatbot")
 def fetch_equipment_details_node(state: State) -> dict:
     """Fetch comprehensive equipment details for a specific equipment"""
     serial_number = state.get("serial_number")
@@ -264,229 +237,155 @@ def fetch_equipment_details_node(state: State) -> dict:
         equipment_data = equipment_response.get("equipment", {})
         
         if not equipment_data:
-            system_prompt = f"Equipment with serial number '{serial_number}' was not found in the system. Please inform the user that this equipment does not exist."
-            bot_response = llm.llm_model.invoke([
-                {
-                    "role": "system",
-                    "content": system_prompt
-                },
-                *state["messages"][-1:]
-            ])
-            return {"messages": [bot_response]}
+            return equipment_details_reply(state, serial_number, None, {}, [])
         
         # Equipment exists, now fetch additional data
-        monitoring_data = {}
-        maintenance_logs = []
+        monitoring_data = fetch_monitoring_data(serial_number)
+        maintenance_logs = fetch_maintenance_logs(serial_number)
         
-        try:
-            monitoring_response = ctrl.fetch_monitoring_log(serial_number)
-            monitoring_data = monitoring_response.get("monitoring_data", {})
-        except Exception as e:
-            print(f"Error fetching monitoring data for {serial_number}: {e}")
-            monitoring_data = {}
+        return equipment_details_reply(state, serial_number, equipment_data, monitoring_data, maintenance_logs)
         
-        try:
-            maintenance_response = ctrl.fetch_equipment_maintenance_logs(serial_number)
-            maintenance_logs = maintenance_response.get("maintenance_logs", [])
-        except Exception as e:
-            print(f"Error fetching maintenance logs for {serial_number}: {e}")
-            maintenance_logs = []
-        
-        # Prepare comprehensive equipment information
-        equipment_info = f"""EQUIPMENT DETAILS for {serial_number}:
-
-        BASIC INFORMATION:
-        • Serial Number: {equipment_data.get('serial', 'N/A')}
-        • Name: {equipment_data.get('name', 'N/A')}
-        • Type: {equipment_data.get('type', 'N/A')}
-        • Maintenance Status: {equipment_data.get('maintenance_status', 'N/A')}"""
-                
-        # Add monitoring data if available
-        if monitoring_data:
-            equipment_info += "\n\nMONITORING DATA:"
-            if monitoring_data.get('timestamp'):
-                equipment_info += f"\n• Last Updated: {monitoring_data.get('timestamp')}"
-            if monitoring_data.get('health_score') is not None:
-                equipment_info += f"\n• Health Score: {monitoring_data.get('health_score')}"
-            if monitoring_data.get('temperature') is not None:
-                equipment_info += f"\n• Temperature: {monitoring_data.get('temperature')}°C"
-            if monitoring_data.get('pressure') is not None:
-                equipment_info += f"\n• Pressure: {monitoring_data.get('pressure')} psi"
-            if monitoring_data.get('vibration') is not None:
-                equipment_info += f"\n• Vibration: {monitoring_data.get('vibration')} mm/s"
-            if monitoring_data.get('status'):
-                equipment_info += f"\n• Overall Status: {monitoring_data.get('status')}"
-        else:
-            equipment_info += "\n\nMONITORING DATA: No monitoring data available"
-        
-        # Add maintenance logs if available
-        if maintenance_logs:
-            equipment_info += f"\n\nMAINTENANCE HISTORY ({len(maintenance_logs)} records):"
-            for i, log in enumerate(maintenance_logs[:5], 1):
-                date = log.get('date_reported', 'Unknown date')
-                issue = log.get('issue_description', 'No description')
-                severity = log.get('severity', 'Unknown')
-                equipment_info += f"\n{i}. Date: {date}, Issue: {issue[:50]}..., Severity: {severity}"
-            if len(maintenance_logs) > 5:
-                equipment_info += f"\n... and {len(maintenance_logs) - 5} more records"
-        else:
-            equipment_info += "\n\nMAINTENANCE HISTORY: No maintenance records found"
-        
-        system_prompt = f"""{equipment_info}
+    except Exception as e:
+        return equipment_details_error(state, serial_number, e)
 
-        Based on the above information, provide a comprehensive summary of the equipment.
-        IMPORTANT: 
-        1. Mention ALL available information shown above
-        2. If something is marked as "not available" or "no records", mention that fact
-        3. Do not invent or assume any additional information
-        4. Provide the information in a clear, helpful manner"""
-                
-        bot_response = llm.llm_model.invoke([
-            {
-                "role": "system",
-                "content": system_prompt
-            },
-            *state["messages"][-1:]
-        ])
-        
-        # Create Equipment object
-        equipment_obj = Equipment(
-            serial=equipment_data.get("serial", ""),
-            name=equipment_data.get("name"),
-            type=equipment_data.get("type"),
-            maintenance_status=equipment_data.get("maintenance_status", "not_needed")
+@instrument_node("chatbot", node="fetch_equipment_details")
+async def afetch_equipment_details_node(state: State) -> dict:
+    """Async equipment details: equipment, monitoring and maintenance fetched concurrently"""
+    serial_number = state.get("serial_number")
+    
+    if not serial_number:
+        return await ageneral_chat_node(state)
+    
+    try:
+        # Independent reads; a missing equipment simply discards the other two
+        equipment_response, monitoring_data, maintenance_logs = await asyncio.gather(
+            asyncio.to_thread(ctrl.fetch_equipment_by_serial, serial_number),
+            asyncio.to_thread(fetch_monitoring_data, serial_number),
+            asyncio.to_thread(fetch_maintenance_logs, serial_number)
         )
+        equipment_data = equipment_response.get("equipment", {})
         
-        return {
-            "messages": [bot_response],
-            "equipments": [equipment_obj],
-            "monitoring_logs": {serial_number: monitoring_data} if monitoring_data else {},
-            "maintenance_logs": {serial_number: maintenance_logs} if maintenance_logs else {},
-            "serial_number": serial_number
-        }
+        return await asyncio.to_thread(equipment_details_reply, state, serial_number, equipment_data, monitoring_data, maintenance_logs)
         
     except Exception as e:
-        print(f"Error in fetch_equipment_details_node: {str(e)}")
-        system_prompt = f"I encountered an issue while fetching details for equipment {serial_number}. Please try again."
-        bot_response = llm.llm_model.invoke([
+        return await asyncio.to_thread(equipment_details_error, state, serial_number, e)
+
+def fetch_monitoring_data(serial_number: str) -> dict:
+    try:
+        monitoring_response = ctrl.fetch_monitoring_log(serial_number)
+        return monitoring_response.get("monitoring_data", {})
+    except Exception as e:
+        print(f"Error fetching monitoring data for {serial_number}: {e}")
+        return {}
+
+def fetch_maintenance_logs(serial_number: str) -> list:
+    try:
+        maintenance_response = ctrl.fetch_equipment_maintenance_logs(serial_number)
+        return maintenance_response.get("maintenance_logs", [])
+    except Exception as e:
+        print(f"Error fetching maintenance logs for {serial_number}: {e}")
+        return []
+
+def equipment_details_reply(state: State, serial_number: str, equipment_data, monitoring_data: dict, maintenance_logs: list) -> dict:
+    """LLM summary of one equipment from already fetched data"""
+    if not equipment_data:
+        system_prompt = f"Equipment with serial number '{serial_number}' was not found in the system. Please inform the user that this equipment does not exist."
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
-        return {"messages": [bot_response], "errors": [str(e)]}
+            *chat_history.context(state)
+        ], priority="interactive")
+        return {"messages": [bot_response]}
+    
+    # Prepare comprehensive equipment information
+    equipment_info = f"""EQUIPMENT DETAILS for {serial_number}:
+
+    BASIC INFORMATION:
+    • Serial Number: {equipment_data.get('serial', 'N/A')}
+    • Name: {equipment_data.get('name', 'N/A')}
+    • Type: {equipment_data.get('type', 'N/A')}
+    • Maintenance Status: {equipment_data.get('maintenance_status', 'N/A')}"""
+            
+    # Add compact monitoring and maintenance statistics
+    equipment_info += "\n\n" + payload.build_prompt_payload(monitoring_data, maintenance_logs)
+    
+    system_prompt = f"""{equipment_info}
+
+    Based on the above information, provide a comprehensive summary of the equipment.
+    IMPORTANT: 
+    1. Mention ALL available information shown above
+    2. If something is marked as "not available" or "no records", mention that fact
+    3. Do not invent or assume any additional information
+    4. Provide the information in a clear, helpful manner"""
+            
+    bot_response = llm_client.invoke([
+        {
+            "role": "system",
+            "content": system_prompt
+        },
+        *chat_history.context(state)
+    ], priority="interactive")
+    
+    # Create Equipment object
+    equipment_obj = Equipment(
+        serial=equipment_data.get("serial", ""),
+        name=equipment_data.get("name"),
+        type=equipment_data.get("type"),
+        maintenance_status=equipment_data.get("maintenance_status", "not_needed")
+    )
+    
+    return {
+        "messages": [bot_response],
+        "equipments": [equipment_obj],
+        "monitoring_logs": {serial_number: monitoring_data} if monitoring_data else {},
+        "maintenance_logs": {serial_number: maintenance_logs} if maintenance_logs else {},
+        "serial_number": serial_number
+    }
+
+def equipment_details_error(state: State, serial_number: str, e: Exception) -> dict:
+    print(f"Error in fetch_equipment_details_node: {str(e)}")
+    system_prompt = f"I encountered an issue while fetching details for equipment {serial_number}. Please try again."
+    bot_response = llm_client.invoke([
+        {
+            "role": "system",
+            "content": system_prompt
+        },
+        *chat_history.context(state)
+    ], priority="interactive")
+    return {"messages": [bot_response], "errors": [str(e)]}
 
 # ============ NODE 5: BATCH EQUIPMENT DETAILS ============
+@instrument_node("chatbot")
 def batch_equipment_details_node(state: State) -> dict:
     """Fetch comprehensive details for all equipment in batch mode"""
     try:
-        # First, get all equipment
-        ctrl_response = ctrl.fetch_all_equipments()
-        all_equipments_data = ctrl_response.get("equipments", [])
+        # Pre-rendered per-equipment snapshots, kept current by monitoring and maintenance writes
+        fleet = snapshot_store.snapshots()
         
-        if not all_equipments_data:
+        if not fleet:
             system_prompt = "There are no equipments in the system to generate a detailed report."
-            bot_response = llm.llm_model.invoke([
+            bot_response = llm_client.invoke([
                 {
                     "role": "system",
                     "content": system_prompt
                 },
-                *state["messages"][-1:]
-            ])
+                *chat_history.context(state)
+            ], priority="interactive")
             return {"messages": [bot_response]}
         
-        # Process each equipment
-        detailed_reports = []
-        total_equipments = len(all_equipments_data)
-        
-        for idx, eq_data in enumerate(all_equipments_data, 1):
-            serial_number = eq_data.get('serial', f"Unknown-{idx}")
-            
-            # Prepare equipment summary
-            equipment_report = f"\n{'='*60}\nEQUIPMENT {idx} of {total_equipments}: {serial_number}\n{'='*60}\n"
-            
-            # Basic info
-            equipment_report += f"Name: {eq_data.get('name', 'N/A')}\n"
-            equipment_report += f"Type: {eq_data.get('type', 'N/A')}\n"
-            equipment_report += f"Maintenance Status: {eq_data.get('maintenance_status', 'N/A')}\n"
-            
-            # Fetch monitoring data
-            try:
-                monitoring_response = ctrl.fetch_monitoring_log(serial_number)
-                monitoring_data = monitoring_response.get("monitoring_data", {})
-                
-                if monitoring_data:
-                    equipment_report += "\nMONITORING DATA:\n"
-                    if monitoring_data.get('health_score') is not None:
-                        equipment_report += f"  • Health Score: {monitoring_data.get('health_score')}/100\n"
-                    if monitoring_data.get('temperature') is not None:
-                        equipment_report += f"  • Temperature: {monitoring_data.get('temperature')}°C\n"
-                    if monitoring_data.get('status'):
-                        equipment_report += f"  • Status: {monitoring_data.get('status')}\n"
-                    if monitoring_data.get('timestamp'):
-                        equipment_report += f"  • Last Updated: {monitoring_data.get('timestamp')}\n"
-                else:
-                    equipment_report += "\nMONITORING DATA: Not available\n"
-            except Exception as e:
-                equipment_report += "\nMONITORING DATA: Error fetching data\n"
-            
-            # Fetch maintenance logs
-            try:
-                maintenance_response = ctrl.fetch_equipment_maintenance_logs(serial_number)
-                maintenance_logs = maintenance_response.get("maintenance_logs", [])
-                
-                if maintenance_logs:
-                    equipment_report += f"\nMAINTENANCE HISTORY ({len(maintenance_logs)} records):\n"
-                    # Show only the latest 3 for brevity in batch mode
-                    for i, log in enumerate(maintenance_logs[:3], 1):
-                        date = log.get('date_reported', 'Unknown')
-                        issue = log.get('issue_description', 'No description')[:40]
-                        severity = log.get('severity', 'Unknown')
-                        equipment_report += f"  {i}. Date: {date}, Issue: {issue}..., Severity: {severity}\n"
-                else:
-                    equipment_report += "\nMAINTENANCE HISTORY: No records found\n"
-            except Exception as e:
-                equipment_report += "\nMAINTENANCE HISTORY: Error fetching data\n"
-            
-            detailed_reports.append(equipment_report)
-        
-        # Compile final report
-        full_report = f"COMPREHENSIVE EQUIPMENT DETAILS REPORT\n{'='*70}\n"
-        full_report += f"Total Equipment: {total_equipments}\n"
-        full_report += f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-        full_report += "=" * 70
-        
-        for report in detailed_reports:
-            full_report += report
-        
-        full_report += f"\n{'='*60}\nEND OF REPORT\n{'='*60}"
-        
-        # Create summary statistics
-        equipment_with_monitoring = 0
-        equipment_with_maintenance = 0
-        
-        for eq in all_equipments_data:
-            serial = eq.get('serial')
-            # Quick checks (simplified for batch mode)
-            try:
-                monitoring_response = ctrl.fetch_monitoring_log(serial)
-                if monitoring_response.get("monitoring_data"):
-                    equipment_with_monitoring += 1
-            except:
-                pass
-            
-            try:
-                maintenance_response = ctrl.fetch_equipment_maintenance_logs(serial)
-                if maintenance_response.get("maintenance_logs"):
-                    equipment_with_maintenance += 1
-            except:
-                pass
+        # Blocks are formatted lazily under the fleet-wide budget
+        report = fleet_report.batch_report(fleet)
+        full_report = report.getvalue()
+        total_equipments = len(fleet)
+        stats = fleet_report.coverage(fleet)
         
         summary = f"\nSUMMARY STATISTICS:\n"
         summary += f"• Total Equipment: {total_equipments}\n"
-        summary += f"• Equipment with Monitoring Data: {equipment_with_monitoring}\n"
-        summary += f"• Equipment with Maintenance Records: {equipment_with_maintenance}\n"
+        summary += f"• Equipment with Monitoring Data: {stats['with_monitoring']}\n"
+        summary += f"• Equipment with Maintenance Records: {stats['with_maintenance']}\n"
+        summary += f"• Equipment with Threshold Breaches: {stats['attention']}\n"
         
         system_prompt = f"""{full_report}{summary}
 
@@ -499,22 +398,23 @@ def batch_equipment_details_node(state: State) -> dict:
 
         IMPORTANT: Only reference data from the report above. Do not invent any information."""
         
-        bot_response = llm.llm_model.invoke([
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
+            *chat_history.context(state)
+        ], priority="interactive")
         
         # Store equipment objects
+        fleet_equipments = [record["equipment"] for record in fleet]
         equipments = [
             Equipment(
                 serial=eq.get("serial", ""),
                 name=eq.get("name"),
                 type=eq.get("type"),
                 maintenance_status=eq.get("maintenance_status", "not_needed")
-            ) for eq in all_equipments_data
+            ) for eq in fleet_equipments
         ]
         
         return {
@@ -522,22 +422,23 @@ def batch_equipment_details_node(state: State) -> dict:
             "equipments": equipments,
             "summaries": [f"Generated detailed report for {total_equipments} equipment"],
             "batch_mode": True,
-            "batch_results": detailed_reports
+            "batch_results": report.blocks
         }
         
     except Exception as e:
         print(f"Error in batch_equipment_details_node: {str(e)}")
         system_prompt = "I encountered an issue while generating the comprehensive equipment report. Please try again later."
-        bot_response = llm.llm_model.invoke([
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
+            *chat_history.context(state)
+        ], priority="interactive")
         return {"messages": [bot_response], "errors": [str(e)]}
 
 # ============ NODE 6: LIST ALL MAINTENANCE ============
+@instrument_node("chatbot")
 def list_all_maintenance_node(state: State) -> dict:
     """List all maintenance logs across all equipment"""
     try:
@@ -547,13 +448,13 @@ def list_all_maintenance_node(state: State) -> dict:
         
         if not all_maintenance_logs:
             system_prompt = "There are no maintenance logs in the system. Please inform the user that no maintenance records are currently available."
-            bot_response = llm.llm_model.invoke([
+            bot_response = llm_client.invoke([
                 {
                     "role": "system",
                     "content": system_prompt
                 },
-                *state["messages"][-1:]
-            ])
+                *chat_history.context(state)
+            ], priority="interactive")
             return {"messages": [bot_response]}
         
         # Organize by equipment
@@ -570,6 +471,7 @@ def list_all_maintenance_node(state: State) -> dict:
         maintenance_report += f"Equipment with Maintenance: {len(maintenance_by_equipment)}\n"
         maintenance_report += "=" * 70 + "\n"
         
+        equipment_blocks = []
         for idx, (serial, logs) in enumerate(maintenance_by_equipment.items(), 1):
             # Try to get equipment name
             equipment_name = "Unknown"
@@ -580,21 +482,11 @@ def list_all_maintenance_node(state: State) -> dict:
             except:
                 pass
             
-            maintenance_report += f"\n{'='*60}\nEQUIPMENT {idx}: {serial} ({equipment_name})\n"
-            maintenance_report += f"Total Records: {len(logs)}\n"
-            maintenance_report += "-" * 40 + "\n"
-            
-            # Show latest logs for this equipment
-            for i, log in enumerate(logs[:5], 1):
-                date = log.get('date_reported', 'Unknown date')
-                issue = log.get('issue_description', 'No description')[:60]
-                severity = log.get('severity', 'Unknown')
-                status = log.get('status', 'Unknown')
-                maintenance_report += f"{i}. Date: {date}\n   Issue: {issue}\n   Severity: {severity}, Status: {status}\n\n"
-            
-            if len(logs) > 5:
-                maintenance_report += f"... and {len(logs) - 5} more records\n"
+            block = f"\n{'='*60}\nEQUIPMENT {idx}: {serial} ({equipment_name})\n"
+            block += payload.build_maintenance_payload(logs, payload.FLEET_ASSET_TOKEN_BUDGET) + "\n"
+            equipment_blocks.append(block)
         
+        maintenance_report += payload.fit_blocks(equipment_blocks)
         maintenance_report += f"\n{'='*60}\nEND OF MAINTENANCE REPORT\n{'='*60}"
         
         system_prompt = f"""{maintenance_report}
@@ -608,13 +500,13 @@ Focus on:
 
 IMPORTANT: Only reference data from the report above. Do not invent any information."""
         
-        bot_response = llm.llm_model.invoke([
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
+            *chat_history.context(state)
+        ], priority="interactive")
         
         return {
             "messages": [bot_response],
@@ -625,136 +517,92 @@ IMPORTANT: Only reference data from the report above. Do not invent any informat
     except Exception as e:
         print(f"Error in list_all_maintenance_node: {str(e)}")
         system_prompt = "I encountered an issue while fetching all maintenance logs. Please try again later."
-        bot_response = llm.llm_model.invoke([
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
+            *chat_history.context(state)
+        ], priority="interactive")
         return {"messages": [bot_response], "errors": [str(e)]}
 
 # ============ NODE 7: LIST ALL MONITORING ============
+@instrument_node("chatbot")
 def list_all_monitoring_node(state: State) -> dict:
     """List all monitoring data across all equipment"""
     try:
-        # First get all equipment
-        equipment_response = ctrl.fetch_all_equipments()
-        all_equipments = equipment_response.get("equipments", [])
+        # Pre-rendered per-equipment snapshots, kept current by monitoring and maintenance writes
+        fleet = snapshot_store.snapshots()
         
-        if not all_equipments:
+        if not fleet:
             system_prompt = "There are no equipments in the system, so no monitoring data is available."
-            bot_response = llm.llm_model.invoke([
+            bot_response = llm_client.invoke([
                 {
                     "role": "system",
                     "content": system_prompt
                 },
-                *state["messages"][-1:]
-            ])
+                *chat_history.context(state)
+            ], priority="interactive")
             return {"messages": [bot_response]}
         
-        # Collect monitoring data for each equipment
-        monitoring_report = f"ALL MONITORING DATA REPORT\n{'='*70}\n"
-        monitoring_report += f"Total Equipment: {len(all_equipments)}\n"
-        monitoring_report += "=" * 70 + "\n"
-        
-        equipment_with_data = 0
-        monitoring_by_equipment = {}
-        
-        for idx, equipment in enumerate(all_equipments, 1):
-            serial = equipment.get('serial', f"Unknown-{idx}")
-            name = equipment.get('name', 'Unknown')
-            
-            try:
-                monitoring_response = ctrl.fetch_monitoring_log(serial)
-                monitoring_data = monitoring_response.get("monitoring_data", {})
-                
-                if monitoring_data:
-                    equipment_with_data += 1
-                    monitoring_by_equipment[serial] = monitoring_data
-                    
-                    monitoring_report += f"\n{'='*60}\nEQUIPMENT {idx}: {serial} ({name})\n"
-                    
-                    if monitoring_data.get('timestamp'):
-                        monitoring_report += f"Last Updated: {monitoring_data.get('timestamp')}\n"
-                    
-                    if monitoring_data.get('health_score') is not None:
-                        health_score = monitoring_data.get('health_score')
-                        status_indicator = "✅" if health_score >= 80 else "⚠️" if health_score >= 60 else "❌"
-                        monitoring_report += f"Health Score: {health_score}/100 {status_indicator}\n"
-                    
-                    if monitoring_data.get('temperature') is not None:
-                        monitoring_report += f"Temperature: {monitoring_data.get('temperature')}°C\n"
-                    
-                    if monitoring_data.get('pressure') is not None:
-                        monitoring_report += f"Pressure: {monitoring_data.get('pressure')} psi\n"
-                    
-                    if monitoring_data.get('status'):
-                        monitoring_report += f"Status: {monitoring_data.get('status')}\n"
-                else:
-                    monitoring_report += f"\n{'='*60}\nEQUIPMENT {idx}: {serial} ({name})\n"
-                    monitoring_report += "Monitoring Data: Not available\n"
-                    
-            except Exception as e:
-                monitoring_report += f"\n{'='*60}\nEQUIPMENT {idx}: {serial} ({name})\n"
-                monitoring_report += f"Monitoring Data: Error fetching data\n"
-        
-        monitoring_report += f"\n{'='*60}\nSUMMARY\n{'='*60}\n"
-        monitoring_report += f"Equipment with Monitoring Data: {equipment_with_data} of {len(all_equipments)}\n"
-        monitoring_report += f"Equipment without Data: {len(all_equipments) - equipment_with_data}\n"
-        monitoring_report += f"\n{'='*60}\nEND OF MONITORING REPORT\n{'='*60}"
+        monitoring_report = fleet_report.monitoring_report(fleet).getvalue()
+        equipment_with_data = fleet_report.coverage(fleet)["with_monitoring"]
+        monitoring_by_equipment = {
+            record["equipment"]["serial"]: record["readings"] for record in fleet if record["readings"]
+        }
         
         system_prompt = f"""{monitoring_report}
 
 Please provide a summary of all monitoring data.
 Focus on:
 1. Overall health status of equipment
-2. Equipment that needs attention (low health scores)
+2. Equipment that needs attention (threshold breaches, rising trends)
 3. Data availability across equipment
 4. Any concerning patterns in temperature/pressure
 
 IMPORTANT: Only reference data from the report above. Do not invent any information."""
         
-        bot_response = llm.llm_model.invoke([
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
+            *chat_history.context(state)
+        ], priority="interactive")
         
         return {
             "messages": [bot_response],
             "monitoring_logs": monitoring_by_equipment,
-            "summaries": [f"Listed monitoring data for {equipment_with_data} of {len(all_equipments)} equipment"]
+            "summaries": [f"Listed monitoring data for {equipment_with_data} of {len(fleet)} equipment"]
         }
         
     except Exception as e:
         print(f"Error in list_all_monitoring_node: {str(e)}")
         system_prompt = "I encountered an issue while fetching all monitoring data. Please try again later."
-        bot_response = llm.llm_model.invoke([
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
+            *chat_history.context(state)
+        ], priority="interactive")
         return {"messages": [bot_response], "errors": [str(e)]}
 
 # ============ NODE 8: MAINTENANCE QUERY ============
+@instrument_node("chatbot")
 def maintenance_query_node(state: State) -> dict:
     """Handle maintenance-specific queries for specific equipment"""
     serial_number = state.get("serial_number")
     
     if not serial_number:
         system_prompt = "To check maintenance records, I need the equipment serial number. Please provide the serial number (e.g., 'What is the maintenance history for serial ABC123?')."
-        bot_response = llm.llm_model.invoke([
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
+            *chat_history.context(state)
+        ], priority="interactive")
         return {"messages": [bot_response]}
     
     try:
@@ -764,13 +612,13 @@ def maintenance_query_node(state: State) -> dict:
         
         if not equipment_data:
             system_prompt = f"Equipment with serial number '{serial_number}' was not found in the system. Please inform the user that this equipment does not exist."
-            bot_response = llm.llm_model.invoke([
+            bot_response = llm_client.invoke([
                 {
                     "role": "system",
                     "content": system_prompt
                 },
-                *state["messages"][-1:]
-            ])
+                *chat_history.context(state)
+            ], priority="interactive")
             return {"messages": [bot_response]}
         
         # Equipment exists, fetch maintenance logs
@@ -784,59 +632,50 @@ def maintenance_query_node(state: State) -> dict:
         else:
             # Format maintenance information
             maintenance_info = f"MAINTENANCE RECORDS for {equipment_name} (Serial: {serial_number}):\n\n"
-            maintenance_info += f"Total records: {len(maintenance_logs)}\n\n"
-            
-            for i, log in enumerate(maintenance_logs[:10], 1):
-                date = log.get('date_reported', 'Unknown date')
-                issue = log.get('issue_description', 'No description')
-                severity = log.get('severity', 'Unknown')
-                status = log.get('status', 'Unknown')
-                maintenance_info += f"{i}. Date: {date}\n   Issue: {issue}\n   Severity: {severity}\n   Status: {status}\n\n"
-            
-            if len(maintenance_logs) > 10:
-                maintenance_info += f"... and {len(maintenance_logs) - 10} more records"
+            maintenance_info += payload.build_maintenance_payload(maintenance_logs, recent=10)
             
             system_prompt = f"""{maintenance_info}
 
 Provide this maintenance information to the user. 
 IMPORTANT: Only mention what's in the data above. Do not invent or assume any additional maintenance records."""
         
-        bot_response = llm.llm_model.invoke([
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
+            *chat_history.context(state)
+        ], priority="interactive")
         
         return {"messages": [bot_response]}
         
     except Exception as e:
         print(f"Error in maintenance_query_node: {str(e)}")
         system_prompt = f"Unable to retrieve maintenance data for equipment {serial_number}. Please inform the user that maintenance data is currently unavailable."
-        bot_response = llm.llm_model.invoke([
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
-        return {"messages": [bot_response]}
+            *chat_history.context(state)
+        ], priority="interactive")
+        return {"messages": [bot_response], "errors": [str(e)]}
 
 # ============ NODE 9: MONITORING QUERY ============
+@instrument_node("chatbot")
 def monitoring_query_node(state: State) -> dict:
     """Handle monitoring-specific queries for specific equipment"""
     serial_number = state.get("serial_number")
     
     if not serial_number:
         system_prompt = "To check monitoring data, I need the equipment serial number. Please provide the serial number (e.g., 'What is the health status for serial ABC123?')."
-        bot_response = llm.llm_model.invoke([
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
+            *chat_history.context(state)
+        ], priority="interactive")
         return {"messages": [bot_response]}
     
     try:
@@ -846,13 +685,13 @@ def monitoring_query_node(state: State) -> dict:
         
         if not equipment_data:
             system_prompt = f"Equipment with serial number '{serial_number}' was not found in the system. Please inform the user that this equipment does not exist."
-            bot_response = llm.llm_model.invoke([
+            bot_response = llm_client.invoke([
                 {
                     "role": "system",
                     "content": system_prompt
                 },
-                *state["messages"][-1:]
-            ])
+                *chat_history.context(state)
+            ], priority="interactive")
             return {"messages": [bot_response]}
         
         # Equipment exists, fetch monitoring data
@@ -866,46 +705,34 @@ def monitoring_query_node(state: State) -> dict:
         else:
             # Format monitoring information
             monitoring_info = f"MONITORING DATA for {equipment_name} (Serial: {serial_number}):\n\n"
-            
-            if monitoring_data.get('timestamp'):
-                monitoring_info += f"• Last Updated: {monitoring_data.get('timestamp')}\n"
-            if monitoring_data.get('health_score') is not None:
-                monitoring_info += f"• Health Score: {monitoring_data.get('health_score')}/100\n"
-            if monitoring_data.get('temperature') is not None:
-                monitoring_info += f"• Temperature: {monitoring_data.get('temperature')}°C\n"
-            if monitoring_data.get('pressure') is not None:
-                monitoring_info += f"• Pressure: {monitoring_data.get('pressure')} psi\n"
-            if monitoring_data.get('vibration') is not None:
-                monitoring_info += f"• Vibration: {monitoring_data.get('vibration')} mm/s\n"
-            if monitoring_data.get('status'):
-                monitoring_info += f"• Overall Status: {monitoring_data.get('status')}\n"
+            monitoring_info += payload.build_monitoring_payload(monitoring_data) + "\n"
             
             system_prompt = f"""{monitoring_info}
 
 Provide this monitoring information to the user.
 IMPORTANT: Only mention what's in the data above. Do not invent or assume any additional monitoring data."""
         
-        bot_response = llm.llm_model.invoke([
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
+            *chat_history.context(state)
+        ], priority="interactive")
         
         return {"messages": [bot_response]}
         
     except Exception as e:
         print(f"Error in monitoring_query_node: {str(e)}")
         system_prompt = f"Unable to retrieve monitoring data for equipment {serial_number}. Please inform the user that monitoring data is currently unavailable."
-        bot_response = llm.llm_model.invoke([
+        bot_response = llm_client.invoke([
             {
                 "role": "system",
                 "content": system_prompt
             },
-            *state["messages"][-1:]
-        ])
-        return {"messages": [bot_response]}
+            *chat_history.context(state)
+        ], priority="interactive")
+        return {"messages": [bot_response], "errors": [str(e)]}
 
 # ============ ROUTING LOGIC ============
 def route_after_intent(state: State) -> str:
@@ -927,98 +754,198 @@ def route_after_intent(state: State) -> str:
     return routing.get(intent, "general_chat_node")
 
 # ============ BUILD THE GRAPH ============
-graph_builder = StateGraph(State)
-
-# Add nodes
-graph_builder.add_node("intent_classifier", intent_classifier_node)
-graph_builder.add_node("general_chat_node", general_chat_node)
-graph_builder.add_node("list_equipments_node", list_equipments_node)
-graph_builder.add_node("fetch_equipment_details_node", fetch_equipment_details_node)
-graph_builder.add_node("maintenance_query_node", maintenance_query_node)
-graph_builder.add_node("monitoring_query_node", monitoring_query_node)
-graph_builder.add_node("batch_equipment_details_node", batch_equipment_details_node)
-graph_builder.add_node("list_all_maintenance_node", list_all_maintenance_node)
-graph_builder.add_node("list_all_monitoring_node", list_all_monitoring_node)
-
-# Add edges
-graph_builder.add_edge(START, "intent_classifier")
-graph_builder.add_conditional_edges(
-    "intent_classifier",
-    route_after_intent,
-    {
-        "general_chat_node": "general_chat_node",
-        "list_equipments_node": "list_equipments_node",
-        "fetch_equipment_details_node": "fetch_equipment_details_node",
-        "maintenance_query_node": "maintenance_query_node",
-        "monitoring_query_node": "monitoring_query_node",
-        "batch_equipment_details_node": "batch_equipment_details_node",
-        "list_all_maintenance_node": "list_all_maintenance_node",
-        "list_all_monitoring_node": "list_all_monitoring_node"
+def build_graph(overrides: dict = None):
+    """Compile the chat graph; overrides swaps node implementations (e.g. async variants)"""
+    nodes = {
+        "general_chat_node": general_chat_node,
+        "list_equipments_node": list_equipments_node,
+        "fetch_equipment_details_node": fetch_equipment_details_node,
+        "maintenance_query_node": maintenance_query_node,
+        "monitoring_query_node": monitoring_query_node,
+        "batch_equipment_details_node": batch_equipment_details_node,
+        "list_all_maintenance_node": list_all_maintenance_node,
+        "list_all_monitoring_node": list_all_monitoring_node
     }
-)
+    nodes.update(overrides or {})
+    
+    graph_builder = StateGraph(State)
+    
+    # Add nodes
+    graph_builder.add_node("intent_classifier", intent_classifier_node)
+    for name, node in nodes.items():
+        graph_builder.add_node(name, node)
+    
+    # Add edges
+    graph_builder.add_edge(START, "intent_classifier")
+    graph_builder.add_conditional_edges(
+        "intent_classifier",
+        route_after_intent,
+        {name: name for name in nodes}
+    )
+    
+    # All nodes end here
+    for name in nodes:
+        graph_builder.add_edge(name, END)
+    
+    return graph_builder.compile()
 
-# All nodes end here
-graph_builder.add_edge("general_chat_node", END)
-graph_builder.add_edge("list_equipments_node", END)
-graph_builder.add_edge("fetch_equipment_details_node", END)
-graph_builder.add_edge("maintenance_query_node", END)
-graph_builder.add_edge("monitoring_query_node", END)
-graph_builder.add_edge("batch_equipment_details_node", END)
-graph_builder.add_edge("list_all_maintenance_node", END)
-graph_builder.add_edge("list_all_monitoring_node", END)
+graph = build_graph()
 
-graph = graph_builder.compile()
+# Run with ainvoke: I/O-bound nodes gather their independent fetches, the rest run in worker threads
+async_graph = build_graph({
+    "general_chat_node": ageneral_chat_node,
+    "fetch_equipment_details_node": afetch_equipment_details_node
+})
 
 # ============ CHAT INTERFACE ============
-state = {
-    "messages": [],
-    "intent": None,
-    "equipments": None,
-    "monitoring_logs": None,
-    "maintenance_logs": None,
-    "equipment_query": None,
-    "serial_number": None,
-    "query_type": None,
-    "has_specific_equipment": False,
-    "batch_mode": False,
-    "current_batch_index": 0,
-    "batch_results": []
-}
+DEFAULT_SESSION = "default"
 
-def chat_model(message: str):
-    global state
-    
-    state["user_prompt"] = message
-    
-    # Add user message
-    user_message = {"role": "user", "content": message}
-    if "messages" not in state:
-        state["messages"] = []
-    state["messages"].append(user_message)
+def initial_state() -> dict:
+    """Fresh per-turn graph state; only the messages carry over between turns"""
+    return {
+        "messages": [],
+        "intent": None,
+        "equipments": None,
+        "monitoring_logs": None,
+        "maintenance_logs": None,
+        "equipment_query": None,
+        "serial_number": None,
+        "query_type": None,
+        "has_specific_equipment": False,
+        "batch_mode": False,
+        "current_batch_index": 0,
+        "batch_results": [],
+        "query_embedding": None,
+        "errors": None
+    }
+
+def stream_graph(turn_state: dict, emit) -> dict:
+    """Run the graph, emitting node progress and LLM tokens as they arrive; returns the final state"""
+    result = turn_state
+    for mode, chunk in graph.stream(turn_state, stream_mode=["updates", "messages", "values"]):
+        if mode == "messages":
+            message, metadata = chunk
+            if message.content and getattr(message, "type", "") in ("ai", "AIMessageChunk"):
+                emit({"type": "token", "node": metadata.get("langgraph_node"), "content": str(message.content)})
+        elif mode == "updates":
+            for node in chunk:
+                emit({"type": "node", "node": node})
+        else:
+            result = chunk
+    return result
+
+def cached_reply(cached: dict, emit=None) -> tuple:
+    """(bot message, response) for an answer served from the answer cache"""
+    response = cached["answer"]
+    if emit is not None:
+        emit({"type": "node", "node": "answer_cache"})
+        emit({"type": "token", "node": "answer_cache", "content": response})
+    return {"role": "assistant", "content": response}, response
+
+def turn_reply(cached: dict, result: dict, standalone: bool) -> tuple:
+    """(bot message, response) from the graph result; clean answers are offered to the answer cache"""
+    if not result.get("messages"):
+        return None, "I apologize, but I couldn't generate a response."
     
-    # Invoke the graph
-    result = graph.invoke(state)
+    # Get the last message (bot response)
+    bot_message = conversation_store.to_stored_message(result["messages"][-1])
+    if not result.get("errors"):
+        answer_cache.store(cached, result.get("intent"), result.get("serial_number"), bot_message["content"], standalone)
+    return bot_message, bot_message["content"]
+
+def chat_model(message: str, session_id: str = DEFAULT_SESSION, emit=None):
+    """Run one chat turn inside the given session's conversation; pass emit to stream events"""
+    store = conversation_store.get_store()
+    
+    # Turns of the same session are serialized, different sessions run in parallel
+    with store.session(session_id) as conversation:
+        user_message = {"role": "user", "content": message}
+        standalone = not conversation["messages"]
+        
+        # Near-duplicate questions over unchanged data are answered without the graph or the LLM,
+        # but only when no earlier turn could have changed what the question means
+        cached = answer_cache.lookup(message)
+        if cached["answer"] is not None and standalone:
+            bot_message, response = cached_reply(cached, emit)
+        else:
+            turn_state = initial_state()
+            turn_state["user_prompt"] = message
+            turn_state["query_embedding"] = cached["embedding"]  # Reused by routing and retrieval
+            # Cached summary + last K turns within the token budget, not the whole history
+            turn_state["messages"] = chat_history.build_turn_messages(conversation, user_message)
+            
+            # Invoke the graph
+            with run_report("chatbot"):
+                result = graph.invoke(turn_state) if emit is None else stream_graph(turn_state, emit)
+            
+            bot_message, response = turn_reply(cached, result, standalone)
+        
+        conversation["messages"].append(user_message)
+        if bot_message:
+            conversation["messages"].append(bot_message)
+        
+        # Older turns are folded into the cached summary (an LLM call only every few turns)
+        with run_report("chatbot"):
+            chat_history.fold_history(conversation)
     
-    # Update state with result (but keep message history)
-    if "messages" in result:
-        # Add bot response to messages
-        state["messages"].append(result["messages"][-1])
-    else:
-        # Update other fields
-        for key, value in result.items():
-            if key != "messages":
-                state[key] = value
+    return response
+
+async def achat_model(message: str, session_id: str = DEFAULT_SESSION):
+    """Async chat turn on async_graph; the session lock, load and save never block the event loop"""
+    store = conversation_store.get_store()
     
-    # Get the last message (bot response)
-    if state.get("messages"):
-        last_message = state["messages"][-1]
-        if hasattr(last_message, 'model_dump'):
-            out_res = last_message.model_dump()
+    async with store.asession(session_id) as conversation:
+        user_message = {"role": "user", "content": message}
+        standalone = not conversation["messages"]
+        
+        cached = await asyncio.to_thread(answer_cache.lookup, message)
+        if cached["answer"] is not None and standalone:
+            bot_message, response = cached_reply(cached)
         else:
-            out_res = last_message
+            turn_state = initial_state()
+            turn_state["user_prompt"] = message
+            turn_state["query_embedding"] = cached["embedding"]
+            turn_state["messages"] = chat_history.build_turn_messages(conversation, user_message)
+            
+            with run_report("chatbot"):
+                result = await async_graph.ainvoke(turn_state)
+            
+            bot_message, response = turn_reply(cached, result, standalone)
+        
+        conversation["messages"].append(user_message)
+        if bot_message:
+            conversation["messages"].append(bot_message)
         
-        response = out_res.get("content", "") if isinstance(out_res, dict) else str(out_res)
-    else:
-        response = "I apologize, but I couldn't generate a response."
+        with run_report("chatbot"):
+            await asyncio.to_thread(chat_history.fold_history, conversation)
     
-    return response
\ No newline at end of file
+    return response
+
+def chat_model_stream(message: str, session_id: str = DEFAULT_SESSION):
+    """Yield session, node, token and done/error events for one chat turn"""
+    events = queue.Queue()
+    
+    def run_turn():
+        try:
+            with llm_client.streaming():
+                response = chat_model(message, session_id, emit=events.put)
+            # Tokens of a retried or failed call may have been sent; the final message is authoritative
+            events.put({"type": "done", "message": response, "session_id": session_id})
+        except llm_client.LLMUnavailableError:
+            events.put({"type": "error", "status": 503, "detail": "The language model is temporarily unavailable, please retry shortly"})
+        except llm_client.LLMTimeoutError:
+            events.put({"type": "error", "status": 504, "detail": "The language model did not respond in time"})
+        except Exception as e:
+            print(f"Error in chat stream: {str(e)}")
+            events.put({"type": "error", "status": 500, "detail": "The chat turn failed"})
+        finally:
+            events.put(None)
+    
+    # The turn runs in its own thread so session locks and run reports never span yields;
+    # the copied context keeps the request's trace span as parent
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(run_turn,), name="chat-stream", daemon=True).start()
+    
+    yield {"type": "session", "session_id": session_id}
+    while (event := events.get()) is not None:
+        yield event
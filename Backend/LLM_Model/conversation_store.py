@@ -0,0 +1,353 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta
+
+import sqlalchemy as sql
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ============ CONFIG ============
+CHAT_STORE_BACKEND = os.getenv("CHAT_STORE_BACKEND", "memory")           # memory | sql
+CHAT_STORE_URL = os.getenv("CHAT_STORE_URL", "sqlite:///chat_sessions.db")  # any SQLAlchemy URL (SQLite, Postgres)
+CHAT_SESSION_TTL_S = float(os.getenv("CHAT_SESSION_TTL_S", "3600"))
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "1000"))
+CHAT_STORE_MAX_BYTES = int(os.getenv("CHAT_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+CHAT_MAX_MESSAGES = int(os.getenv("CHAT_MAX_MESSAGES", "200"))  # hard cap per session, oldest dropped first
+CHAT_STORE_SAVE_RETRIES = int(os.getenv("CHAT_STORE_SAVE_RETRIES", "5"))  # compare-and-swap attempts per save
+
+
+# ============ HELPER FUNCTIONS ============
+def to_stored_message(message) -> dict:
+    """Plain {role, content} dict for a LangChain message or an OpenAI-style dict"""
+    if isinstance(message, dict):
+        return {"role": message.get("role", "user"), "content": str(message.get("content", ""))}
+    role = {"human": "user", "ai": "assistant", "system": "system"}.get(getattr(message, "type", ""), "assistant")
+    return {"role": role, "content": str(getattr(message, "content", message))}
+
+def new_conversation() -> dict:
+    return {"messages": [], "data": {}}
+
+def conversation_size(conversation: dict) -> int:
+    """Approximate bytes held by a conversation"""
+    size = sys.getsizeof(conversation)
+    for message in conversation.get("messages", []):
+        size += 120 + len(message.get("content", ""))
+    return size + len(json.dumps(conversation.get("data", {}), default=str))
+
+def _trim(conversation: dict) -> dict:
+    if len(conversation["messages"]) > CHAT_MAX_MESSAGES:
+        conversation["messages"] = conversation["messages"][-CHAT_MAX_MESSAGES:]
+    return conversation
+
+
+def _appended(conversation: dict, loaded_ids: set) -> list:
+    """Messages added during the turn; history folding only drops loaded messages, never copies them"""
+    return [message for message in conversation["messages"] if id(message) not in loaded_ids]
+
+
+# ============ STORE BASE ============
+class _SessionLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0  # holders plus waiters
+
+
+class ConversationStore(ABC):
+    """Session-keyed conversations; session() serializes turns of one session in this process and saves on exit.
+    Backends shared by several workers must also make save() safe against concurrent turns elsewhere"""
+
+    def __init__(self):
+        self._locks = {}  # only sessions with a holder or a waiter, so the map stays bounded
+        self._locks_guard = threading.Lock()
+
+    def _checkout(self, session_id: str) -> _SessionLock:
+        with self._locks_guard:
+            entry = self._locks.get(session_id)
+            if entry is None:
+                entry = self._locks[session_id] = _SessionLock()
+            entry.users += 1
+            return entry
+
+    def _checkin(self, session_id: str, entry: _SessionLock):
+        # Dropped only when nobody holds or waits on it, so one session never ends up with two locks
+        with self._locks_guard:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._locks[session_id]
+
+    @contextmanager
+    def session(self, session_id: str):
+        """Exclusive access to one session's conversation for the duration of a turn"""
+        entry = self._checkout(session_id)
+        try:
+            with entry.lock:
+                conversation = self.load(session_id) or new_conversation()
+                loaded_ids = {id(message) for message in conversation["messages"]}
+                yield conversation
+                self.save(session_id, _trim(conversation), _appended(conversation, loaded_ids))
+        finally:
+            self._checkin(session_id, entry)
+
+    @asynccontextmanager
+    async def asession(self, session_id: str):
+        """session() for coroutines: lock wait, load and save run off the event loop"""
+        entry = self._checkout(session_id)
+        acquire = asyncio.ensure_future(asyncio.to_thread(entry.lock.acquire))
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            def abandon(_):
+                # Release once the abandoned wait gets it
+                entry.lock.release()
+                self._checkin(session_id, entry)
+            acquire.add_done_callback(abandon)
+            raise
+        try:
+            conversation = await asyncio.to_thread(self.load, session_id) or new_conversation()
+            loaded_ids = {id(message) for message in conversation["messages"]}
+            yield conversation
+            await asyncio.to_thread(self.save, session_id, _trim(conversation), _appended(conversation, loaded_ids))
+        finally:
+            entry.lock.release()
+            self._checkin(session_id, entry)
+
+    @abstractmethod
+    def load(self, session_id: str):
+        """The session's conversation, or None"""
+
+    @abstractmethod
+    def save(self, session_id: str, conversation: dict, appended: list = None):
+        """Store the conversation; appended holds the messages this turn added to what load() returned"""
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Forget the session"""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Backend name and occupancy"""
+
+
+# ============ IN-MEMORY BACKEND ============
+class InMemoryConversationStore(ConversationStore):
+    """LRU ordered sessions with TTL expiry, a session count cap and a memory cap"""
+
+    def __init__(self, ttl_s: float = CHAT_SESSION_TTL_S, max_sessions: int = CHAT_MAX_SESSIONS, max_bytes: int = CHAT_STORE_MAX_BYTES):
+        super().__init__()
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()  # session_id -> (conversation, size, touched_at)
+        self._bytes = 0
+        self._guard = threading.Lock()
+        self._evictions = {"ttl": 0, "lru": 0, "memory": 0}
+
+    def _remove(self, session_id: str, reason: str = None):
+        _, size, _ = self._sessions.pop(session_id)
+        self._bytes -= size
+        if reason:
+            self._evictions[reason] += 1
+
+    def _evict(self, now: float):
+        # Oldest first: expired sessions, then over the count cap, then over the memory cap
+        while self._sessions:
+            session_id, (_, _, touched) = next(iter(self._sessions.items()))
+            if now - touched > self.ttl_s:
+                reason = "ttl"
+            elif len(self._sessions) > self.max_sessions:
+                reason = "lru"
+            elif self._bytes > self.max_bytes and len(self._sessions) > 1:
+                reason = "memory"
+            else:
+                break
+            self._remove(session_id, reason)
+
+    def load(self, session_id: str):
+        now = time.monotonic()
+        with self._guard:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if now - entry[2] > self.ttl_s:
+                self._remove(session_id, "ttl")
+                return None
+            self._sessions.move_to_end(session_id)
+            # Callers mutate their copy; the stored one is replaced on save
+            return {"messages": list(entry[0]["messages"]), "data": dict(entry[0]["data"])}
+
+    def save(self, session_id: str, conversation: dict, appended: list = None):
+        now = time.monotonic()
+        size = conversation_size(conversation)
+        with self._guard:
+            if session_id in self._sessions:
+                self._remove(session_id)
+            self._sessions[session_id] = (conversation, size, now)
+            self._bytes += size
+            self._evict(now)
+
+    def delete(self, session_id: str):
+        with self._guard:
+            if session_id in self._sessions:
+                self._remove(session_id)
+
+    def stats(self) -> dict:
+        with self._guard:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "evictions": dict(self._evictions),
+            }
+
+
+# ============ SQL BACKEND ============
+class SQLConversationStore(ConversationStore):
+    """Shared store for multiple workers; works with SQLite or Postgres through SQLAlchemy.
+    Each row carries a version: a save only lands on the version it loaded, and a turn that lost the race
+    to another worker is replayed on top of the newer conversation instead of overwriting it"""
+
+    def __init__(self, url: str = CHAT_STORE_URL, ttl_s: float = CHAT_SESSION_TTL_S):
+        super().__init__()
+        self.ttl_s = ttl_s
+        self.engine = sql.create_engine(url, pool_pre_ping=True)
+        self.metadata = sql.MetaData()
+        self.table = sql.Table(
+            "chat_sessions",
+            self.metadata,
+            sql.Column("session_id", sql.String(64), primary_key=True),
+            sql.Column("conversation", sql.Text, nullable=False),
+            sql.Column("updated_at", sql.DateTime, nullable=False, index=True),
+            sql.Column("version", sql.Integer, nullable=False, server_default="0"),
+        )
+        self.metadata.create_all(self.engine)
+        self._add_version_column()
+        self._last_sweep = 0.0
+        self.stats_counts = {"save_conflicts": 0}
+
+    def _add_version_column(self):
+        # Tables created before the version column existed
+        columns = {column["name"] for column in sql.inspect(self.engine).get_columns("chat_sessions")}
+        if "version" not in columns:
+            with self.engine.begin() as conn:
+                conn.execute(sql.text("ALTER TABLE chat_sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+
+    def _sweep(self, conn):
+        # Expire idle sessions at most once a minute
+        now = time.monotonic()
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_s)
+        conn.execute(sql.delete(self.table).where(self.table.c.updated_at < cutoff))
+
+    def _read(self, conn, session_id: str):
+        """(conversation, version) of the stored row, an expired one as empty; None when there is no row"""
+        row = conn.execute(
+            sql.select(self.table.c.conversation, self.table.c.updated_at, self.table.c.version)
+            .where(self.table.c.session_id == session_id)
+        ).fetchone()
+        if row is None:
+            return None
+        if row.updated_at < datetime.utcnow() - timedelta(seconds=self.ttl_s):
+            return new_conversation(), row.version
+        return json.loads(row.conversation), row.version
+
+    def load(self, session_id: str):
+        with self.engine.connect() as conn:
+            found = self._read(conn, session_id)
+        if found is None:
+            return None
+        conversation, version = found
+        conversation["_version"] = version  # Not persisted; the version save() compares against
+        return conversation
+
+    def _insert_new(self, conn, session_id: str, payload: str) -> bool:
+        """Insert unless another worker created the row first"""
+        values = {"session_id": session_id, "conversation": payload, "updated_at": datetime.utcnow(), "version": 1}
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif self.engine.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            exists = conn.execute(sql.select(self.table.c.session_id).where(self.table.c.session_id == session_id)).fetchone()
+            if exists:
+                return False
+            conn.execute(sql.insert(self.table).values(**values))
+            return True
+        return conn.execute(insert(self.table).values(**values).on_conflict_do_nothing()).rowcount == 1
+
+    def save(self, session_id: str, conversation: dict, appended: list = None):
+        version = conversation.get("_version")
+        stored = {key: value for key, value in conversation.items() if not key.startswith("_")}
+        for _ in range(CHAT_STORE_SAVE_RETRIES):
+            payload = json.dumps(stored, default=str)
+            with self.engine.begin() as conn:
+                if version is None:
+                    saved = self._insert_new(conn, session_id, payload)
+                else:
+                    saved = conn.execute(
+                        sql.update(self.table)
+                        .where(self.table.c.session_id == session_id, self.table.c.version == version)
+                        .values(conversation=payload, updated_at=datetime.utcnow(), version=version + 1)
+                    ).rowcount == 1
+                if saved:
+                    self._sweep(conn)
+                    conversation["_version"] = (version or 0) + 1
+                    return
+
+                # Another worker saved this session since it was loaded: replay this turn on its version
+                self.stats_counts["save_conflicts"] += 1
+                found = self._read(conn, session_id)
+            if found is None:
+                version = None  # Deleted meanwhile; start the session over with this turn
+                stored = {**stored, "messages": list(appended if appended is not None else stored["messages"])}
+                continue
+            latest, version = found
+            # Their derived data (summary) matches their messages, so it wins over ours
+            stored = _trim({
+                "messages": latest["messages"] + list(appended or []),
+                "data": {**stored.get("data", {}), **latest.get("data", {})}
+            })
+        raise RuntimeError(f"Chat session {session_id} kept changing during save, giving up after {CHAT_STORE_SAVE_RETRIES} attempts")
+
+    def delete(self, session_id: str):
+        with self.engine.begin() as conn:
+            conn.execute(sql.delete(self.table).where(self.table.c.session_id == session_id))
+
+    def stats(self) -> dict:
+        with self.engine.connect() as conn:
+            sessions = conn.execute(sql.select(sql.func.count()).select_from(self.table)).scalar()
+        return {"backend": "sql", "url": self.engine.url.render_as_string(hide_password=True), "sessions": sessions, **self.stats_counts}
+
+
+# ============ BACKEND SELECTION ============
+BACKENDS = {
+    "memory": InMemoryConversationStore,
+    "sql": SQLConversationStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store() -> ConversationStore:
+    """Process-wide store chosen by CHAT_STORE_BACKEND"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if CHAT_STORE_BACKEND not in BACKENDS:
+                    raise ValueError(f"Unknown chat store backend '{CHAT_STORE_BACKEND}'. Available: {', '.join(BACKENDS)}")
+                _store = BACKENDS[CHAT_STORE_BACKEND]()
+    return _store
@@ -0,0 +1,296 @@
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sql
+
+from ..LLM_Model import prompt_payload as payload
+from ..Model import equipments as eq
+
+# ============ CONFIG ============
+RECENT_MAINTENANCE = 3  # latest logs per equipment in fleet reports
+
+
+# ============ HELPER FUNCTIONS ============
+def _equipment_dict(row) -> dict:
+    return {
+        "id": row.id,
+        "name": row.name,
+        "manufacturer": row.manufacturer,
+        "model": row.model,
+        "serial": row.serial,
+        "installation_date": str(row.installation_date),
+        "location": row.location,
+        "status": row.status,
+        "maintenance_status": row.maintenance_status
+    }
+
+def _reading_dict(row) -> dict:
+    # Timestamps stay datetimes; only the blocks that make it into a report are formatted
+    return {
+        "id": row.id,
+        "equipment_serial": row.equipment_serial,
+        "timestamp": row.timestamp,
+        "status": row.status,
+        "reading_type": row.reading_type,
+        "value": row.value,
+        "unit": row.unit,
+        "location": row.location,
+        "threshold_min": row.threshold_min,
+        "threshold_max": row.threshold_max,
+        "breach": payload.is_breach(row.value, row.status, row.threshold_min, row.threshold_max)
+    }
+
+def _log_dict(log) -> dict:
+    """Same shape as prompt_payload.summarize_maintenance recent entries"""
+    return {
+        "date_reported": log.date_reported,
+        "severity": log.severity,
+        "status": log.status or ("resolved" if log.date_resolved else "open"),
+        "date_predicted": log.date_predicted,
+        "issue": str(log.issue_description or "")[:80]
+    }
+
+def _empty_maintenance() -> dict:
+    return {"total": 0, "by_status": {}, "by_severity": {}, "last_reported": None, "recent": []}
+
+
+# ============ FLEET STATUS ============
+def load_fleet_status(include_maintenance: bool = True, serial: str = None) -> list:
+    """One status record per equipment, in equipment list order, assembled from a fixed number of set-based queries
+    (latest reading per series, per-equipment aggregates, latest maintenance logs) whatever the fleet size.
+    serial loads the record of that equipment only"""
+    if serial is None:
+        equipments = eq.list_equipments()
+    else:
+        row = eq.select_equipment(serial)
+        equipments = [row] if row is not None else []
+
+    records = {}
+    for row in equipments:
+        records[row.serial] = {
+            "equipment": _equipment_dict(row),
+            "readings": [],
+            "monitoring": None,
+            "maintenance": _empty_maintenance() if include_maintenance else None,
+            "attention": False
+        }
+
+    for row in eq.list_latest_readings(serial):
+        record = records.get(row.equipment_serial)
+        if record is None:
+            continue
+        reading = _reading_dict(row)
+        record["readings"].append(reading)
+        record["attention"] = record["attention"] or reading["breach"]
+
+        # Per-equipment aggregates folded from the per-series ones
+        stats = record["monitoring"] or {"readings": 0, "breaches": 0, "last_reading_at": None, "last_breach_at": None}
+        stats["readings"] += row.readings
+        stats["breaches"] += int(row.breaches or 0)
+        if stats["last_reading_at"] is None or row.timestamp > stats["last_reading_at"]:
+            stats["last_reading_at"] = row.timestamp
+        if row.last_breach_at is not None and (stats["last_breach_at"] is None or row.last_breach_at > stats["last_breach_at"]):
+            stats["last_breach_at"] = row.last_breach_at
+        record["monitoring"] = stats
+
+    if include_maintenance:
+        for row in eq.maintenance_stats_by_equipment(serial):
+            record = records.get(row.equipment_serial)
+            if record is None:
+                continue
+            summary = record["maintenance"]
+            status = row.status or "open"
+            severity = row.severity or "unknown"
+            summary["total"] += row.logs
+            summary["by_status"][status] = summary["by_status"].get(status, 0) + row.logs
+            summary["by_severity"][severity] = summary["by_severity"].get(severity, 0) + row.logs
+            if row.last_reported is not None and (summary["last_reported"] is None or row.last_reported > summary["last_reported"]):
+                summary["last_reported"] = row.last_reported
+
+        # Newest first per equipment
+        for row in eq.list_recent_maintenance_logs(RECENT_MAINTENANCE, serial):
+            record = records.get(row.equipment_serial)
+            if record is not None:
+                record["maintenance"]["recent"].append(_log_dict(row))
+
+    return list(records.values())
+
+def coverage(records: list) -> dict:
+    """Summary statistics of a fleet status"""
+    return {
+        "total": len(records),
+        "with_monitoring": sum(1 for record in records if record["monitoring"]),
+        "with_maintenance": sum(1 for record in records if record["maintenance"] and record["maintenance"]["total"]),
+        "attention": sum(1 for record in records if record["attention"])
+    }
+
+
+# ============ BLOCKS ============
+def monitoring_lines(record: dict, token_budget: int) -> list:
+    stats = record["monitoring"]
+    if not stats:
+        return ["MONITORING: no data available"]
+    header = (
+        f"MONITORING: {stats['readings']} readings in {len(record['readings'])} series, {stats['breaches']} breaches; "
+        f"last reading {stats['last_reading_at']}, last breach {stats['last_breach_at'] or 'never'}"
+    )
+    budget = token_budget - payload.estimate_tokens(header) - 1
+    return [header] + payload.fit_lines([payload.format_reading(r) for r in record["readings"]], budget, "series")
+
+def maintenance_lines(record: dict, token_budget: int) -> list:
+    return payload.fit_lines(payload.format_maintenance(record["maintenance"] or _empty_maintenance()), token_budget, "records")
+
+def equipment_body(record: dict) -> str:
+    """Identity, latest readings and recent maintenance of one equipment"""
+    equipment = record["equipment"]
+    lines = [
+        f"Name: {equipment.get('name', 'N/A')}",
+        f"Type: {equipment.get('type', 'N/A')}",
+        f"Maintenance Status: {equipment.get('maintenance_status', 'N/A')}",
+        *monitoring_lines(record, payload.FLEET_ASSET_TOKEN_BUDGET),
+        *maintenance_lines(record, payload.FLEET_ASSET_TOKEN_BUDGET // 2),
+    ]
+    return "\n".join(lines)
+
+def monitoring_body(record: dict) -> str:
+    return "\n".join(monitoring_lines(record, payload.FLEET_ASSET_TOKEN_BUDGET))
+
+# Bodies are pre-rendered on snapshots (snapshot_store); only the numbered header is added per report
+def equipment_block(record: dict, idx: int, total: int) -> str:
+    body = record.get("detail_text") or equipment_body(record)
+    return f"{'='*60}\nEQUIPMENT {idx} of {total}: {record['equipment']['serial']}\n{'='*60}\n{body}"
+
+def monitoring_block(record: dict, idx: int) -> str:
+    equipment = record["equipment"]
+    body = record.get("monitoring_text") or monitoring_body(record)
+    return f"{'='*60}\nEQUIPMENT {idx}: {equipment['serial']} ({equipment.get('name') or 'Unknown'})\n{body}"
+
+def attention_first(records: list):
+    """(number, record) pairs with breaching equipment first, so a truncated report still names them"""
+    numbered = list(enumerate(records, 1))
+    return [pair for pair in numbered if pair[1]["attention"]] + [pair for pair in numbered if not pair[1]["attention"]]
+
+
+# ============ REPORTS ============
+def batch_report(records: list, token_budget: int = None) -> payload.ReportBuilder:
+    total = len(records)
+    report = payload.ReportBuilder(token_budget)
+    report.write(f"COMPREHENSIVE EQUIPMENT DETAILS REPORT\n{'='*70}\n")
+    report.write(f"Total Equipment: {total}\n")
+    report.write(f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    report.write("=" * 70)
+    report.add_blocks((equipment_block(record, idx, total) for idx, record in attention_first(records)), total)
+    report.write(f"\n{'='*60}\nEND OF REPORT\n{'='*60}")
+    return report
+
+def monitoring_report(records: list, token_budget: int = None) -> payload.ReportBuilder:
+    total = len(records)
+    stats = coverage(records)
+    report = payload.ReportBuilder(token_budget)
+    report.write(f"ALL MONITORING DATA REPORT\n{'='*70}\n")
+    report.write(f"Total Equipment: {total}\n")
+    report.write("=" * 70 + "\n")
+    report.add_blocks((monitoring_block(record, idx) for idx, record in attention_first(records)), total)
+    report.write(f"\n{'='*60}\nSUMMARY\n{'='*60}\n")
+    report.write(f"Equipment with Monitoring Data: {stats['with_monitoring']} of {total}\n")
+    report.write(f"Equipment without Data: {total - stats['with_monitoring']}\n")
+    report.write(f"Equipment with Threshold Breaches: {stats['attention']}\n")
+    report.write(f"\n{'='*60}\nEND OF MONITORING REPORT\n{'='*60}")
+    return report
+
+
+# ============ BENCHMARK ============
+READING_TYPES = [("vibration", "mm/s", 0.0, 4.5), ("temperature", "°C", 10.0, 85.0), ("pressure", "bar", 1.0, 8.0), ("current", "A", 0.0, 40.0)]
+MAINTENANCE_STATUSES = ["resolved", "closed", "in_progress", "open"]
+
+
+def _seed_fleet(engine, assets: int, readings_per_series: int, logs_per_asset: int):
+    """Synthetic fleet: every asset has one series per reading type and up to one log per status"""
+    eq.metadata.create_all(engine)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(eq.equipment_table.insert(), [
+            {"name": f"Asset {i}", "manufacturer": "Acme", "model": f"M{i % 50}", "serial": f"BENCH-{i:05d}",
+             "installation_date": start.date(), "location": f"Plant {i % 7}", "status": "operating", "maintenance_status": "not_needed"}
+            for i in range(assets)
+        ])
+        for i in range(assets):
+            readings = []
+            for reading_type, unit, low, high in READING_TYPES:
+                for k in range(readings_per_series):
+                    value = low + (high - low) * ((i * 7 + k * 13) % 100) / 95
+                    readings.append({
+                        "equipment_serial": f"BENCH-{i:05d}", "timestamp": start + timedelta(hours=k), "reading_type": reading_type,
+                        "value": value, "unit": unit, "location": "DE", "threshold_min": low, "threshold_max": high,
+                        "status": "warning" if value > high else "normal"
+                    })
+            conn.execute(eq.equipment_monitoring_table.insert(), readings)
+        conn.execute(eq.maintenance_log_table.insert(), [
+            {"raised_by": "bench", "equipment_serial": f"BENCH-{i:05d}", "issue_description": f"Synthetic issue {j} on asset {i}",
+             "date_reported": (start + timedelta(days=j)).date(), "severity": ["low", "medium", "high", "critical"][(i + j) % 4],
+             "status": MAINTENANCE_STATUSES[j]}
+            for i in range(assets) for j in range(min(logs_per_asset, len(MAINTENANCE_STATUSES)))
+        ])
+
+
+def _per_asset_report(equipments: list) -> str:
+    """Reference: the former batch node, two full-history queries per equipment and string +="""
+    total = len(equipments)
+    blocks = []
+    for idx, row in enumerate(equipments, 1):
+        block = f"\n{'='*60}\nEQUIPMENT {idx} of {total}: {row.serial}\n{'='*60}\n"
+        block += f"Name: {row.name}\n"
+        block += "\n" + payload.build_monitoring_payload(eq.list_equipment_monitoring_data(row.serial), payload.FLEET_ASSET_TOKEN_BUDGET) + "\n"
+        block += payload.build_maintenance_payload(eq.list_equipment_maintenance_logs(row.serial), payload.FLEET_ASSET_TOKEN_BUDGET // 2, recent=3) + "\n"
+        blocks.append(block)
+    report = f"COMPREHENSIVE EQUIPMENT DETAILS REPORT\n{'='*70}\n"
+    report += payload.fit_blocks(blocks)
+    return report
+
+
+def benchmark_fleet_report(assets: int = 5000, readings_per_series: int = 24, logs_per_asset: int = 3,
+                           legacy_assets: int = 200, db_url: str = "sqlite://") -> dict:
+    """Prompt build time of the set-based report vs per-asset fetches, on a synthetic fleet in a scratch database.
+    The per-asset path is timed on legacy_assets and extrapolated to the fleet"""
+    bench_engine = sql.create_engine(db_url)
+    start = time.perf_counter()
+    _seed_fleet(bench_engine, assets, readings_per_series, logs_per_asset)
+    seed_s = time.perf_counter() - start
+
+    # The equipments module reads through its global engine; point it at the scratch database for the run
+    previous_engine, previous_ready = eq.engine, eq._fleet_indexes_ready
+    eq.engine, eq._fleet_indexes_ready = bench_engine, False
+    try:
+        start = time.perf_counter()
+        records = load_fleet_status()
+        query_s = time.perf_counter() - start
+        start = time.perf_counter()
+        report = batch_report(records).getvalue()
+        format_s = time.perf_counter() - start
+
+        equipments = eq.list_equipments()[:legacy_assets]
+        start = time.perf_counter()
+        _per_asset_report(equipments)
+        legacy_s = time.perf_counter() - start
+    finally:
+        eq.engine, eq._fleet_indexes_ready = previous_engine, previous_ready
+        bench_engine.dispose()
+
+    legacy_fleet_s = legacy_s / max(len(equipments), 1) * assets
+    return {
+        "assets": assets,
+        "readings": assets * len(READING_TYPES) * readings_per_series,
+        "seed_s": round(seed_s, 2),
+        "set_based_query_s": round(query_s, 3),
+        "set_based_format_s": round(format_s, 3),
+        "set_based_total_s": round(query_s + format_s, 3),
+        "per_asset_s_estimated": round(legacy_fleet_s, 1),
+        "speedup": round(legacy_fleet_s / max(query_s + format_s, 1e-9), 1),
+        "report_tokens": payload.estimate_tokens(report),
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(benchmark_fleet_report(*(int(arg) for arg in sys.argv[1:3])))
@@ -0,0 +1,427 @@
+import os
+import time
+import warnings
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import Dict, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from ..Model import equipments as eq
+
+load_dotenv()
+
+# ============ CONFIG ============
+FORECAST_METHOD = os.getenv("FORECAST_METHOD", "ewma")            # "ewma" or "theil_sen"
+FORECAST_WINDOW = int(os.getenv("FORECAST_WINDOW", "16"))         # Most recent readings used per sensor
+FORECAST_HALFLIFE_DAYS = float(os.getenv("FORECAST_HALFLIFE_DAYS", "7"))
+FORECAST_HORIZON_DAYS = float(os.getenv("FORECAST_HORIZON_DAYS", "365"))
+FORECAST_Z = float(os.getenv("FORECAST_Z", "1.96"))               # Confidence interval width (95%)
+
+EPOCH = datetime(2000, 1, 1)
+EPOCH_UNIX_SECONDS = (EPOCH - datetime(1970, 1, 1)).total_seconds()
+
+
+class Forecast(BaseModel):
+    """Earliest projected threshold crossing of an equipment"""
+    equipment_serial: str
+    reading_type: Optional[str] = None
+    location: Optional[str] = None
+    threshold: Optional[str] = None  # "max" or "min"
+    slope_per_day: float = 0.0
+    days_to_threshold: Optional[float] = None
+    date_predicted: Optional[datetime] = None
+    date_lower: Optional[datetime] = None
+    date_upper: Optional[datetime] = None
+    method: str = FORECAST_METHOD
+
+
+# ============ TREND FITTING ============
+def fit_ewma_trend(t: np.ndarray, v: np.ndarray, halflife: float = FORECAST_HALFLIFE_DAYS):
+    """Exponentially weighted least-squares trend for every row of a (series, window) matrix.
+
+    NaN marks missing readings. Returns (level at the last reading, slope per day, slope standard error, last time).
+    """
+    mask = np.isfinite(v) & np.isfinite(t)
+    t0 = np.where(mask, t, -np.inf).max(axis=1)
+    dt = np.where(mask, t - t0[:, None], 0.0)
+    vz = np.where(mask, v, 0.0)
+    w = np.exp2(dt / halflife)
+    w *= mask
+
+    # Weighted sums, fused multiply-and-reduce per row
+    rowdot = lambda a, b: np.einsum("ij,ij->i", a, b)
+    wt = w * dt
+    sw = w.sum(axis=1)
+    swt = wt.sum(axis=1)
+    swv = rowdot(w, vz)
+    swtt = rowdot(wt, dt)
+    swtv = rowdot(wt, vz)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        safe_sw = np.where(sw > 0, sw, 1.0)
+        mean_t = swt / safe_sw
+        mean_v = swv / safe_sw
+        s_tt = swtt - swt * mean_t
+        s_tv = swtv - swt * mean_v
+        fitted = s_tt > 1e-12 * np.maximum(swtt, 1.0)
+        slope = np.where(fitted, s_tv / s_tt, 0.0)
+        level = mean_v - slope * mean_t  # Fitted value at dt == 0 (the last reading)
+
+        resid = vz - level[:, None] - slope[:, None] * dt
+        n_eff = sw * sw / np.maximum(rowdot(w, w), 1e-300)
+        dof = np.maximum(n_eff - 2, 1.0)
+        sigma2 = rowdot(w * resid, resid) / safe_sw * n_eff / dof
+        slope_se = np.where(fitted, np.sqrt(sigma2 / s_tt * sw / np.maximum(n_eff, 1.0)), np.inf)
+
+    return level, slope, slope_se, t0
+
+def fit_theil_sen_trend(t: np.ndarray, v: np.ndarray):
+    """Median of pairwise slopes (robust to outliers) for every row of a (series, window) matrix"""
+    mask = np.isfinite(v) & np.isfinite(t)
+    t0 = np.where(mask, t, -np.inf).max(axis=1)
+
+    i, j = np.triu_indices(v.shape[1], k=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dt = t[:, j] - t[:, i]
+        pair_slopes = (v[:, j] - v[:, i]) / dt
+    pair_slopes[~(mask[:, i] & mask[:, j]) | (dt == 0)] = np.nan
+
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)  # All-NaN rows
+        slope = np.nan_to_num(np.nanmedian(pair_slopes, axis=1))
+        level = np.nanmedian(np.where(mask, v - slope[:, None] * (t - t0[:, None]), np.nan), axis=1)
+        # Spread of the pairwise slopes as the uncertainty (1.4826 * MAD ~ standard deviation)
+        mad = np.nanmedian(np.abs(pair_slopes - slope[:, None]), axis=1)
+        n_pairs = np.maximum((~np.isnan(pair_slopes)).sum(axis=1), 1)
+        slope_se = np.where(np.isfinite(mad), 1.4826 * mad / np.sqrt(n_pairs), np.inf)
+
+    return level, slope, slope_se, t0
+
+
+# ============ THRESHOLD CROSSING ============
+def days_to_crossing(level, slope, slope_se, threshold_min, threshold_max, z: float = FORECAST_Z):
+    """Days until each series crosses a threshold, with a (sooner, later) confidence interval.
+
+    Returns (days, days_lower, days_upper, side) where side is +1 (max), -1 (min) or 0 (no crossing); inf means never.
+    """
+    shape = level.shape
+    days = np.full(shape, np.inf)
+    lower = np.full(shape, np.inf)
+    upper = np.full(shape, np.inf)
+    side = np.zeros(shape, dtype=np.int8)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        se = np.where(np.isfinite(slope_se), slope_se, 0.0)
+
+        up = (slope > 0) & np.isfinite(threshold_max)
+        gap = threshold_max - level
+        days = np.where(up, gap / slope, days)
+        lower = np.where(up, gap / (slope + z * se), lower)
+        upper = np.where(up & (slope - z * se > 0), gap / (slope - z * se), upper)
+        side = np.where(up, 1, side)
+
+        down = (slope < 0) & np.isfinite(threshold_min)
+        gap = level - threshold_min
+        days = np.where(down, gap / -slope, days)
+        lower = np.where(down, gap / (-slope + z * se), lower)
+        upper = np.where(down & (-slope - z * se > 0), gap / (-slope - z * se), upper)
+        side = np.where(down, -1, side)
+
+        # Already outside the band: crossing is now
+        above = np.isfinite(threshold_max) & (level >= threshold_max)
+        below = np.isfinite(threshold_min) & (level <= threshold_min)
+        outside = above | below
+        days = np.where(outside, 0.0, days)
+        lower = np.where(outside, 0.0, lower)
+        upper = np.where(outside, 0.0, upper)
+        side = np.where(above, 1, np.where(below, -1, side))
+
+    return np.maximum(days, 0.0), np.maximum(lower, 0.0), np.maximum(upper, 0.0), side
+
+def forecast_matrix(t, v, threshold_min, threshold_max, method: str = None, halflife: float = FORECAST_HALFLIFE_DAYS, z: float = FORECAST_Z):
+    """Vectorized forecast for a (series, window) matrix of times (days) and values"""
+    method = method or FORECAST_METHOD
+    if method == "theil_sen":
+        level, slope, slope_se, t0 = fit_theil_sen_trend(t, v)
+    else:
+        level, slope, slope_se, t0 = fit_ewma_trend(t, v, halflife)
+
+    days, lower, upper, side = days_to_crossing(level, slope, slope_se, threshold_min, threshold_max, z)
+    return {
+        "last_t": t0,
+        "level": level,
+        "slope": slope,
+        "slope_se": slope_se,
+        "days": days,
+        "days_lower": lower,
+        "days_upper": upper,
+        "side": side
+    }
+
+
+# ============ FLEET FORECAST ============
+def _to_days(value) -> Optional[float]:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    return (value - EPOCH).total_seconds() / 86400
+
+def _to_datetime(days: float) -> Optional[datetime]:
+    if not np.isfinite(days):
+        return None
+    try:
+        return EPOCH + timedelta(days=float(days))
+    except OverflowError:  # A near-flat upper bound can land past datetime.max
+        return None
+
+def build_series_matrix(monitoring_logs: Dict[str, list], window: int = FORECAST_WINDOW) -> dict:
+    """Pack the last `window` readings of every (serial, reading_type, location) series into NaN-padded matrices"""
+    # One pass over the dict rows into flat columns; grouping, ordering and the window cut happen in numpy
+    key_index = {}
+    index, days, values, mins, maxs = [], [], [], [], []
+    for serial, rows in monitoring_logs.items():
+        if not isinstance(rows, list):
+            continue
+        for row in rows:
+            value = row.get("value")
+            day = _to_days(row.get("timestamp"))
+            if day is None or value is None:
+                continue
+            key = (serial, row.get("reading_type"), row.get("location"))
+            i = key_index.get(key)
+            if i is None:
+                i = key_index[key] = len(key_index)
+            index.append(i)
+            days.append(day)
+            values.append(value)
+            mins.append(row.get("threshold_min"))
+            maxs.append(row.get("threshold_max"))
+
+    keys = list(key_index)
+    t = np.full((len(keys), window), np.nan)
+    v = np.full((len(keys), window), np.nan)
+    if not keys:
+        return {"keys": keys, "t": t, "v": v, "threshold_min": np.full(0, np.nan), "threshold_max": np.full(0, np.nan)}
+
+    index = np.asarray(index)
+    days = np.asarray(days)
+    order = np.lexsort((days, index))  # By series, then time; stable so the later row wins a timestamp tie
+    index, days = index[order], days[order]
+
+    counts = np.bincount(index, minlength=len(keys))
+    ends = np.cumsum(counts)
+    from_end = ends[index] - 1 - np.arange(len(index))  # 0 for the newest reading of each series
+    keep = from_end < window
+    column = np.minimum(counts, window)[index] - 1 - from_end
+    t[index[keep], column[keep]] = days[keep]
+    v[index[keep], column[keep]] = np.asarray(values, dtype=float)[order][keep]
+
+    # Thresholds come from each series' newest reading; None becomes NaN
+    last = order[ends - 1]
+    tmin = np.asarray(mins, dtype=float)[last]
+    tmax = np.asarray(maxs, dtype=float)[last]
+
+    return {"keys": keys, "t": t, "v": v, "threshold_min": tmin, "threshold_max": tmax}
+
+def series_matrix_from_rows(rows: list, window: int = FORECAST_WINDOW) -> dict:
+    """build_series_matrix for rows shaped like eq.list_recent_reading_columns: newest first per series, epoch seconds,
+    key and thresholds on the newest row only. Columns go straight into numpy, no dicts or datetimes per reading"""
+    n = len(rows)
+    rank = np.fromiter(map(itemgetter(0), rows), np.int64, n)
+    seconds = np.fromiter(map(itemgetter(1), rows), float, n)
+    values = np.fromiter(map(itemgetter(2), rows), float, n)
+
+    newest = [rows[i] for i in np.flatnonzero(rank == 1)]
+    keys = [tuple(row[3:6]) for row in newest]
+    t = np.full((len(keys), window), np.nan)
+    v = np.full((len(keys), window), np.nan)
+    thresholds = np.array([row[6:8] for row in newest], dtype=float).reshape(-1, 2)  # None becomes NaN
+    tmin, tmax = thresholds[:, 0], thresholds[:, 1]
+    if not keys:
+        return {"keys": keys, "t": t, "v": v, "threshold_min": tmin, "threshold_max": tmax}
+
+    index = np.cumsum(rank == 1) - 1
+    keep = rank <= window
+    counts = np.bincount(index[keep], minlength=len(keys))
+    column = counts[index] - rank  # Rank 1 (newest) lands in the last filled column
+    t[index[keep], column[keep]] = (seconds[keep] - EPOCH_UNIX_SECONDS) / 86400
+    v[index[keep], column[keep]] = values[keep]
+
+    return {"keys": keys, "t": t, "v": v, "threshold_min": tmin, "threshold_max": tmax}
+
+def fleet_forecasts(matrix: dict, serials, method: str = None, horizon_days: float = FORECAST_HORIZON_DAYS) -> Dict[str, Forecast]:
+    """One Forecast per serial from a series matrix, dated from its earliest crossing inside the horizon"""
+    method = method or FORECAST_METHOD
+    forecasts = {serial: Forecast(equipment_serial=serial, method=method) for serial in serials}
+    if not matrix["keys"]:
+        return forecasts
+
+    result = forecast_matrix(matrix["t"], matrix["v"], matrix["threshold_min"], matrix["threshold_max"], method=method)
+
+    # Earliest crossing per equipment: order candidates by equipment then days (stable, first series wins a tie)
+    serial_ids = {serial: i for i, serial in enumerate(forecasts)}
+    owner = np.fromiter((serial_ids[key[0]] for key in matrix["keys"]), np.int64, len(matrix["keys"]))
+    candidates = np.flatnonzero(result["days"] <= horizon_days)
+    order = candidates[np.lexsort((result["days"][candidates], owner[candidates]))]
+    earliest = order[np.r_[True, owner[order][1:] != owner[order][:-1]]] if len(order) else order
+
+    # Plain floats for the winners only; indexing numpy arrays one scalar at a time is slow
+    columns = zip(
+        earliest.tolist(), result["side"][earliest].tolist(), result["slope"][earliest].tolist(), result["days"][earliest].tolist(),
+        (result["last_t"] + result["days"])[earliest].tolist(),
+        (result["last_t"] + result["days_lower"])[earliest].tolist(),
+        (result["last_t"] + result["days_upper"])[earliest].tolist()
+    )
+    for i, side, slope, days, predicted, lower, upper in columns:
+        serial, reading_type, location = matrix["keys"][i]
+        forecasts[serial] = Forecast(
+            equipment_serial=serial,
+            reading_type=reading_type,
+            location=location,
+            threshold="max" if side > 0 else "min",
+            slope_per_day=slope,
+            days_to_threshold=days,
+            date_predicted=_to_datetime(predicted),
+            date_lower=_to_datetime(lower),
+            date_upper=_to_datetime(upper),
+            method=method
+        )
+
+    return forecasts
+
+def forecast_fleet(monitoring_logs: Dict[str, list], method: str = None, horizon_days: float = FORECAST_HORIZON_DAYS) -> Dict[str, Forecast]:
+    """Earliest projected threshold crossing per equipment; equipments without a crossing inside the horizon get no date"""
+    return fleet_forecasts(build_series_matrix(monitoring_logs), monitoring_logs, method, horizon_days)
+
+def forecast_fleet_from_db(serials: list = None, method: str = None, horizon_days: float = FORECAST_HORIZON_DAYS) -> Dict[str, Forecast]:
+    """forecast_fleet read straight from the monitoring table: one windowed column query instead of API-shaped dicts.
+    serials=None forecasts every equipment with readings"""
+    matrix = series_matrix_from_rows(eq.list_recent_reading_columns(FORECAST_WINDOW, serials))
+    if serials is None:
+        serials = dict.fromkeys(serial for serial, _, _ in matrix["keys"])
+    return fleet_forecasts(matrix, serials, method, horizon_days)
+
+def describe_forecast(forecast: Forecast) -> str:
+    """One line for prompts and reports"""
+    if forecast is None or forecast.date_predicted is None:
+        return f"No threshold crossing projected within {FORECAST_HORIZON_DAYS:g} days"
+
+    upper = forecast.date_upper.date() if forecast.date_upper else "beyond horizon"
+    return (
+        f"{forecast.reading_type}@{forecast.location} projected to cross its {forecast.threshold} threshold "
+        f"on {forecast.date_predicted.date()} (interval {forecast.date_lower.date()} to {upper}, "
+        f"slope {forecast.slope_per_day:.4g}/day, {forecast.method})"
+    )
+
+
+# ============ BENCHMARK ============
+def synthetic_monitoring_logs(n_assets: int, n_sensors: int, readings: int = FORECAST_WINDOW, seed: int = 0) -> Dict[str, list]:
+    """monitoring_logs shaped like the API returns them: per serial, one dict per reading"""
+    rng = np.random.default_rng(seed)
+    locations = ("inlet", "outlet", "bearing", "motor")
+    logs = {}
+    for asset in range(n_assets):
+        t = np.sort(rng.uniform(0, 30, size=(n_sensors, readings)), axis=1)
+        v = 50 + rng.normal(0, 0.05, size=(n_sensors, 1)) * t + rng.normal(0, 1, size=(n_sensors, readings))
+        missing = rng.random((n_sensors, readings)) < 0.05
+        rows = []
+        for s in range(n_sensors):
+            reading_type = f"sensor_{s}"
+            location = locations[s % len(locations)]
+            for j in range(readings):
+                rows.append({
+                    "reading_type": reading_type,
+                    "value": None if missing[s, j] else float(v[s, j]),
+                    "location": location,
+                    "timestamp": EPOCH + timedelta(days=float(t[s, j])),
+                    "threshold_min": 20.0,
+                    "threshold_max": 80.0
+                })
+        logs[f"SN-{asset:05d}"] = rows
+    return logs
+
+def reading_rows_from_logs(monitoring_logs: Dict[str, list], window: int = FORECAST_WINDOW) -> list:
+    """The same readings shaped like eq.list_recent_reading_columns returns them"""
+    series = {}
+    for serial, rows in monitoring_logs.items():
+        for row in rows:
+            if row["value"] is not None:
+                series.setdefault((serial, row["reading_type"], row["location"]), []).append(row)
+
+    unix_epoch = datetime(1970, 1, 1)
+    result = []
+    for key in sorted(series):
+        newest_first = sorted(series[key], key=lambda row: row["timestamp"], reverse=True)[:window]
+        for rank, row in enumerate(newest_first, 1):
+            newest = (*key, row["threshold_min"], row["threshold_max"]) if rank == 1 else (None,) * 5
+            result.append((rank, (row["timestamp"] - unix_epoch).total_seconds(), row["value"], *newest))
+    return result
+
+def benchmark_forecast(n_assets: int = 10_000, n_sensors: int = 20, readings: int = FORECAST_WINDOW, method: str = None, repeat: int = 3) -> dict:
+    """Time the fleet forecast end to end, from monitoring_logs dicts (API path) or query rows (database path)
+    to one Forecast per equipment; the query itself is timed by benchmark_forecast_db"""
+    logs = synthetic_monitoring_logs(n_assets, n_sensors, readings)
+    rows = reading_rows_from_logs(logs)
+
+    build, solve, total, column_build, column_total = [], [], [], [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        matrix = build_series_matrix(logs)
+        built = time.perf_counter()
+        forecast_matrix(matrix["t"], matrix["v"], matrix["threshold_min"], matrix["threshold_max"], method=method)
+        build.append(built - start)
+        solve.append(time.perf_counter() - built)
+
+        start = time.perf_counter()
+        forecasts = forecast_fleet(logs, method=method)
+        total.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        column_matrix = series_matrix_from_rows(rows)
+        column_build.append(time.perf_counter() - start)
+        fleet_forecasts(column_matrix, logs, method)
+        column_total.append(time.perf_counter() - start)
+
+    return {
+        "assets": n_assets,
+        "series": len(matrix["keys"]),
+        "readings_per_series": readings,
+        "method": method or FORECAST_METHOD,
+        "build_seconds": min(build),                # build_series_matrix: dict rows -> padded matrices
+        "forecast_seconds": min(solve),             # forecast_matrix on those matrices
+        "end_to_end_seconds": min(total),           # forecast_fleet: both of the above plus Forecast objects
+        "mean_end_to_end_seconds": sum(total) / len(total),
+        "column_build_seconds": min(column_build),  # series_matrix_from_rows: query rows -> padded matrices
+        "column_end_to_end_seconds": min(column_total),  # forecast_fleet_from_db without the query
+        "assets_with_crossing": sum(f.date_predicted is not None for f in forecasts.values())
+    }
+
+def benchmark_forecast_db(serials: list = None, method: str = None, repeat: int = 3) -> dict:
+    """Time forecast_fleet_from_db against the configured database, split into the query and the rest"""
+    query, total = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = eq.list_recent_reading_columns(FORECAST_WINDOW, serials)
+        query.append(time.perf_counter() - start)
+        forecasts = forecast_fleet_from_db(serials, method=method)
+        total.append(time.perf_counter() - start - query[-1])
+
+    return {
+        "dialect": eq.engine.dialect.name,
+        "assets": len(forecasts),
+        "rows": len(rows),
+        "query_seconds": min(query),               # list_recent_reading_columns: windowed query and fetch
+        "end_to_end_seconds": min(total),          # forecast_fleet_from_db: the query again plus the forecast
+    }
+
+
+if __name__ == "__main__":
+    print(benchmark_forecast())
+    print(benchmark_forecast(n_assets=1_000, readings=12, method="theil_sen"))
@@ -0,0 +1,241 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import List
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+load_dotenv()
+
+# ============ CONFIG ============
+INTENT_RULES_PATH = os.getenv("INTENT_RULES_PATH", "Backend/Resources/intent_rules.json")
+
+
+# ============ RULES ============
+class IntentRule(BaseModel):
+    name: str
+    priority: int = 0
+    terms: List[str] = []          # lowercase phrases or keywords, matched as substrings
+    requires_serial: bool = False  # only applies when the message names an equipment
+
+
+class IntentRules(BaseModel):
+    default_intent: str = "general_chat"
+    serial_patterns: List[str] = []  # run on the lowercased message; first capture group is the serial number
+    intents: List[IntentRule] = []
+
+
+def load_rules(path: str = None) -> IntentRules:
+    with open(path or INTENT_RULES_PATH, "r", encoding="utf-8") as f:
+        return IntentRules(**json.load(f))
+
+
+# ============ HELPER FUNCTIONS ============
+def _trie_pattern(terms) -> str:
+    """Prefix-factored alternation: one step per character instead of one try per term, longest term wins"""
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        alternatives = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alternatives:
+            return ""
+        body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+# ============ ENGINE ============
+class IntentEngine:
+    """All intent terms compiled into one regex; a single pass over the message finds every term occurrence"""
+
+    def __init__(self, rules: IntentRules):
+        self.rules = rules
+        self.intents = sorted(rules.intents, key=lambda rule: -rule.priority)
+        # Patterns run on the lowercased message (IGNORECASE is several times slower); the serial is cut from the original
+        self.serial_patterns = [re.compile(p) for p in rules.serial_patterns]
+        self._serial_patterns_ci = [re.compile(p, re.IGNORECASE) for p in rules.serial_patterns]
+        self._rules = [(rule.name, rule.priority, bool(rule.terms), rule.requires_serial) for rule in self.intents]
+
+        self._term_intents = {}
+        for rule in self.intents:
+            for term in rule.terms:
+                self._term_intents.setdefault(term.lower(), []).append(rule.name)
+        terms = sorted(self._term_intents)
+
+        # The lookahead reports the longest term starting at each position; shorter terms
+        # starting there are its prefixes and are added from this table
+        self._prefix_terms = {term: [other for other in terms if term.startswith(other)] for term in terms}
+        self._pattern = re.compile(f"(?=({_trie_pattern(terms)}))") if terms else None
+
+    def matches(self, text_lower: str) -> dict:
+        """intent -> matched terms, in order of appearance"""
+        hits = {}
+        if self._pattern is None:
+            return hits
+        for longest in self._pattern.findall(text_lower):
+            for term in self._prefix_terms[longest]:
+                for intent in self._term_intents[term]:
+                    hits.setdefault(intent, []).append(term)
+        return hits
+
+    def extract_serial(self, text: str, text_lower: str = None):
+        """Serial number in its original case"""
+        text_lower = text.lower() if text_lower is None else text_lower
+        if len(text_lower) != len(text):
+            # Lowercasing changed offsets (rare non-ASCII), fall back to case-insensitive patterns
+            for pattern in self._serial_patterns_ci:
+                match = pattern.search(text)
+                if match:
+                    return match.group(1)
+            return None
+        for pattern in self.serial_patterns:
+            match = pattern.search(text_lower)
+            if match:
+                return text[match.start(1):match.end(1)]
+        return None
+
+    def classify(self, text: str, serial_resolver=None) -> dict:
+        """Scored intents for a message; the top scoring one is the intent.
+        serial_resolver(text, candidate) may replace the regex candidate, e.g. with a known serial"""
+        text_lower = text.lower()
+        hits = self.matches(text_lower)
+        serial_number = self.extract_serial(text, text_lower)
+        if serial_resolver is not None:
+            serial_number = serial_resolver(text, serial_number)
+
+        # Priority decides, the number of matched terms only orders intents within a priority
+        scores = {}
+        for name, priority, has_terms, requires_serial in self._rules:
+            if requires_serial and not serial_number:
+                continue
+            terms = hits.get(name)
+            if has_terms and not terms:
+                continue
+            scores[name] = priority + min(len(terms or ()), 99) / 100
+
+        intent = max(scores, key=scores.get) if scores else self.rules.default_intent
+        return {
+            "intent": intent,
+            "serial_number": serial_number,
+            "scores": scores,
+            "matches": hits,
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> IntentEngine:
+    """Process-wide engine compiled from INTENT_RULES_PATH"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = IntentEngine(load_rules())
+    return _engine
+
+def reload_rules(path: str = None) -> IntentEngine:
+    """Recompile after editing the rules file"""
+    global _engine
+    engine = IntentEngine(load_rules(path))
+    with _engine_lock:
+        _engine = engine
+    return engine
+
+def classify(text: str, serial_resolver=None) -> dict:
+    return get_engine().classify(text, serial_resolver)
+
+
+# ============ BENCHMARK ============
+BENCHMARK_MESSAGES = [
+    "What's the current status of Turbine Generator #3?",
+    "When was the last maintenance on Conveyor Belt A-12?",
+    "What maintenance is scheduled for this week?",
+    "Show me failure patterns for hydraulic systems",
+    "list all equipment",
+    "show all maintenance logs",
+    "list all monitoring data please",
+    "give me details of all equipment",
+    "Can you give me a detailed report of all pumps and compressors?",
+    "what is the vibration trend for serial PMP-1042",
+    "sn CMP-220 temperature readings look high, is it overheating?",
+    "Has SN-0007 had any repair in the last six months?",
+    "details for serial HX-9",
+    "hello",
+    "What can you help me with?",
+    "How do I safely isolate a pump before service?",
+    "equipments list",
+    "fetch all assets in plant 2",
+    "Is there any open issue for serial BLR-77? The pressure sensor was flagged yesterday.",
+    "monitoring list for last week",
+    "Explain what the maintenance status 'overdue' means",
+    "thanks, that's all for now",
+]
+
+
+def _scan_classify(engine: IntentEngine, text: str) -> dict:
+    """Reference: one substring scan per term and intent, the way classify_intent used to match"""
+    lower = text.lower()
+    serial_number = engine.extract_serial(text)
+    for rule in engine.intents:
+        if rule.requires_serial and not serial_number:
+            continue
+        if not rule.terms or any(term in lower for term in rule.terms):
+            return {"intent": rule.name, "serial_number": serial_number}
+    return {"intent": engine.rules.default_intent, "serial_number": serial_number}
+
+
+def _scaled_rules(rules: IntentRules, extra_intents: int, terms_per_intent: int = 10) -> IntentRules:
+    """The real rules plus synthetic low-priority intents, to see how matching grows with the table"""
+    scaled = rules.model_copy(deep=True)
+    for i in range(extra_intents):
+        scaled.intents.append(IntentRule(
+            name=f"synthetic_{i}",
+            priority=-1 - i,
+            terms=[f"synthetic phrase {i} {j}" for j in range(terms_per_intent)],
+        ))
+    return scaled
+
+
+def benchmark_intents(messages: list = None, repeat: int = 1000, extra_intents=(0, 20, 100)) -> dict:
+    """Per-message classification time of the compiled engine vs per-term scans as the rule table grows"""
+    messages = messages or BENCHMARK_MESSAGES
+    base_rules = get_engine().rules
+
+    def timed(fn) -> float:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for message in messages:
+                fn(message)
+        return (time.perf_counter() - start) / (repeat * len(messages)) * 1e6
+
+    results = []
+    for extra in extra_intents:
+        engine = IntentEngine(_scaled_rules(base_rules, extra))
+        results.append({
+            "terms": len(engine._term_intents),
+            "compiled_us_per_message": round(timed(engine.classify), 2),
+            "scan_us_per_message": round(timed(lambda message: _scan_classify(engine, message)), 2),
+            "disagreements": [m for m in messages if engine.classify(m)["intent"] != _scan_classify(engine, m)["intent"]],
+        })
+    return {"messages": len(messages), "results": results}
+
+
+if __name__ == "__main__":
+    import sys
+
+    corpus = None
+    if len(sys.argv) > 1:
+        # One chat message per line, e.g. exported from the conversation store
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            corpus = [line.strip() for line in f if line.strip()]
+    print(benchmark_intents(corpus))
@@ -0,0 +1,377 @@
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from typing import Literal
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from ..LLM_Model import llm_config as llm
+from ..LLM_Model import llm_scheduler as scheduler
+from ..Observability import instrumentation
+from ..Observability import tracing
+
+load_dotenv()
+
+Priority = Literal["interactive", "batch"]
+
+
+# ============ ERRORS ============
+class LLMError(Exception):
+    """Base class for failures surfaced by the LLM call layer"""
+
+class LLMTimeoutError(LLMError):
+    """A call (including retries) did not finish before its deadline"""
+
+class LLMQueueTimeoutError(LLMTimeoutError):
+    """The deadline passed while waiting for a scheduler slot; the provider was never called"""
+
+class LLMUnavailableError(LLMError):
+    """The circuit breaker is open, the provider is considered degraded"""
+
+
+# ============ CONFIG ============
+class LLMClientConfig(BaseModel):
+    timeout_interactive_s: float = 30.0
+    timeout_batch_s: float = 90.0
+    max_retries: int = 2
+    backoff_base_s: float = 0.5
+    backoff_max_s: float = 8.0
+    breaker_failures: int = 5           # consecutive failures that open the circuit
+    breaker_reset_s: float = 30.0       # open time before a half-open probe is allowed
+    hedge_interactive: bool = True
+    hedge_min_delay_s: float = 1.0      # floor for the p95-based hedge delay
+    hedge_min_samples: int = 20         # latencies needed before p95 is trusted
+    max_workers: int = 32
+
+    @classmethod
+    def from_env(cls) -> "LLMClientConfig":
+        """Override any field with an LLM_<NAME> environment variable"""
+        overrides = {}
+        for name, field in cls.model_fields.items():
+            value = os.getenv(f"LLM_{name.upper()}")
+            if value is None:
+                continue
+            if field.annotation is bool:
+                overrides[name] = value.strip().lower() in ("1", "true", "yes", "on")
+            else:
+                overrides[name] = field.annotation(value)
+        return cls(**overrides)
+
+
+# ============ CIRCUIT BREAKER ============
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half_open after a cool-down -> closed on success"""
+
+    def __init__(self, failures: int, reset_s: float):
+        self.failures = failures
+        self.reset_s = reset_s
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_s:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True  # Single probe request
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failures:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """The probe ended without reaching the provider: allow another one, state unchanged"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == "open"
+
+
+# ============ LATENCY TRACKER ============
+class LatencyTracker:
+    """Sliding window of successful call latencies"""
+
+    def __init__(self, size: int = 500):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float, min_samples: int = 1):
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < max(min_samples, 1):
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+# ============ IN-FLIGHT CALL ============
+class _Ticket:
+    """Links one submitted call to its scheduler slot so the caller can hand the slot back when it stops waiting"""
+
+    def __init__(self):
+        self.abandoned = False
+        self._held = None
+        self._lock = threading.Lock()
+
+    def hold(self, sched: scheduler.LLMScheduler, waiter):
+        with self._lock:
+            self._held = (sched, waiter)
+            return not self.abandoned
+
+    def abandon(self):
+        with self._lock:
+            self.abandoned = True
+            held = self._held
+        if held is not None:
+            held[0].release(held[1])  # The worker's own release later becomes a no-op
+
+
+# ============ CLIENT ============
+class LLMClient:
+    """Deadline, retry, circuit breaker and hedging wrapper around a LangChain chat model"""
+
+    def __init__(self, config: LLMClientConfig = None, model=None):
+        self.config = config or LLMClientConfig.from_env()
+        self._model = model
+        self.breaker = CircuitBreaker(self.config.breaker_failures, self.config.breaker_reset_s)
+        self.latency = {"interactive": LatencyTracker(), "batch": LatencyTracker()}
+        self._executor = ThreadPoolExecutor(max_workers=self.config.max_workers, thread_name_prefix="llm")
+        self._metrics_lock = threading.Lock()
+        self._metrics = {"calls": 0, "succeeded": 0, "failed": 0, "retries": 0, "timeouts": 0, "rejected": 0, "hedged": 0, "hedge_wins": 0}
+
+    @property
+    def model(self):
+        return self._model or llm.get_llm_model()
+
+    def _count(self, key: str, n: int = 1):
+        with self._metrics_lock:
+            self._metrics[key] += n
+
+    def _call(self, messages, priority: str, deadline: float, kwargs, ticket: _Ticket):
+        # Every provider request, hedges included, is admitted by the process-wide scheduler
+        sched = scheduler.get_scheduler()
+        queued = time.monotonic()
+        with tracing.span("llm.invoke", priority=priority) as span:
+            waiter = sched.acquire(priority, scheduler.estimate_call_tokens(messages), deadline)
+            tokens = None
+            try:
+                if not ticket.hold(sched, waiter):
+                    raise LLMTimeoutError("Caller stopped waiting before the provider was called")
+                started = time.monotonic()
+                span.set_attribute("queue_s", round(started - queued, 4))
+                # The provider gets the remaining deadline as its request timeout, so a stuck call frees its thread
+                result = self.model.invoke(messages, **{**kwargs, "timeout": max(deadline - started, 0.001)})
+                elapsed = time.monotonic() - started
+                self.latency[priority].add(elapsed)
+                tokens = scheduler.usage_tokens(result)
+            finally:
+                sched.release(waiter, tokens)
+            span.set_attribute("tokens", tokens)
+        instrumentation.record_llm_call(priority, elapsed, messages, result)
+        return result
+
+    def _submit(self, messages, priority: str, deadline: float, kwargs, tickets: list):
+        # Run in the caller's context so context variables follow the call into the worker thread
+        ctx = contextvars.copy_context()
+        ticket = _Ticket()
+        tickets.append(ticket)
+        return self._executor.submit(ctx.run, self._call, messages, priority, deadline, kwargs, ticket)
+
+    def _hedge_delay(self, priority: str):
+        p95 = self.latency[priority].quantile(0.95, self.config.hedge_min_samples)
+        return max(p95 or 0.0, self.config.hedge_min_delay_s)
+
+    def _attempt(self, messages, priority: str, deadline: float, hedge: bool, kwargs):
+        """One logical attempt, optionally raced against a delayed duplicate"""
+        tickets = []
+        try:
+            return self._race(messages, priority, deadline, hedge, kwargs, tickets)
+        finally:
+            # Whatever is still running no longer has a caller: its slot goes back to the scheduler now
+            for ticket in tickets:
+                ticket.abandon()
+
+    def _race(self, messages, priority: str, deadline: float, hedge: bool, kwargs, tickets: list):
+        primary = self._submit(messages, priority, deadline, kwargs, tickets)
+        pending = {primary}
+
+        if hedge:
+            done, _ = wait(pending, timeout=min(self._hedge_delay(priority), max(deadline - time.monotonic(), 0)))
+            if not done and time.monotonic() < deadline:
+                pending.add(self._submit(messages, priority, deadline, kwargs, tickets))
+                self._count("hedged")
+
+        last_error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except scheduler.QueueTimeoutError as e:
+                    last_error = LLMQueueTimeoutError(str(e))
+                    continue
+                except Exception as e:
+                    last_error = e
+                    continue
+                for other in pending:
+                    other.cancel()
+                if future is not primary:
+                    self._count("hedge_wins")
+                return result
+
+        for other in pending:
+            other.cancel()
+        if last_error is not None and not pending:
+            # The provider got the remaining deadline as its request timeout, so its timeout is ours
+            if not isinstance(last_error, LLMError) and (isinstance(last_error, TimeoutError) or time.monotonic() >= deadline):
+                raise LLMTimeoutError(f"LLM call exceeded its {priority} deadline") from last_error
+            raise last_error
+        raise LLMTimeoutError(f"LLM call exceeded its {priority} deadline")
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.config.backoff_max_s, self.config.backoff_base_s * (2 ** attempt)))
+
+    def invoke(self, messages, priority: Priority = "batch", timeout: float = None, hedge: bool = None, **kwargs):
+        """Invoke the chat model with a deadline, retries with jittered backoff and fail-fast when degraded"""
+        timeout = timeout or (self.config.timeout_interactive_s if priority == "interactive" else self.config.timeout_batch_s)
+        hedge = self.config.hedge_interactive and priority == "interactive" if hedge is None else hedge
+        hedge = hedge and not _streaming.get()
+        deadline = time.monotonic() + timeout
+        self._count("calls")
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise LLMUnavailableError("LLM provider circuit is open, failing fast")
+            try:
+                result = self._attempt(messages, priority, deadline, hedge, kwargs)
+            except Exception as e:
+                if isinstance(e, LLMQueueTimeoutError):
+                    self.breaker.release_probe()  # Local queueing says nothing about provider health
+                else:
+                    self.breaker.record_failure()
+                if isinstance(e, LLMTimeoutError):
+                    self._count("timeouts")
+                delay = self._backoff(attempt)
+                if attempt >= self.config.max_retries or time.monotonic() + delay >= deadline:
+                    self._count("failed")
+                    if isinstance(e, LLMError):
+                        raise
+                    raise LLMError(f"LLM call failed after {attempt + 1} attempts: {e}") from e
+                attempt += 1
+                self._count("retries")
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self._count("succeeded")
+            return result
+
+    def metrics(self) -> dict:
+        """Call counters, breaker state, observed provider latency quantiles and scheduler queues"""
+        with self._metrics_lock:
+            stats = dict(self._metrics)
+        stats["breaker_state"] = self.breaker.state
+        for priority, tracker in self.latency.items():
+            stats[f"{priority}_p50_s"] = tracker.quantile(0.5)
+            stats[f"{priority}_p95_s"] = tracker.quantile(0.95)
+        stats["scheduler"] = scheduler.scheduler_metrics()
+        return stats
+
+
+_client = None
+_client_lock = threading.Lock()
+_streaming = contextvars.ContextVar("llm_streaming", default=False)
+
+@contextmanager
+def streaming():
+    """Calls made inside stream their tokens to a client: no hedging, a duplicate call would interleave tokens"""
+    token = _streaming.set(True)
+    try:
+        yield
+    finally:
+        _streaming.reset(token)
+
+def get_client() -> LLMClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient()
+    return _client
+
+def invoke(messages, priority: Priority = "batch", **kwargs):
+    """Shared entry point for every LLM call site"""
+    return get_client().invoke(messages, priority=priority, **kwargs)
+
+async def ainvoke(messages, priority: Priority = "batch", **kwargs):
+    """invoke() for coroutines; the call waits on a worker thread so the event loop stays free"""
+    return await asyncio.to_thread(invoke, messages, priority, **kwargs)
+
+def client_metrics() -> dict:
+    return get_client().metrics()
+
+
+# ============ FAULT DRILL ============
+def fault_drill(calls: int = 100, failure_rate: float = 0.2, hang_rate: float = 0.05, priority: Priority = "interactive") -> dict:
+    """Run calls against a faulty offline stub and report how the call layer coped"""
+    from ..LLM_Model.llm_stub import StubChatModel
+
+    stub = StubChatModel(latency="lognormal", latency_ms=50, failure_rate=failure_rate, hang_rate=hang_rate, hang_s=5.0)
+    client = LLMClient(
+        LLMClientConfig(timeout_interactive_s=1.0, timeout_batch_s=2.0, backoff_base_s=0.01, hedge_min_delay_s=0.1, hedge_min_samples=10),
+        model=stub,
+    )
+
+    outcomes = {"ok": 0, "timeout": 0, "unavailable": 0, "error": 0}
+    start = time.perf_counter()
+    for i in range(calls):
+        try:
+            client.invoke(f"Equipment: Pump (SN-{i})", priority=priority)
+            outcomes["ok"] += 1
+        except LLMTimeoutError:
+            outcomes["timeout"] += 1
+        except LLMUnavailableError:
+            outcomes["unavailable"] += 1
+        except LLMError:
+            outcomes["error"] += 1
+    return {"elapsed_s": round(time.perf_counter() - start, 3), **outcomes, **client.metrics()}
+
+
+if __name__ == "__main__":
+    print(fault_drill())
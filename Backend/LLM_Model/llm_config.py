@@ -1,13 +1,62 @@
 from langchain.chat_models import init_chat_model
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
-llm_model = init_chat_model(
-    model="gpt-5-chat",
-    model_provider= "azure_openai",
-    api_version = "2025-01-01-preview",
-    azure_endpoint = os.getenv("MODEL_ENDPOINT"),
-    api_key = os.getenv("MODEL_KEY")
-)
+# ============ BACKEND REGISTRY ============
+# LLM_BACKEND selects the chat model every workflow resolves through get_llm_model():
+# "azure" (default, needs MODEL_ENDPOINT/MODEL_KEY) or "stub" (offline, see llm_stub.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "azure")
+
+_backends = {}
+_models = {}
+_lock = threading.Lock()
+
+
+def register_backend(name: str, factory):
+    """Register a zero-argument factory returning a LangChain chat model"""
+    _backends[name] = factory
+    _models.pop(name, None)
+
+
+def azure_backend():
+    return init_chat_model(
+        model="gpt-5-chat",
+        model_provider= "azure_openai",
+        api_version = "2025-01-01-preview",
+        azure_endpoint = os.getenv("MODEL_ENDPOINT"),
+        api_key = os.getenv("MODEL_KEY"),
+        max_retries = 0  # llm_client retries within the call deadline; SDK retries would outlive it
+    )
+
+
+def stub_backend():
+    from ..LLM_Model.llm_stub import StubChatModel
+    return StubChatModel.from_env()
+
+
+register_backend("azure", azure_backend)
+register_backend("stub", stub_backend)
+
+
+def get_llm_model(backend: str = None):
+    """Chat model for the configured backend, created once on first use"""
+    backend = backend or LLM_BACKEND
+    model = _models.get(backend)
+    if model is None:
+        with _lock:
+            model = _models.get(backend)
+            if model is None:
+                if backend not in _backends:
+                    raise ValueError(f"Unknown LLM backend '{backend}'. Registered: {', '.join(sorted(_backends))}")
+                model = _models[backend] = _backends[backend]()
+    return model
+
+
+def __getattr__(name):
+    # Keeps `llm_config.llm_model` working without building the model at import time
+    if name == "llm_model":
+        return get_llm_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,257 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from ..LLM_Model import prompt_payload as payload
+
+load_dotenv()
+
+# ============ CONFIG ============
+# Rate limits should mirror the Azure deployment's quota (requests/min and tokens/min on the
+# deployment page); 0 disables a limit. Requests/min is off by default because the deployment
+# quota is the token limit, a guessed value here would only throttle below it
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_INTERACTIVE_RESERVED = int(os.getenv("LLM_INTERACTIVE_RESERVED", "2"))  # slots batch calls may never take
+LLM_REQUESTS_PER_MIN = float(os.getenv("LLM_REQUESTS_PER_MIN", "0"))
+LLM_TOKENS_PER_MIN = float(os.getenv("LLM_TOKENS_PER_MIN", "90000"))
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "300"))
+
+PRIORITY_RANK = {"interactive": 0, "batch": 1}
+
+
+class QueueTimeoutError(TimeoutError):
+    """The call's deadline passed while it was still waiting for a slot"""
+
+
+# ============ TOKEN BUCKET ============
+class TokenBucket:
+    """Refills continuously at rate_per_min up to one minute of capacity; a rate of 0 or less never limits"""
+
+    def __init__(self, rate_per_min: float):
+        self.unlimited = rate_per_min <= 0
+        self.rate = rate_per_min / 60
+        self.capacity = rate_per_min
+        self.level = rate_per_min
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount is available (0 when it already is)"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)  # Oversized requests wait for a full bucket, not forever
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        if not self.unlimited:
+            self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """Correct an earlier estimate once the real usage is known"""
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level - delta)
+
+
+# ============ SCHEDULER ============
+class _Waiter:
+    __slots__ = ("priority", "tokens", "enqueued", "released")
+
+    def __init__(self, priority: str, tokens: int):
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.released = False
+
+
+class LLMScheduler:
+    """Process-wide admission control: concurrency cap, request/token rate limits and priority queues"""
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        interactive_reserved: int = LLM_INTERACTIVE_RESERVED,
+        requests_per_min: float = LLM_REQUESTS_PER_MIN,
+        tokens_per_min: float = LLM_TOKENS_PER_MIN,
+    ):
+        self.max_concurrency = max_concurrency
+        self.interactive_reserved = min(interactive_reserved, max_concurrency - 1)
+        self.requests = TokenBucket(requests_per_min)
+        self.tokens = TokenBucket(tokens_per_min)
+        self.in_flight = 0
+
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._waits = {p: deque(maxlen=1000) for p in PRIORITY_RANK}
+        self._metrics = {p: {"admitted": 0, "timed_out": 0, "wait_s_total": 0.0, "wait_s_max": 0.0} for p in PRIORITY_RANK}
+        self._metrics_all = {"rate_limited_waits": 0, "tokens_estimated": 0, "tokens_used": 0}
+
+    def _slot_limit(self, priority: str) -> int:
+        return self.max_concurrency if priority == "interactive" else self.max_concurrency - self.interactive_reserved
+
+    def _admission_delay(self, waiter: _Waiter, now: float):
+        """None when blocked on concurrency, else seconds until the rate limits allow the call"""
+        if self.in_flight >= self._slot_limit(waiter.priority):
+            return None
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(waiter.tokens, now))
+
+    def acquire(self, priority: str = "batch", tokens: int = 0, deadline: float = None) -> _Waiter:
+        """Block until the call may start; interactive waiters always go before queued batch waiters"""
+        waiter = _Waiter(priority, tokens)
+        entry = (PRIORITY_RANK.get(priority, 1), next(self._seq), waiter)
+
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            rate_limited = False
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._heap[0] is entry:
+                        delay = self._admission_delay(waiter, now)
+                        if delay == 0:
+                            break
+                        rate_limited = rate_limited or delay is not None
+                    else:
+                        delay = None
+                    if deadline is not None and now >= deadline:
+                        self._metrics[priority]["timed_out"] += 1
+                        raise QueueTimeoutError(f"Timed out waiting for an LLM slot ({priority})")
+                    timeout = delay if delay is not None else None
+                    if deadline is not None:
+                        timeout = min(timeout, deadline - now) if timeout is not None else deadline - now
+                    self._cond.wait(timeout)
+            except BaseException:
+                self._heap.remove(entry)
+                heapq.heapify(self._heap)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._heap)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+
+            waited = time.monotonic() - waiter.enqueued
+            stats = self._metrics[priority]
+            stats["admitted"] += 1
+            stats["wait_s_total"] += waited
+            stats["wait_s_max"] = max(stats["wait_s_max"], waited)
+            self._waits[priority].append(waited)
+            self._metrics_all["rate_limited_waits"] += int(rate_limited)
+            self._metrics_all["tokens_estimated"] += tokens
+            self._cond.notify_all()  # The next waiter becomes head
+        return waiter
+
+    def release(self, waiter: _Waiter, tokens_used: int = None):
+        """Give the slot back; safe to call twice, only the first release counts"""
+        with self._cond:
+            if waiter.released:
+                return
+            waiter.released = True
+            self.in_flight -= 1
+            if tokens_used is not None:
+                self.tokens.adjust(tokens_used - waiter.tokens)
+                self._metrics_all["tokens_used"] += tokens_used
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: str = "batch", tokens: int = 0, deadline: float = None):
+        """Hold a slot for the duration of one provider call; report real usage via the yielded dict"""
+        waiter = self.acquire(priority, tokens, deadline)
+        usage = {"tokens": None}
+        try:
+            yield usage
+        finally:
+            self.release(waiter, usage["tokens"])
+
+    def metrics(self) -> dict:
+        """Queue depth, in-flight count and wait times per priority class"""
+        with self._cond:
+            depth = {p: 0 for p in PRIORITY_RANK}
+            for _, _, waiter in self._heap:
+                depth[waiter.priority] = depth.get(waiter.priority, 0) + 1
+            stats = {
+                "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency,
+                **self._metrics_all,
+            }
+            for priority, counters in self._metrics.items():
+                waits = sorted(self._waits[priority])
+                stats[priority] = {
+                    "queue_depth": depth.get(priority, 0),
+                    **counters,
+                    "wait_s_p95": waits[min(int(0.95 * len(waits)), len(waits) - 1)] if waits else None,
+                }
+        return stats
+
+
+# ============ HELPER FUNCTIONS ============
+def estimate_call_tokens(messages) -> int:
+    """Prompt estimate plus the expected completion size, charged against the tokens/min bucket"""
+    if isinstance(messages, str):
+        text = messages
+    else:
+        text = "".join(str(m.get("content", "") if isinstance(m, dict) else getattr(m, "content", m)) for m in messages)
+    return payload.estimate_tokens(text) + LLM_EXPECTED_OUTPUT_TOKENS
+
+def usage_tokens(result):
+    """Total tokens reported by the provider, if any"""
+    usage = getattr(result, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+_scheduler = LLMScheduler()
+
+def get_scheduler() -> LLMScheduler:
+    return _scheduler
+
+def scheduler_metrics() -> dict:
+    return _scheduler.metrics()
+
+
+# ============ BENCHMARK ============
+def benchmark_priority(batch_calls: int = 60, chat_calls: int = 10, latency_ms: float = 100) -> dict:
+    """Chat latency while a batch sweep saturates the scheduler, using the offline stub"""
+    from concurrent.futures import ThreadPoolExecutor
+    from ..LLM_Model.llm_stub import StubChatModel
+
+    model = StubChatModel(latency="fixed", latency_ms=latency_ms)
+    scheduler = LLMScheduler(max_concurrency=4, interactive_reserved=1, requests_per_min=6000, tokens_per_min=10_000_000)
+
+    def call(priority, i):
+        start = time.monotonic()
+        prompt = f"Equipment: Pump (SN-{i})"
+        with scheduler.slot(priority, estimate_call_tokens(prompt)) as usage:
+            usage["tokens"] = usage_tokens(model.invoke(prompt))
+        return time.monotonic() - start
+
+    with ThreadPoolExecutor(max_workers=batch_calls + chat_calls) as pool:
+        batch = [pool.submit(call, "batch", i) for i in range(batch_calls)]
+        time.sleep(latency_ms / 1000)  # Sweep is already queued when chat arrives
+        chat = [pool.submit(call, "interactive", i) for i in range(chat_calls)]
+        chat_latency = sorted(f.result() for f in chat)
+        batch_latency = sorted(f.result() for f in batch)
+
+    return {
+        "chat_p50_s": round(chat_latency[len(chat_latency) // 2], 3),
+        "chat_max_s": round(chat_latency[-1], 3),
+        "batch_p50_s": round(batch_latency[len(batch_latency) // 2], 3),
+        "batch_max_s": round(batch_latency[-1], 3),
+        "metrics": scheduler.metrics(),
+    }
+
+
+if __name__ == "__main__":
+    print(benchmark_priority())
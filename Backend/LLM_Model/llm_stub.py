@@ -0,0 +1,262 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field, PrivateAttr
+
+load_dotenv()
+
+
+# ============ CANNED RESPONSES ============
+# First template whose marker appears in the prompt wins. Values are format strings
+# filled with {serial}, {prompt_tokens} and a deterministic {flag}/{confidence} per prompt.
+DEFAULT_TEMPLATES = [
+    {
+        "marker": '"validation_feedback"',
+        "response": json.dumps({
+            "ai_summary": "Stub summary for {serial}: readings are consistent with the reported issue.",
+            "validation_feedback": "Report matches the monitoring data.",
+            "is_correct": "{flag}",
+            "confidence": "{confidence}",
+            "recommended_action": "Schedule an inspection.",
+            "needs_maintenance": "{flag}",
+            "priority": "medium"
+        })
+    },
+    {
+        "marker": '"needs_maintenance"',
+        "response": json.dumps({
+            "needs_maintenance": "{flag}",
+            "reason": "Stub decision for {serial} based on {prompt_tokens} prompt tokens.",
+            "confidence": "{confidence}"
+        })
+    },
+    {
+        "marker": "",
+        "response": "Stub response for {serial} ({prompt_tokens} prompt tokens)."
+    },
+]
+
+
+def load_templates(path: str = None) -> list:
+    """Templates from STUB_LLM_TEMPLATES (a JSON list of {marker, response}) or the defaults"""
+    path = path or os.getenv("STUB_LLM_TEMPLATES")
+    if not path:
+        return DEFAULT_TEMPLATES
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f) + DEFAULT_TEMPLATES[-1:]
+
+
+RAW_PLACEHOLDERS = ("flag", "confidence", "prompt_tokens")
+
+
+# ============ HELPER FUNCTIONS ============
+def count_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), same estimate as the prompt payload budgets"""
+    return (len(text) + 3) // 4
+
+def _serial_hint(prompt: str) -> str:
+    for marker in ("(", "Equipment: ", "serial "):
+        idx = prompt.find(marker)
+        if idx >= 0:
+            word = prompt[idx + len(marker):].split(")")[0].split()
+            if word:
+                return word[0].strip(",.:")
+    return "unknown"
+
+
+# ============ STUB MODEL ============
+class StubProviderError(RuntimeError):
+    """Fault injected by the stub to exercise retry and circuit breaker paths"""
+
+
+class StubTimeoutError(TimeoutError):
+    """The per-request timeout passed before the stub finished answering, like an HTTP read timeout"""
+
+
+class StubChatModel(BaseChatModel):
+    """Offline chat model with configurable latency, token accounting and templated outputs"""
+    latency: str = "lognormal"         # fixed | uniform | normal | lognormal
+    latency_ms: float = 800.0          # mean (fixed/normal/lognormal) or upper bound (uniform)
+    latency_jitter: float = 0.35       # stddev as a fraction of the mean, or sigma for lognormal
+    ms_per_output_token: float = 0.0   # extra decode time per generated token
+    failure_rate: float = 0.0          # share of calls raising StubProviderError
+    hang_rate: float = 0.0             # share of calls stalling for hang_s before answering
+    hang_s: float = 120.0
+    seed: int = 42
+    templates: list = Field(default_factory=load_templates)
+
+    _rng: random.Random = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _stats: dict = PrivateAttr(default_factory=lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency_s": 0.0, "faults": 0, "hangs": 0})
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.seed)
+
+    @classmethod
+    def from_env(cls) -> "StubChatModel":
+        """Build the stub from STUB_LLM_* environment variables"""
+        return cls(
+            latency=os.getenv("STUB_LLM_LATENCY", "lognormal"),
+            latency_ms=float(os.getenv("STUB_LLM_LATENCY_MS", "800")),
+            latency_jitter=float(os.getenv("STUB_LLM_LATENCY_JITTER", "0.35")),
+            ms_per_output_token=float(os.getenv("STUB_LLM_MS_PER_OUTPUT_TOKEN", "0")),
+            failure_rate=float(os.getenv("STUB_LLM_FAILURE_RATE", "0")),
+            hang_rate=float(os.getenv("STUB_LLM_HANG_RATE", "0")),
+            hang_s=float(os.getenv("STUB_LLM_HANG_S", "120")),
+            seed=int(os.getenv("STUB_LLM_SEED", "42")),
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def sample_latency(self) -> float:
+        """Seconds to sleep for one call, drawn from the configured distribution"""
+        mean = self.latency_ms / 1000
+        with self._lock:
+            if self.latency == "fixed":
+                value = mean
+            elif self.latency == "uniform":
+                value = self._rng.uniform(0, mean)
+            elif self.latency == "normal":
+                value = self._rng.gauss(mean, mean * self.latency_jitter)
+            else:
+                value = self._rng.lognormvariate(0, self.latency_jitter) * mean
+        return max(value, 0.0)
+
+    def inject_fault(self) -> float:
+        """Raise or return extra stall seconds according to the configured fault rates"""
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.failure_rate:
+            with self._lock:
+                self._stats["faults"] += 1
+            raise StubProviderError("Injected provider failure")
+        if roll < self.failure_rate + self.hang_rate:
+            with self._lock:
+                self._stats["hangs"] += 1
+            return self.hang_s
+        return 0.0
+
+    def render(self, prompt: str) -> str:
+        """Deterministic templated output: same prompt, same answer"""
+        digest = int(hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        values = {
+            "serial": _serial_hint(prompt),
+            "prompt_tokens": count_tokens(prompt),
+            "flag": "true" if digest % 2 else "false",
+            "confidence": f"{0.5 + (digest % 50) / 100:.2f}",
+        }
+        template = next(t for t in self.templates if t["marker"] in prompt)
+        text = template["response"]
+        for key, value in values.items():
+            if key in RAW_PLACEHOLDERS:
+                # "{flag}" as a whole JSON value becomes a bare boolean/number
+                text = text.replace(f'"{{{key}}}"', str(value))
+            text = text.replace(f"{{{key}}}", str(value))
+        return text
+
+    def _respond(self, messages: List[BaseMessage]) -> tuple:
+        stall = self.inject_fault()
+        prompt = "\n".join(str(m.content) for m in messages)
+        text = self.render(prompt)
+        usage = {
+            "input_tokens": count_tokens(prompt),
+            "output_tokens": count_tokens(text),
+            "total_tokens": count_tokens(prompt) + count_tokens(text),
+        }
+        delay = stall + self.sample_latency() + usage["output_tokens"] * self.ms_per_output_token / 1000
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["prompt_tokens"] += usage["input_tokens"]
+            self._stats["completion_tokens"] += usage["output_tokens"]
+            self._stats["latency_s"] += delay
+        return text, usage, delay
+
+    @staticmethod
+    def _sleep(seconds: float, timeout: Optional[float]):
+        """Sleep like the provider would, but give up once the request timeout is spent"""
+        if timeout is not None and seconds > timeout:
+            time.sleep(max(timeout, 0.0))
+            raise StubTimeoutError(f"Stub request timed out after {timeout:.2f}s")
+        time.sleep(seconds)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text, usage, delay = self._respond(messages)
+        self._sleep(delay, kwargs.get("timeout"))
+        message = AIMessage(content=text, usage_metadata=usage, response_metadata={"model_name": "stub"})
+        return ChatResult(generations=[ChatGeneration(message=message)], llm_output={"token_usage": usage})
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        text, usage, delay = self._respond(messages)
+        words = text.split(" ")
+        step = delay / max(len(words), 1)
+        timeout = kwargs.get("timeout")
+        for i, word in enumerate(words):
+            self._sleep(step, None if timeout is None else timeout - i * step)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+    def stats(self) -> dict:
+        """Cumulative call and token counters"""
+        with self._lock:
+            return dict(self._stats)
+
+
+# ============ BENCHMARK ============
+def benchmark_stub(calls: int = 200, concurrency: int = 8) -> dict:
+    """Throughput and latency percentiles of concurrent stub invocations"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    model = StubChatModel.from_env()
+    prompt = 'Equipment: Pump (SN-001)\nReturn a JSON object: {"needs_maintenance": true/false}'
+
+    def one(i):
+        start = time.perf_counter()
+        model.invoke(f"{prompt}\nrun {i}")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(one, range(calls)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "calls": calls,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "calls_per_s": round(calls / elapsed, 1),
+        "p50_s": round(latencies[len(latencies) // 2], 3),
+        "p95_s": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        **model.stats(),
+    }
+
+
+if __name__ == "__main__":
+    print(benchmark_stub())
@@ -0,0 +1,261 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Literal, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+load_dotenv()
+
+STATUS_CODES = {"normal": 0, "warning": 1, "critical": 2}
+
+
+# ============ RULES ============
+class PrescreenRules(BaseModel):
+    """Thresholds deciding which equipment is clearly healthy and can skip the LLM"""
+    enabled: bool = True
+    window_days: float = 7.0             # Only readings this recent (per series) are screened
+    max_breach_ratio: float = 0.0        # Healthy only if at most this share of readings breached
+    min_threshold_margin: float = 0.15   # Latest value must stay this fraction of the band away from a threshold
+    horizon_days: float = 30.0           # Trend must not reach a threshold within this many days
+    at_risk_breach_ratio: float = 0.2    # Reported as at_risk (rather than ambiguous) above this ratio
+    healthy_confidence: float = 0.9      # Confidence recorded on rule-based decisions
+
+    @classmethod
+    def from_env(cls) -> "PrescreenRules":
+        """Override any rule with a PRESCREEN_<NAME> environment variable"""
+        overrides = {}
+        for name, field in cls.model_fields.items():
+            value = os.getenv(f"PRESCREEN_{name.upper()}")
+            if value is None:
+                continue
+            if field.annotation is bool:
+                overrides[name] = value.strip().lower() in ("1", "true", "yes", "on")
+            else:
+                overrides[name] = float(value)
+        return cls(**overrides)
+
+
+class PrescreenResult(BaseModel):
+    serial: str
+    verdict: Literal["healthy", "at_risk", "ambiguous", "no_data"]
+    breach_ratio: float = 0.0
+    min_threshold_margin: Optional[float] = None
+    days_to_threshold: Optional[float] = None
+    critical_latest: bool = False
+    series: int = 0
+    reason: str = ""
+
+    @property
+    def needs_llm(self) -> bool:
+        return self.verdict != "healthy"
+
+
+# ============ METRICS ============
+_metrics_lock = threading.Lock()
+_metrics = {
+    "runs": 0,
+    "equipments_screened": 0,
+    "llm_skipped": 0,
+    "llm_routed": 0,
+}
+
+def _record(screened: int, skipped: int):
+    with _metrics_lock:
+        _metrics["runs"] += 1
+        _metrics["equipments_screened"] += screened
+        _metrics["llm_skipped"] += skipped
+        _metrics["llm_routed"] += screened - skipped
+
+def prescreen_metrics() -> dict:
+    """Cumulative pre-screen counters and the fraction of LLM analyses avoided"""
+    with _metrics_lock:
+        stats = dict(_metrics)
+    stats["llm_calls_avoided_ratio"] = stats["llm_skipped"] / stats["equipments_screened"] if stats["equipments_screened"] else 0.0
+    return stats
+
+
+# ============ ARRAY CONSTRUCTION ============
+def _to_days(value, epoch: datetime) -> Optional[float]:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    return (value - epoch).total_seconds() / 86400
+
+def build_fleet_arrays(monitoring_logs: Dict[str, list], epoch: datetime = None) -> dict:
+    """Flatten {serial: rows} into column arrays with equipment and series codes"""
+    epoch = epoch or datetime(2000, 1, 1)
+
+    serials = list(monitoring_logs.keys())
+    series_codes = {}
+    series_serial = []
+    series, t, value, tmin, tmax, status = [], [], [], [], [], []
+
+    for eq_idx, serial in enumerate(serials):
+        rows = monitoring_logs.get(serial)
+        if not isinstance(rows, list):
+            continue  # Fetch error placeholder
+        for row in rows:
+            days = _to_days(row.get("timestamp"), epoch)
+            if days is None or row.get("value") is None:
+                continue
+            key = (serial, row.get("reading_type"), row.get("location"))
+            code = series_codes.get(key)
+            if code is None:
+                code = series_codes[key] = len(series_serial)
+                series_serial.append(eq_idx)
+            series.append(code)
+            t.append(days)
+            value.append(row["value"])
+            tmin.append(np.nan if row.get("threshold_min") is None else row["threshold_min"])
+            tmax.append(np.nan if row.get("threshold_max") is None else row["threshold_max"])
+            status.append(STATUS_CODES.get(row.get("status"), 0))
+
+    return {
+        "serials": serials,
+        "series_serial": np.asarray(series_serial, dtype=np.int64),
+        "series": np.asarray(series, dtype=np.int64),
+        "t": np.asarray(t, dtype=np.float64),
+        "value": np.asarray(value, dtype=np.float64),
+        "threshold_min": np.asarray(tmin, dtype=np.float64),
+        "threshold_max": np.asarray(tmax, dtype=np.float64),
+        "status": np.asarray(status, dtype=np.int8),
+    }
+
+
+# ============ SCREENING ============
+def screen_series(arrays: dict, rules: PrescreenRules) -> dict:
+    """Vectorized per-series breach ratio, threshold margin, trend slope and days to threshold"""
+    n_series = len(arrays["series_serial"])
+    series = arrays["series"]
+    t = arrays["t"]
+    value = arrays["value"]
+    tmin = arrays["threshold_min"]
+    tmax = arrays["threshold_max"]
+
+    # Keep only the recent window of every series
+    latest_t = np.full(n_series, -np.inf)
+    np.maximum.at(latest_t, series, t)
+    recent = t >= latest_t[series] - rules.window_days
+    series, t, value, tmin, tmax, status = series[recent], t[recent], value[recent], tmin[recent], tmax[recent], arrays["status"][recent]
+
+    with np.errstate(invalid="ignore"):
+        breach = (status > 0) | (value > tmax) | (value < tmin)
+
+    count = np.bincount(series, minlength=n_series).astype(np.float64)
+    safe_count = np.maximum(count, 1)
+    breach_ratio = np.bincount(series, weights=breach, minlength=n_series) / safe_count
+
+    # Latest reading of every series (rows sorted by series, then time)
+    order = np.lexsort((t, series))
+    last = order[np.r_[np.nonzero(np.diff(series[order]))[0], len(order) - 1]] if len(order) else order
+    latest_value = np.full(n_series, np.nan)
+    latest_min = np.full(n_series, np.nan)
+    latest_max = np.full(n_series, np.nan)
+    latest_status = np.zeros(n_series, dtype=np.int8)
+    latest_value[series[last]] = value[last]
+    latest_min[series[last]] = tmin[last]
+    latest_max[series[last]] = tmax[last]
+    latest_status[series[last]] = status[last]
+
+    # Distance to the nearest threshold as a fraction of the band (or of the threshold itself)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        band = latest_max - latest_min
+        scale = np.where(np.isfinite(band) & (band > 0), band, np.fmax(np.abs(latest_max), np.abs(latest_min)))
+        scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+        margin = np.fmin(latest_max - latest_value, latest_value - latest_min) / scale
+    margin = np.where(np.isfinite(margin), margin, np.inf)
+
+    # Least-squares slope per series from grouped sums (time centred on each series' latest reading)
+    tc = t - latest_t[series]
+    s_t = np.bincount(series, weights=tc, minlength=n_series)
+    s_v = np.bincount(series, weights=value, minlength=n_series)
+    s_tt = np.bincount(series, weights=tc * tc, minlength=n_series)
+    s_tv = np.bincount(series, weights=tc * value, minlength=n_series)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        denom = count * s_tt - s_t * s_t
+        slope = np.where(denom > 1e-12, (count * s_tv - s_t * s_v) / denom, 0.0)
+
+        up = (slope > 0) & np.isfinite(latest_max)
+        down = (slope < 0) & np.isfinite(latest_min)
+        days = np.full(n_series, np.inf)
+        days[up] = (latest_max[up] - latest_value[up]) / slope[up]
+        days[down] = (latest_value[down] - latest_min[down]) / -slope[down]
+    days = np.where(margin < 0, 0.0, np.maximum(days, 0.0))  # Already outside the band
+
+    return {
+        "count": count,
+        "breach_ratio": breach_ratio,
+        "margin": margin,
+        "slope": slope,
+        "days_to_threshold": days,
+        "latest_status": latest_status,
+    }
+
+def prescreen_fleet(monitoring_logs: Dict[str, list], rules: PrescreenRules = None) -> Dict[str, PrescreenResult]:
+    """Classify every equipment as healthy (skip the LLM), at_risk, ambiguous or no_data"""
+    rules = rules or PrescreenRules.from_env()
+    arrays = build_fleet_arrays(monitoring_logs)
+    serials = arrays["serials"]
+    n_eq = len(serials)
+
+    stats = screen_series(arrays, rules)
+    owner = arrays["series_serial"]
+
+    # Worst case over every series of an equipment
+    n_series = np.bincount(owner, minlength=n_eq)
+    breach_ratio = np.zeros(n_eq)
+    margin = np.full(n_eq, np.inf)
+    days = np.full(n_eq, np.inf)
+    critical = np.zeros(n_eq, dtype=bool)
+    np.maximum.at(breach_ratio, owner, stats["breach_ratio"])
+    np.minimum.at(margin, owner, stats["margin"])
+    np.minimum.at(days, owner, stats["days_to_threshold"])
+    np.logical_or.at(critical, owner, stats["latest_status"] == STATUS_CODES["critical"])
+
+    healthy = (
+        (n_series > 0)
+        & (breach_ratio <= rules.max_breach_ratio)
+        & (margin >= rules.min_threshold_margin)
+        & (days > rules.horizon_days)
+        & ~critical
+    )
+    at_risk = (n_series > 0) & ((breach_ratio >= rules.at_risk_breach_ratio) | (margin <= 0) | critical)
+
+    results = {}
+    for i, serial in enumerate(serials):
+        if n_series[i] == 0:
+            verdict, reason = "no_data", "No recent monitoring data"
+        elif healthy[i]:
+            verdict = "healthy"
+            # max_breach_ratio may tolerate a few breaches, so say how many there were
+            breaches = "no breaches" if breach_ratio[i] == 0 else f"at most {breach_ratio[i]:.0%} of readings breached per sensor"
+            reason = (
+                f"Rule-based pre-screen: all {n_series[i]} sensors within thresholds on their latest reading "
+                f"(margin {margin[i]:.0%} of band, {breaches} in the last {rules.window_days:g} days, "
+                f"no threshold crossing projected within {rules.horizon_days:g} days)"
+            )
+        elif at_risk[i]:
+            verdict, reason = "at_risk", f"Breach ratio {breach_ratio[i]:.0%}, margin {margin[i]:.0%}"
+        else:
+            verdict, reason = "ambiguous", f"Breach ratio {breach_ratio[i]:.0%}, margin {margin[i]:.0%}"
+
+        results[serial] = PrescreenResult(
+            serial=serial,
+            verdict=verdict,
+            breach_ratio=float(breach_ratio[i]),
+            min_threshold_margin=float(margin[i]) if np.isfinite(margin[i]) else None,
+            days_to_threshold=float(days[i]) if np.isfinite(days[i]) else None,
+            critical_latest=bool(critical[i]),
+            series=int(n_series[i]),
+            reason=reason
+        )
+
+    _record(n_eq, int(healthy.sum()))
+    return results
@@ -0,0 +1,315 @@
+import os
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ============ CONFIG ============
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1200"))  # per-equipment payload
+FLEET_PROMPT_TOKEN_BUDGET = int(os.getenv("FLEET_PROMPT_TOKEN_BUDGET", "12000"))  # fleet-wide reports
+FLEET_ASSET_TOKEN_BUDGET = int(os.getenv("FLEET_ASSET_TOKEN_BUDGET", "200"))  # per equipment inside fleet reports
+
+WINDOWS = [
+    ("24h", timedelta(hours=24)),
+    ("7d", timedelta(days=7)),
+    ("30d", timedelta(days=30)),
+]
+RECENT_MAINTENANCE = 5
+
+
+# ============ HELPER FUNCTIONS ============
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token)"""
+    return (len(text) + 3) // 4
+
+def _field(row, name, default=None):
+    """Read a field from a dict or a SQLAlchemy row"""
+    if isinstance(row, dict):
+        return row.get(name, default)
+    return getattr(row, name, default)
+
+def _parse_timestamp(value):
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+def _fmt(value) -> str:
+    if value is None:
+        return "-"
+    return f"{value:.4g}"
+
+def _fmt_age(delta) -> str:
+    if delta is None:
+        return "never"
+    hours = max(delta.total_seconds(), 0) / 3600
+    if hours < 48:
+        return f"{hours:.0f}h"
+    return f"{hours / 24:.0f}d"
+
+def is_breach(value, status, threshold_min, threshold_max) -> bool:
+    """A reading breaches when its status is not normal or its value is outside the thresholds"""
+    if status in ("warning", "critical"):
+        return True
+    if value is None:
+        return False
+    if threshold_max is not None and value > threshold_max:
+        return True
+    if threshold_min is not None and value < threshold_min:
+        return True
+    return False
+
+def _slope_per_day(points) -> float:
+    """Least-squares slope of (timestamp, value) points in units per day"""
+    if len(points) < 2:
+        return None
+    t0 = points[0][0]
+    xs = [(t - t0).total_seconds() / 86400 for t, _ in points]
+    ys = [v for _, v in points]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    if var_x == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+
+
+# ============ MONITORING ============
+def summarize_monitoring(rows, now: datetime = None) -> list:
+    """Reduce raw monitoring rows to one statistics record per (reading_type, location) series"""
+    now = now or datetime.utcnow()
+
+    series = {}
+    for row in rows or []:
+        if not isinstance(row, dict) and not hasattr(row, "reading_type"):
+            continue  # e.g. an {"error": ...} placeholder
+        value = _field(row, "value")
+        timestamp = _parse_timestamp(_field(row, "timestamp"))
+        if value is None or timestamp is None:
+            continue
+        key = (_field(row, "reading_type") or "unknown", _field(row, "location") or "-")
+        series.setdefault(key, []).append((timestamp, float(value), row))
+
+    summaries = []
+    for (reading_type, location), points in series.items():
+        points.sort(key=lambda p: p[0])
+        latest_ts, latest_value, latest_row = points[-1]
+        threshold_min = _field(latest_row, "threshold_min")
+        threshold_max = _field(latest_row, "threshold_max")
+
+        windows = {}
+        for label, span in WINDOWS:
+            values = [v for t, v, _ in points if t >= latest_ts - span]
+            windows[label] = {
+                "min": min(values),
+                "max": max(values),
+                "mean": sum(values) / len(values),
+                "count": len(values)
+            }
+
+        breaches = [
+            t for t, v, row in points
+            if is_breach(v, _field(row, "status"), _field(row, "threshold_min"), _field(row, "threshold_max"))
+        ]
+
+        summaries.append({
+            "reading_type": reading_type,
+            "location": location,
+            "unit": _field(latest_row, "unit") or "",
+            "latest": latest_value,
+            "latest_status": _field(latest_row, "status"),
+            "latest_at": latest_ts,
+            "threshold_min": threshold_min,
+            "threshold_max": threshold_max,
+            "windows": windows,
+            "slope_per_day": _slope_per_day([(t, v) for t, v, _ in points if t >= latest_ts - WINDOWS[-1][1]]),
+            "readings": len(points),
+            "breaches": len(breaches),
+            "since_last_breach": (now - breaches[-1]) if breaches else None
+        })
+
+    # Breaching series first so they survive budget trimming
+    summaries.sort(key=lambda s: (-s["breaches"], s["reading_type"], s["location"]))
+    return summaries
+
+def format_reading(reading) -> str:
+    """Latest reading of one series, flagged when it breaches"""
+    value = _field(reading, "value")
+    status = _field(reading, "status")
+    threshold_min = _field(reading, "threshold_min")
+    threshold_max = _field(reading, "threshold_max")
+    flag = " BREACH" if is_breach(value, status, threshold_min, threshold_max) else ""
+    return (
+        f"{_field(reading, 'reading_type')}@{_field(reading, 'location')}: {_fmt(value)}{_field(reading, 'unit') or ''} "
+        f"({status or '-'}) [{_fmt(threshold_min)},{_fmt(threshold_max)}] at {_field(reading, 'timestamp')}{flag}"
+    )
+
+def format_series(summary: dict) -> str:
+    """One compact table line per series"""
+    cells = [
+        f"{summary['reading_type']}@{summary['location']}",
+        f"{_fmt(summary['latest'])}{summary['unit']} ({summary['latest_status'] or '-'})",
+        f"[{_fmt(summary['threshold_min'])},{_fmt(summary['threshold_max'])}]",
+    ]
+    for label, _ in WINDOWS:
+        w = summary["windows"][label]
+        cells.append(f"{_fmt(w['min'])}/{_fmt(w['max'])}/{_fmt(w['mean'])}")
+    cells.append(_fmt(summary["slope_per_day"]))
+    cells.append(f"{summary['breaches']}/{summary['readings']}")
+    cells.append(_fmt_age(summary["since_last_breach"]))
+    return " | ".join(cells)
+
+MONITORING_HEADER = (
+    "series | latest (status) | [min,max] threshold | "
+    + " | ".join(f"{label} min/max/mean" for label, _ in WINDOWS)
+    + " | slope/day | breaches/readings | since last breach"
+)
+
+
+# ============ MAINTENANCE ============
+def summarize_maintenance(rows, recent: int = RECENT_MAINTENANCE) -> dict:
+    """Counts by status/severity plus the most recent logs"""
+    logs = [row for row in rows or [] if isinstance(row, dict) or hasattr(row, "severity")]
+
+    by_status = {}
+    by_severity = {}
+    for log in logs:
+        status = _field(log, "status") or ("resolved" if _field(log, "date_resolved") else "open")
+        by_status[status] = by_status.get(status, 0) + 1
+        severity = _field(log, "severity") or "unknown"
+        by_severity[severity] = by_severity.get(severity, 0) + 1
+
+    ordered = sorted(logs, key=lambda log: str(_field(log, "date_reported") or ""), reverse=True)
+
+    return {
+        "total": len(logs),
+        "by_status": by_status,
+        "by_severity": by_severity,
+        "last_reported": _field(ordered[0], "date_reported") if ordered else None,
+        "recent": [
+            {
+                "date_reported": _field(log, "date_reported"),
+                "severity": _field(log, "severity"),
+                "status": _field(log, "status") or ("resolved" if _field(log, "date_resolved") else "open"),
+                "date_predicted": _field(log, "date_predicted"),
+                "issue": str(_field(log, "issue_description") or "")[:80]
+            }
+            for log in ordered[:recent]
+        ]
+    }
+
+def format_maintenance(summary: dict) -> list:
+    if not summary["total"]:
+        return ["MAINTENANCE: no records"]
+
+    status = ", ".join(f"{k}={v}" for k, v in sorted(summary["by_status"].items()))
+    severity = ", ".join(f"{k}={v}" for k, v in sorted(summary["by_severity"].items()))
+    lines = [
+        f"MAINTENANCE: {summary['total']} records ({status}); severity: {severity}; last reported {summary['last_reported']}"
+    ]
+    for log in summary["recent"]:
+        predicted = f", predicted {log['date_predicted']}" if log["date_predicted"] else ""
+        lines.append(f"- {log['date_reported']} [{log['severity']}/{log['status']}{predicted}] {log['issue']}")
+    return lines
+
+
+# ============ PAYLOAD BUILDERS ============
+def fit_lines(lines: list, token_budget: int, omitted_label: str = "lines") -> list:
+    """Keep lines in order until the budget is spent, then note how many were dropped.
+    The note counts against the budget too; only a budget too small for the note alone is exceeded"""
+    kept = []
+    used = 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            break
+        kept.append(line)
+        used += cost
+    else:
+        return kept
+
+    # Drop kept lines from the end until the note fits
+    while kept:
+        note = f"... {len(lines) - len(kept)} more {omitted_label} omitted"
+        if used + estimate_tokens(note) + 1 <= token_budget:
+            break
+        used -= estimate_tokens(kept.pop()) + 1
+    return kept + [f"... {len(lines) - len(kept)} more {omitted_label} omitted"]
+
+def build_monitoring_payload(monitoring_rows, token_budget: int = None, now: datetime = None) -> str:
+    token_budget = PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+    summaries = summarize_monitoring(monitoring_rows, now=now)
+
+    if not summaries:
+        return "MONITORING: no data available"
+
+    total_readings = sum(s["readings"] for s in summaries)
+    header = [f"MONITORING: {total_readings} readings in {len(summaries)} series", MONITORING_HEADER]
+    budget = token_budget - sum(estimate_tokens(line) + 1 for line in header)
+    return "\n".join(header + fit_lines([format_series(s) for s in summaries], budget, "series"))
+
+def build_maintenance_payload(maintenance_rows, token_budget: int = None, recent: int = RECENT_MAINTENANCE) -> str:
+    token_budget = PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+    return "\n".join(fit_lines(format_maintenance(summarize_maintenance(maintenance_rows, recent)), token_budget, "records"))
+
+def build_prompt_payload(monitoring_rows, maintenance_rows, token_budget: int = None, now: datetime = None) -> str:
+    """Compact, budgeted replacement for dumping raw monitoring and maintenance rows into a prompt"""
+    token_budget = PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+
+    # Maintenance is small and bounded, monitoring gets the rest of the budget
+    maintenance = build_maintenance_payload(maintenance_rows, token_budget // 3)
+    monitoring = build_monitoring_payload(monitoring_rows, token_budget - estimate_tokens(maintenance) - 1, now=now)
+    return f"{monitoring}\n{maintenance}"
+
+def fit_blocks(blocks: list, token_budget: int = None, omitted_label: str = "equipments") -> str:
+    """Join per-equipment blocks under a hard fleet-wide budget"""
+    token_budget = FLEET_PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+    return "\n".join(fit_lines(blocks, token_budget, omitted_label))
+
+
+# ============ STREAMING REPORT ============
+class ReportBuilder:
+    """Report text collected as parts and joined once; blocks are pulled from an iterator
+    only while the fleet-wide budget lasts, so omitted equipments are never formatted"""
+
+    def __init__(self, token_budget: int = None, omitted_label: str = "equipments"):
+        self.token_budget = FLEET_PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+        self.omitted_label = omitted_label
+        self.parts = []
+        self.blocks = []
+        self.used = 0
+
+    def write(self, text: str):
+        """Headers and footers, outside the block budget"""
+        self.parts.append(text)
+
+    def add_blocks(self, blocks, total: int) -> int:
+        """Consume blocks until the budget is spent; total is the number the iterator would yield"""
+        kept = 0
+        for block in blocks:
+            cost = estimate_tokens(block) + 1
+            if self.used + cost > self.token_budget:
+                # Drop kept blocks from the end until the note fits, as fit_lines does
+                while kept:
+                    note = f"... {total - kept} more {self.omitted_label} omitted"
+                    if self.used + estimate_tokens(note) + 1 <= self.token_budget:
+                        break
+                    self.parts.pop()
+                    self.used -= estimate_tokens(self.blocks.pop()) + 1
+                    kept -= 1
+                note = f"... {total - kept} more {self.omitted_label} omitted"
+                self.parts.append("\n" + note)
+                self.used += estimate_tokens(note) + 1
+                break
+            self.parts.append("\n" + block)
+            self.blocks.append(block)
+            self.used += cost
+            kept += 1
+        return kept
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from ..LLM_Model import intent_engine
+from ..Embedd import embedd_config as embedd
+from ..Embedd import vector_query as vector
+from ..Observability import tracing
+
+load_dotenv()
+
+# ============ CONFIG ============
+SEMANTIC_ROUTER_ENABLED = os.getenv("SEMANTIC_ROUTER_ENABLED", "false").lower() in ("1", "true", "yes", "on")
+SEMANTIC_EXAMPLES_PATH = os.getenv("SEMANTIC_EXAMPLES_PATH", "Backend/Resources/intent_examples.json")
+SEMANTIC_CENTROIDS_PATH = os.getenv("SEMANTIC_CENTROIDS_PATH", "Backend/Resources/intent_centroids.npz")
+SEMANTIC_ROUTER_THRESHOLD = float(os.getenv("SEMANTIC_ROUTER_THRESHOLD", "0.35"))  # minimum cosine similarity
+SEMANTIC_ROUTER_MARGIN = float(os.getenv("SEMANTIC_ROUTER_MARGIN", "0.03"))        # lead over general_chat
+SEMANTIC_ROUTER_COOLDOWN_S = float(os.getenv("SEMANTIC_ROUTER_COOLDOWN_S", "30"))  # keywords only after an embedding failure
+
+
+# ============ CENTROIDS ============
+class IntentCentroids:
+    """One L2-normalized mean embedding per intent, stacked into a (intents x dims) matrix"""
+
+    def __init__(self, intents: list, matrix: np.ndarray):
+        self.intents = intents
+        self.matrix = matrix.astype("float32")
+        self.position = {intent: i for i, intent in enumerate(intents)}
+
+    def scores(self, embedding) -> np.ndarray:
+        query = np.asarray(embedding, dtype="float32")
+        norm = np.linalg.norm(query)
+        return self.matrix @ (query / norm if norm else query)
+
+
+def _examples_key(examples: dict) -> str:
+    # Centroids are only valid for the same examples and the same embedding model
+    raw = json.dumps(examples, sort_keys=True) + f"|{os.getenv('EMBEDD_MODEL')}|{os.getenv('EMBEDD_DIMENSIONS')}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def build_centroids(examples: dict) -> IntentCentroids:
+    """Embed every example in one batch call and average per intent"""
+    intents = list(examples)
+    texts = [text for intent in intents for text in examples[intent]]
+    embeddings = np.asarray(embedd.embedding_model.embed_documents(texts), dtype="float32")
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    rows = []
+    start = 0
+    for intent in intents:
+        mean = embeddings[start:start + len(examples[intent])].mean(axis=0)
+        rows.append(mean / np.linalg.norm(mean))
+        start += len(examples[intent])
+    return IntentCentroids(intents, np.vstack(rows))
+
+def load_centroids(examples_path: str = None, cache_path: str = None) -> IntentCentroids:
+    """Centroids from the on-disk cache, rebuilt (and cached) when the examples or embedding model changed"""
+    cache_path = cache_path or SEMANTIC_CENTROIDS_PATH
+    with open(examples_path or SEMANTIC_EXAMPLES_PATH, "r", encoding="utf-8") as f:
+        examples = json.load(f)
+    key = _examples_key(examples)
+
+    if os.path.exists(cache_path):
+        cached = np.load(cache_path, allow_pickle=False)
+        if str(cached["key"]) == key:
+            return IntentCentroids([str(i) for i in cached["intents"]], cached["matrix"])
+
+    centroids = build_centroids(examples)
+    try:
+        np.savez(cache_path, key=key, intents=np.array(centroids.intents), matrix=centroids.matrix)
+    except OSError as e:
+        print(f"Could not cache intent centroids: {e}")
+    return centroids
+
+
+# ============ ROUTER ============
+class SemanticRouter:
+    """Routes messages keyword rules left at the default intent by similarity to intent centroids"""
+
+    def __init__(self, centroids_loader=load_centroids):
+        self._centroids_loader = centroids_loader
+        self._centroids = None
+        self._lock = threading.Lock()
+        self._unavailable_until = 0.0
+        self.stats = {"keyword": 0, "semantic": 0, "default": 0, "fallback": 0}
+
+    def centroids(self) -> IntentCentroids:
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    self._centroids = self._centroids_loader()
+        return self._centroids
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def route(self, text: str, keyword_result: dict, embedding=None) -> dict:
+        """keyword_result from intent_engine.classify; returns it with 'intent', 'route' and the message 'embedding'.
+        Pass embedding when the message was already embedded this turn"""
+        engine = intent_engine.get_engine()
+        default = engine.rules.default_intent
+        if keyword_result["intent"] != default:
+            self._count("keyword")
+            return {**keyword_result, "route": "keyword", "embedding": None}
+
+        if time.monotonic() < self._unavailable_until:
+            self._count("fallback")
+            return {**keyword_result, "route": "fallback", "embedding": None}
+
+        try:
+            with tracing.span("intent.semantic"):
+                centroids = self.centroids()
+                if embedding is None:
+                    embedding = vector.get_embedding(text)
+        except Exception as e:
+            print(f"Semantic routing unavailable, using keywords: {e}")
+            self._unavailable_until = time.monotonic() + SEMANTIC_ROUTER_COOLDOWN_S
+            self._count("fallback")
+            return {**keyword_result, "route": "fallback", "embedding": None}
+
+        scores = centroids.scores(embedding)
+        requires_serial = {rule.name for rule in engine.intents if rule.requires_serial}
+        allowed = [
+            (float(scores[i]), intent) for i, intent in enumerate(centroids.intents)
+            if intent not in requires_serial or keyword_result["serial_number"]
+        ]
+        similarity, intent = max(allowed) if allowed else (0.0, default)
+        default_similarity = float(scores[centroids.position[default]]) if default in centroids.position else 0.0
+
+        result = {**keyword_result, "embedding": embedding, "semantic_scores": {i: round(float(s), 4) for i, s in zip(centroids.intents, scores)}}
+        if intent != default and similarity >= SEMANTIC_ROUTER_THRESHOLD and similarity - default_similarity >= SEMANTIC_ROUTER_MARGIN:
+            self._count("semantic")
+            return {**result, "intent": intent, "route": "semantic"}
+        self._count("default")
+        return {**result, "route": "default"}
+
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_router() -> SemanticRouter:
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = SemanticRouter()
+    return _router
+
+def route(text: str, keyword_result: dict, embedding=None) -> dict:
+    """Semantic routing when SEMANTIC_ROUTER_ENABLED, otherwise the keyword result unchanged"""
+    if not SEMANTIC_ROUTER_ENABLED:
+        return {**keyword_result, "route": "keyword", "embedding": None}
+    return get_router().route(text, keyword_result, embedding)
+
+
+# ============ BENCHMARK ============
+# Held-out paraphrases, not in intent_examples.json
+BENCHMARK_LABELED = [
+    ("which machines are overheating", "list_all_monitoring"),
+    ("is anything running hot at the moment?", "list_all_monitoring"),
+    ("any sensors in alarm?", "list_all_monitoring"),
+    ("what readings are out of range?", "list_all_monitoring"),
+    ("what do we have installed on site?", "list_equipments"),
+    ("list the machines", "list_equipments"),
+    ("what devices are in the system?", "list_equipments"),
+    ("which repairs are still pending?", "list_all_maintenance"),
+    ("show me the open work orders", "list_all_maintenance"),
+    ("what has been fixed lately?", "list_all_maintenance"),
+    ("how healthy is the fleet overall?", "batch_equipment_details"),
+    ("full status report for all machines please", "batch_equipment_details"),
+    ("summarize every asset's condition", "batch_equipment_details"),
+    ("how do I wear hearing protection near compressors?", "general_chat"),
+    ("good morning", "general_chat"),
+    ("what is the weather like?", "general_chat"),
+    ("what safety gear is required for welding?", "general_chat"),
+    ("list all equipment", "list_equipments"),
+    ("show all maintenance logs", "list_all_maintenance"),
+    ("give me details of all equipment", "batch_equipment_details"),
+]
+
+
+def benchmark_router(labeled: list = None) -> dict:
+    """Routing accuracy of keywords alone vs keywords + semantic router, and the latency the router adds"""
+    labeled = labeled or BENCHMARK_LABELED
+    router = SemanticRouter()
+
+    start = time.perf_counter()
+    router.centroids()
+    centroid_load_s = time.perf_counter() - start
+
+    keyword_hits = semantic_hits = 0
+    added = []
+    misrouted = []
+    for text, expected in labeled:
+        keyword_result = intent_engine.classify(text)
+        start = time.perf_counter()
+        routed = router.route(text, keyword_result)
+        added.append(time.perf_counter() - start)
+        keyword_hits += keyword_result["intent"] == expected
+        semantic_hits += routed["intent"] == expected
+        if routed["intent"] != expected:
+            misrouted.append({"text": text, "expected": expected, "routed": routed["intent"]})
+
+    added.sort()
+    return {
+        "messages": len(labeled),
+        "keyword_accuracy": round(keyword_hits / len(labeled), 3),
+        "semantic_accuracy": round(semantic_hits / len(labeled), 3),
+        "added_latency_p50_ms": round(added[len(added) // 2] * 1000, 2),
+        "added_latency_max_ms": round(added[-1] * 1000, 2),
+        "centroid_load_s": round(centroid_load_s, 3),
+        "routes": dict(router.stats),
+        "misrouted": misrouted,
+    }
+
+
+if __name__ == "__main__":
+    print(benchmark_router())
@@ -0,0 +1,248 @@
+import os
+import re
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from ..Model import equipments as eq
+
+load_dotenv()
+
+# ============ CONFIG ============
+SERIAL_INDEX_REFRESH_S = float(os.getenv("SERIAL_INDEX_REFRESH_S", "300"))  # full reload, catches writes from other workers
+SERIAL_MIN_PREFIX = int(os.getenv("SERIAL_MIN_PREFIX", "3"))
+SERIAL_MAX_EDITS = int(os.getenv("SERIAL_MAX_EDITS", "2"))
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_/.#][a-z0-9]+)*")
+SEPARATORS_RE = re.compile(r"[^a-z0-9]")
+_END = "\0"
+
+# Mention kinds, best first
+KIND_RANK = {"exact": 0, "prefix": 1, "fuzzy": 2, "name": 3}
+
+
+# ============ HELPER FUNCTIONS ============
+def normalize_serial(text: str) -> str:
+    """Case and separators do not matter: 'SN-0001', 'sn 0001' and 'sn0001' are one key"""
+    return SEPARATORS_RE.sub("", text.lower())
+
+def max_edits(length: int) -> int:
+    """Typo budget grows with the mention: none for very short tokens"""
+    if length < 4:
+        return 0
+    return min(SERIAL_MAX_EDITS, 1 if length < 10 else 2)
+
+
+# ============ TRIE ============
+class Trie:
+    """Nested-dict trie over any sequence (characters or words); each key maps to a set of serials"""
+
+    def __init__(self):
+        self.root = {}
+        self.keys = 0
+
+    def insert(self, key, value):
+        node = self.root
+        for part in key:
+            node = node.setdefault(part, {})
+        if _END not in node:
+            node[_END] = set()
+            self.keys += 1
+        node[_END].add(value)
+
+    def get(self, key):
+        node = self.root
+        for part in key:
+            node = node.get(part)
+            if node is None:
+                return None
+        return node.get(_END)
+
+    def with_prefix(self, key, limit: int = 2) -> set:
+        """Values under the prefix, stopping once more than limit are found"""
+        node = self.root
+        for part in key:
+            node = node.get(part)
+            if node is None:
+                return set()
+        found = set()
+        stack = [node]
+        while stack and len(found) <= limit:
+            node = stack.pop()
+            for part, child in node.items():
+                if part == _END:
+                    found |= child
+                else:
+                    stack.append(child)
+        return found
+
+    def fuzzy(self, key: str, edits: int) -> tuple:
+        """(distance, values) of the closest keys within the edit budget, or None.
+        Levenshtein rows are carried down the trie, computed only inside the diagonal band the bound allows,
+        and a branch stops once it cannot beat the best distance found"""
+        best = [edits, set(), False]  # distance bound, values, found
+        size = len(key)
+        far = edits + 1
+
+        def walk(node, ch, previous, depth):
+            bound = best[0]
+            row = [depth if depth <= bound else far] + [far] * size
+            for i in range(max(1, depth - bound), min(size, depth + bound) + 1):
+                row[i] = min(row[i - 1] + 1, previous[i] + 1, previous[i - 1] + (key[i - 1] != ch))
+            if _END in node and row[-1] <= best[0]:
+                if row[-1] < best[0] or not best[2]:
+                    best[0], best[1], best[2] = row[-1], set(node[_END]), True
+                else:
+                    best[1] |= node[_END]
+            if min(row) <= best[0]:
+                for part, child in node.items():
+                    if part != _END:
+                        walk(child, part, row, depth + 1)
+
+        first_row = [i if i <= edits else far for i in range(size + 1)]
+        for part, child in self.root.items():
+            if part != _END:
+                walk(child, part, first_row, 1)
+        return (best[0], best[1]) if best[2] else None
+
+    def longest_match(self, words: list, start: int):
+        """Longest key starting at words[start]: (end, values) or None"""
+        node = self.root
+        best = None
+        for i in range(start, len(words)):
+            node = node.get(words[i])
+            if node is None:
+                break
+            if _END in node:
+                best = (i + 1, node[_END])
+        return best
+
+
+# ============ INDEX ============
+class SerialIndex:
+    """Known serials (exact, prefix, typo-tolerant) plus equipment names and models (whole words)"""
+
+    def __init__(self):
+        self.serials = Trie()   # normalized serial -> serial
+        self.phrases = Trie()   # words of a name or model -> serials
+        self.loaded_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows):
+        index = cls()
+        for row in rows:
+            index.add(row.serial, row.name, row.model)
+        return index
+
+    def add(self, serial: str, name: str = None, model: str = None):
+        with self._lock:
+            self.serials.insert(normalize_serial(serial), serial)
+            for phrase in (name, model):
+                words = TOKEN_RE.findall((phrase or "").lower())
+                if words:
+                    self.phrases.insert(words, serial)
+
+    def _serial_mention(self, key: str):
+        exact = self.serials.get(key)
+        if exact:
+            return "exact", 0, exact
+        # Prefix and typo tolerance only for serial-like tokens, never for plain words like 'status'
+        if len(key) < SERIAL_MIN_PREFIX or not any(ch.isdigit() for ch in key):
+            return None
+        prefixed = self.serials.with_prefix(key)
+        if prefixed:
+            return "prefix", 0, prefixed
+        edits = max_edits(len(key))
+        if edits:
+            match = self.serials.fuzzy(key, edits)
+            if match:
+                distance, serials = match
+                return "fuzzy", distance, serials
+        return None
+
+    def resolve(self, message: str) -> list:
+        """Every equipment mention in the message, best first; 'serials' may hold several for ambiguous mentions"""
+        words = TOKEN_RE.findall(message.lower())
+        mentions = []
+        with self._lock:
+            for i, word in enumerate(words):
+                found = self._serial_mention(normalize_serial(word))
+                if found is None and i + 1 < len(words):
+                    # 'sn 0001' written with a space
+                    exact = self.serials.get(normalize_serial(word + words[i + 1]))
+                    if exact:
+                        found = ("exact", 0, exact)
+                        word = f"{word} {words[i + 1]}"
+                if found:
+                    kind, distance, serials = found
+                    mentions.append({"text": word, "kind": kind, "distance": distance, "serials": sorted(serials)})
+
+            i = 0
+            while i < len(words):
+                match = self.phrases.longest_match(words, i)
+                if match is None:
+                    i += 1
+                    continue
+                end, serials = match
+                mentions.append({"text": " ".join(words[i:end]), "kind": "name", "distance": 0, "serials": sorted(serials)})
+                i = end
+
+        mentions.sort(key=lambda m: (KIND_RANK[m["kind"]], m["distance"], len(m["serials"])))
+        return mentions
+
+    def best(self, message: str):
+        """The serial of the best unambiguous mention, or None"""
+        for mention in self.resolve(message):
+            if len(mention["serials"]) == 1:
+                return mention["serials"][0]
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "serials": self.serials.keys,
+            "phrases": self.phrases.keys,
+            "age_s": round(time.monotonic() - self.loaded_at, 1),
+        }
+
+
+# ============ PROCESS-WIDE INDEX ============
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """Index loaded from the equipments table and reloaded every SERIAL_INDEX_REFRESH_S; None if the DB is unavailable"""
+    global _index
+    index = _index
+    if index is not None and time.monotonic() - index.loaded_at < SERIAL_INDEX_REFRESH_S:
+        return index
+    with _index_lock:
+        if _index is None or time.monotonic() - _index.loaded_at >= SERIAL_INDEX_REFRESH_S:
+            try:
+                _index = SerialIndex.from_rows(eq.list_equipments())
+            except Exception as e:
+                print(f"Serial index unavailable: {e}")
+                return _index  # Keep serving a stale index rather than none
+        return _index
+
+def invalidate():
+    """Force a full reload on the next lookup"""
+    global _index
+    with _index_lock:
+        _index = None
+
+def _on_equipment_added(serial, name, model):
+    index = _index
+    if index is not None:
+        index.add(serial, name, model)
+
+eq.on_equipment_change(_on_equipment_added)
+
+
+def resolve_serial(message: str, candidate: str = None):
+    """Canonical serial named in the message; falls back to the regex candidate when the index cannot load"""
+    index = get_index()
+    if index is None:
+        return candidate
+    return index.best(message)
@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from ..LLM_Model import fleet_report
+from ..LLM_Model import prompt_payload as payload
+from ..Model import equipments as eq
+
+load_dotenv()
+
+# ============ CONFIG ============
+SNAPSHOT_REFRESH_S = float(os.getenv("SNAPSHOT_REFRESH_S", "900"))  # background rebuild, catches writes from other workers
+
+
+# ============ SNAPSHOTS ============
+def render(record: dict) -> dict:
+    """Snapshot: a fleet_report status record plus its ready-to-prompt text"""
+    return {
+        **record,
+        "detail_text": fleet_report.equipment_body(record),
+        "monitoring_text": fleet_report.monitoring_body(record),
+        "updated_at": datetime.utcnow()
+    }
+
+def apply_reading(snapshot: dict, reading: dict) -> dict:
+    """A new snapshot with one committed reading folded in, without touching the database"""
+    breach = payload.is_breach(reading["value"], reading["status"], reading["threshold_min"], reading["threshold_max"])
+    latest = {**reading, "breach": breach}
+
+    readings = list(snapshot["readings"])
+    key = (reading["reading_type"], reading["location"])
+    position = next((i for i, r in enumerate(readings) if (r["reading_type"], r["location"]) == key), None)
+    if position is None:
+        readings.append(latest)
+        readings.sort(key=lambda r: (r["reading_type"], r["location"] or ""))
+    elif reading["timestamp"] >= readings[position]["timestamp"]:
+        readings[position] = latest
+    # An older, late-arriving reading only changes the counts
+
+    stats = dict(snapshot["monitoring"] or {"readings": 0, "breaches": 0, "last_reading_at": None, "last_breach_at": None})
+    stats["readings"] += 1
+    if stats["last_reading_at"] is None or reading["timestamp"] > stats["last_reading_at"]:
+        stats["last_reading_at"] = reading["timestamp"]
+    if breach:
+        stats["breaches"] += 1
+        if stats["last_breach_at"] is None or reading["timestamp"] > stats["last_breach_at"]:
+            stats["last_breach_at"] = reading["timestamp"]
+
+    return render({
+        **snapshot,
+        "readings": readings,
+        "monitoring": stats,
+        "attention": any(r["breach"] for r in readings)
+    })
+
+
+# ============ STORE ============
+class SnapshotStore:
+    """Serial -> snapshot, in equipment list order. Snapshots are never mutated: writers swap in a new one
+    under the lock, so readers can use what they got without copying"""
+
+    def __init__(self, loader=fleet_report.load_fleet_status):
+        self._loader = loader
+        self._snapshots = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._rebuilding = False
+        self._touched = set()  # serials written while a rebuild was reading the database
+        self.loaded_at = 0.0
+        self.stats = {"rebuilds": 0, "readings_applied": 0, "equipment_refreshes": 0}
+
+    def rebuild(self):
+        """Full reload from the set-based fleet queries"""
+        with self._build_lock:
+            self._rebuild_locked()
+
+    def _rebuild_locked(self):
+        with self._lock:
+            self._rebuilding = True
+            self._touched = set()
+        try:
+            snapshots = {record["equipment"]["serial"]: render(record) for record in self._loader()}
+        except Exception:
+            with self._lock:
+                self._rebuilding = False
+            raise
+        with self._lock:
+            self._snapshots = snapshots
+            self.loaded_at = time.monotonic()
+            self.stats["rebuilds"] += 1
+            self._rebuilding = False
+            touched, self._touched = self._touched, set()
+        # Writes that raced the reload may be missing from it
+        for serial in touched:
+            self.refresh(serial)
+
+    def _rebuild_in_background(self):
+        if not self._build_lock.acquire(blocking=False):
+            return  # Already rebuilding
+        def run():
+            try:
+                self._rebuild_locked()
+            except Exception as e:
+                print(f"Snapshot rebuild failed, serving stale snapshots: {e}")
+            finally:
+                self._build_lock.release()
+        threading.Thread(target=run, daemon=True).start()
+
+    def _ensure_loaded(self):
+        if self._snapshots is None:
+            with self._build_lock:
+                if self._snapshots is None:
+                    self._rebuild_locked()
+        elif time.monotonic() - self.loaded_at >= SNAPSHOT_REFRESH_S:
+            self._rebuild_in_background()
+
+    def snapshots(self) -> list:
+        """Every equipment's snapshot, in equipment list order"""
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._snapshots.values())
+
+    def get(self, serial: str):
+        self._ensure_loaded()
+        with self._lock:
+            return self._snapshots.get(serial)
+
+    def refresh(self, serial: str):
+        """Reload one equipment's record (a handful of index lookups); drops it if the equipment is gone"""
+        if self._snapshots is None:
+            return
+        records = self._loader(serial=serial)
+        with self._lock:
+            if self._rebuilding:
+                self._touched.add(serial)
+            if records:
+                self._snapshots[serial] = render(records[0])
+            else:
+                self._snapshots.pop(serial, None)
+            self.stats["equipment_refreshes"] += 1
+
+    def on_reading(self, reading: dict):
+        if self._snapshots is None:
+            return
+        serial = reading["equipment_serial"]
+        with self._lock:
+            if self._rebuilding:
+                self._touched.add(serial)
+            snapshot = self._snapshots.get(serial)
+            if snapshot is not None:
+                self._snapshots[serial] = apply_reading(snapshot, reading)
+                self.stats["readings_applied"] += 1
+
+    def describe(self) -> dict:
+        return {
+            "equipments": len(self._snapshots or {}),
+            "age_s": round(time.monotonic() - self.loaded_at, 1) if self._snapshots is not None else None,
+            **self.stats
+        }
+
+
+# ============ PROCESS-WIDE STORE ============
+store = SnapshotStore()
+
+eq.on_monitoring_write(store.on_reading)
+eq.on_equipment_write(store.refresh)
+
+
+def snapshots() -> list:
+    return store.snapshots()
+
+def get(serial: str):
+    return store.get(serial)
+
+
+# ============ BENCHMARK ============
+def benchmark_snapshots(assets: int = 5000, readings_per_series: int = 24, reports: int = 20, db_url: str = "sqlite://") -> dict:
+    """Fleet report build time from snapshots vs the set-based queries, and the cost of one incremental update"""
+    import sqlalchemy as sql
+
+    bench_engine = sql.create_engine(db_url)
+    fleet_report._seed_fleet(bench_engine, assets, readings_per_series, 3)
+
+    previous_engine, previous_ready = eq.engine, eq._fleet_indexes_ready
+    eq.engine, eq._fleet_indexes_ready = bench_engine, False
+    try:
+        bench_store = SnapshotStore()
+        start = time.perf_counter()
+        bench_store.rebuild()
+        rebuild_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(reports):
+            fleet_report.batch_report(bench_store.snapshots()).getvalue()
+        snapshot_report_s = (time.perf_counter() - start) / reports
+
+        start = time.perf_counter()
+        fleet_report.batch_report(fleet_report.load_fleet_status()).getvalue()
+        query_report_s = time.perf_counter() - start
+
+        serial = bench_store.snapshots()[assets // 2]["equipment"]["serial"]
+        reading = {
+            "id": 0, "equipment_serial": serial, "timestamp": datetime.utcnow(), "status": "critical", "reading_type": "vibration",
+            "value": 9.9, "unit": "mm/s", "location": "DE", "threshold_min": 0.0, "threshold_max": 4.5
+        }
+        start = time.perf_counter()
+        for _ in range(1000):
+            bench_store.on_reading(reading)
+        apply_us = (time.perf_counter() - start) / 1000 * 1e6
+
+        start = time.perf_counter()
+        bench_store.refresh(serial)
+        refresh_ms = (time.perf_counter() - start) * 1000
+    finally:
+        eq.engine, eq._fleet_indexes_ready = previous_engine, previous_ready
+        bench_engine.dispose()
+
+    return {
+        "assets": assets,
+        "rebuild_s": round(rebuild_s, 3),
+        "report_from_snapshots_ms": round(snapshot_report_s * 1000, 2),
+        "report_from_queries_ms": round(query_report_s * 1000, 1),
+        "apply_reading_us": round(apply_us, 1),
+        "refresh_equipment_ms": round(refresh_ms, 2),
+    }
+
+
+if __name__ == "__main__":
+    print(benchmark_snapshots())
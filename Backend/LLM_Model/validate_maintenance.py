@@ -7,7 +7,9 @@ import operator
 from pydantic import BaseModel, Field
 
 # Import your existing modules
-from ..LLM_Model import llm_config as llm
+from ..LLM_Model import llm_client
+from ..LLM_Model import prompt_payload as payload
+from ..Observability.instrumentation import instrument_node, run_report
 from ..Controller import Controller as ctrl
 
 
@@ -133,41 +135,13 @@ def parse_ai_response(text: str) -> Dict[str, Any]:
 
 
 def format_data_for_ai(monitoring_data: List[Dict], history: List[Dict]) -> str:
-    """Format data for AI analysis"""
-    # Get recent monitoring
-    recent_monitoring = monitoring_data[-10:] if len(monitoring_data) > 10 else monitoring_data
-    
-    formatted = "Recent Monitoring Data:\n"
-    if recent_monitoring:
-        for i, entry in enumerate(recent_monitoring, 1):
-            timestamp = entry.get('timestamp', 'No timestamp')
-            if isinstance(timestamp, str) and len(timestamp) > 20:
-                timestamp = timestamp[:20] + "..."
-            
-            parameter = str(entry.get('parameter', 'Unknown'))[:30]
-            value = str(entry.get('value', 'N/A'))[:30]
-            unit = str(entry.get('unit', ''))[:10]
-            
-            formatted += f"{i}. {timestamp}: {parameter} = {value} {unit}\n"
-    else:
-        formatted += "No monitoring data available\n"
-    
-    formatted += "\nMaintenance History:\n"
-    if history:
-        for i, record in enumerate(history[-5:], 1):
-            date = str(record.get('date', 'Unknown'))[:20]
-            action = str(record.get('action', 'Maintenance'))[:50]
-            status = str(record.get('status', 'completed'))[:20]
-            
-            formatted += f"{i}. {date}: {action} - {status}\n"
-    else:
-        formatted += "No previous maintenance records\n"
-    
-    return formatted
+    """Format data for AI analysis as a compact, token-budgeted statistical summary"""
+    return payload.build_prompt_payload(monitoring_data, history)
 
 
 # ============ WORKFLOW NODES ============
 
+@instrument_node("validate_maintenance")
 def fetch_open_logs_node(state: ValidationState) -> Dict[str, Any]:
     """Fetch open maintenance logs"""
     try:
@@ -226,6 +200,7 @@ def fetch_open_logs_node(state: ValidationState) -> Dict[str, Any]:
         }
 
 
+@instrument_node("validate_maintenance")
 def fetch_equipment_data_node(state: ValidationState) -> Dict[str, Any]:
     """Fetch equipment and monitoring data"""
     if not state.get("open_logs"):
@@ -272,7 +247,7 @@ def fetch_equipment_data_node(state: ValidationState) -> Dict[str, Any]:
             # Fetch monitoring logs
             mon_response = ctrl.fetch_monitoring_log(serial)
             if mon_response and isinstance(mon_response, dict):
-                monitoring_data[serial] = mon_response.get("logs", [])
+                monitoring_data[serial] = mon_response.get("monitoring_data", [])
             else:
                 monitoring_data[serial] = []
             
@@ -298,6 +273,7 @@ def fetch_equipment_data_node(state: ValidationState) -> Dict[str, Any]:
     }
 
 
+@instrument_node("validate_maintenance")
 def analyze_and_validate_node(state: ValidationState) -> Dict[str, Any]:
     """Analyze each log and validate against data"""
     if not all([
@@ -361,7 +337,7 @@ def analyze_and_validate_node(state: ValidationState) -> Dict[str, Any]:
         
         try:
             # Get AI analysis
-            ai_response = llm.llm_model.invoke(prompt)
+            ai_response = llm_client.invoke(prompt)
             result = parse_ai_response(ai_response.content)
             
             # Create validation result
@@ -401,6 +377,7 @@ def analyze_and_validate_node(state: ValidationState) -> Dict[str, Any]:
     }
 
 
+@instrument_node("validate_maintenance")
 def generate_final_output_node(state: ValidationState) -> Dict[str, Any]:
     """Generate final concise output"""
     if not state.get("validation_results"):
@@ -558,7 +535,8 @@ def execute_maintenance_validation():
         print("Starting maintenance validation...")
         
         # Run workflow
-        final_state = validation_app.invoke(initial_state)
+        with run_report("validate_maintenance") as report:
+            final_state = validation_app.invoke(initial_state)
         
         # Check for errors
         if final_state.get("errors"):
@@ -571,7 +549,8 @@ def execute_maintenance_validation():
             "analysis_report": final_state.get("final_output", []),
             "total_processed": final_state.get("processed_count", 0),
             "errors": final_state.get("errors", []),
-            "execution_time": final_state.get("current_step", "")
+            "execution_time": final_state.get("current_step", ""),
+            "instrumentation": report.summary()
         }
         
         # Print summary
@@ -0,0 +1,197 @@
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from ..Observability import metrics
+from ..Observability import tracing
+
+load_dotenv()
+
+# ============ CONFIG ============
+LLM_COST_PER_1K_PROMPT = float(os.getenv("LLM_COST_PER_1K_PROMPT", "0"))
+LLM_COST_PER_1K_COMPLETION = float(os.getenv("LLM_COST_PER_1K_COMPLETION", "0"))
+
+# ============ METRICS ============
+NODE_SECONDS = metrics.histogram("workflow_node_seconds", "Wall time of LangGraph nodes", ("workflow", "node"))
+NODE_ERRORS = metrics.counter("workflow_node_errors_total", "LangGraph nodes that raised", ("workflow", "node"))
+RUN_SECONDS = metrics.histogram("workflow_run_seconds", "Wall time of whole workflow runs", ("workflow",))
+DB_SECONDS = metrics.histogram("db_query_seconds", "Latency of data-access functions", ("function",))
+DB_ROWS = metrics.histogram("db_query_rows", "Rows returned by data-access functions", ("function",), metrics.SIZE_BUCKETS)
+LLM_SECONDS = metrics.histogram("llm_call_seconds", "Provider latency of LLM calls", ("workflow", "priority"))
+LLM_TOKENS = metrics.counter("llm_tokens_total", "LLM tokens by direction", ("workflow", "direction"))
+LLM_PROMPT_CHARS = metrics.histogram("llm_prompt_chars", "Prompt payload size in characters", ("workflow",), metrics.SIZE_BUCKETS)
+LLM_COST = metrics.counter("llm_cost_usd_total", "Estimated LLM spend", ("workflow",))
+
+
+# ============ RUN REPORT ============
+class RunReport:
+    """Per-run aggregation of node, DB and LLM timings; shared by every thread the run fans out to"""
+
+    def __init__(self, workflow: str):
+        self.workflow = workflow
+        self.started = time.perf_counter()
+        self.wall_s = None
+        self.nodes = {}
+        self.db = {}
+        self.llm = {"calls": 0, "wall_s": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "prompt_chars": 0, "cost_usd": 0.0}
+        self._lock = threading.Lock()
+
+    def add_node(self, node: str, seconds: float, failed: bool = False):
+        with self._lock:
+            entry = self.nodes.setdefault(node, {"calls": 0, "wall_s": 0.0, "errors": 0})
+            entry["calls"] += 1
+            entry["wall_s"] += seconds
+            entry["errors"] += int(failed)
+
+    def add_db(self, function: str, seconds: float, rows: int = None):
+        with self._lock:
+            entry = self.db.setdefault(function, {"calls": 0, "wall_s": 0.0, "rows": 0})
+            entry["calls"] += 1
+            entry["wall_s"] += seconds
+            entry["rows"] += rows or 0
+
+    def add_llm(self, seconds: float, prompt_tokens: int, completion_tokens: int, prompt_chars: int, cost: float):
+        with self._lock:
+            self.llm["calls"] += 1
+            self.llm["wall_s"] += seconds
+            self.llm["prompt_tokens"] += prompt_tokens
+            self.llm["completion_tokens"] += completion_tokens
+            self.llm["prompt_chars"] += prompt_chars
+            self.llm["cost_usd"] += cost
+
+    def finish(self):
+        self.wall_s = time.perf_counter() - self.started
+        RUN_SECONDS.observe(self.wall_s, workflow=self.workflow)
+
+    def summary(self) -> dict:
+        def rounded(d):
+            return {k: round(v, 4) if isinstance(v, float) else v for k, v in d.items()}
+        with self._lock:
+            return {
+                "workflow": self.workflow,
+                "wall_s": round(self.wall_s if self.wall_s is not None else time.perf_counter() - self.started, 4),
+                "nodes": {name: rounded(v) for name, v in self.nodes.items()},
+                "db": {name: rounded(v) for name, v in sorted(self.db.items(), key=lambda kv: -kv[1]["wall_s"])},
+                "llm": rounded(self.llm),
+            }
+
+
+_current_run = contextvars.ContextVar("run_report", default=None)
+
+def current_run() -> RunReport:
+    return _current_run.get()
+
+@contextmanager
+def run_report(workflow: str):
+    """Collect everything instrumented inside the block into one RunReport"""
+    report = RunReport(workflow)
+    token = _current_run.set(report)
+    try:
+        with tracing.span(f"workflow {workflow}"):
+            yield report
+    finally:
+        report.finish()
+        _current_run.reset(token)
+
+
+# ============ DECORATORS ============
+def _record_node(workflow: str, node: str, seconds: float, failed: bool):
+    if failed:
+        NODE_ERRORS.inc(workflow=workflow, node=node)
+    NODE_SECONDS.observe(seconds, workflow=workflow, node=node)
+    report = _current_run.get()
+    if report is not None:
+        report.add_node(node, seconds, failed)
+
+def instrument_node(workflow: str, node: str = None):
+    """Time a LangGraph node (sync or async); the node name defaults to the function name without its _node suffix"""
+    def decorator(fn):
+        name = node or (fn.__name__[:-5] if fn.__name__.endswith("_node") else fn.__name__)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                failed = False
+                try:
+                    with tracing.span(f"node {workflow}.{name}"):
+                        return await fn(*args, **kwargs)
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    _record_node(workflow, name, time.perf_counter() - start, failed)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            failed = False
+            try:
+                with tracing.span(f"node {workflow}.{name}"):
+                    return fn(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                _record_node(workflow, name, time.perf_counter() - start, failed)
+        return wrapper
+    return decorator
+
+def timed_db(fn):
+    """Time a data-access function and count the rows it returns"""
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = None
+        with tracing.span(f"db {name}") as span:
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            finally:
+                seconds = time.perf_counter() - start
+                rows = len(result) if isinstance(result, (list, tuple)) else (1 if result is not None else 0)
+                span.set_attribute("rows", rows)
+                _record_db(name, seconds, rows)
+    return wrapper
+
+def _record_db(name: str, seconds: float, rows: int):
+    DB_SECONDS.observe(seconds, function=name)
+    DB_ROWS.observe(rows, function=name)
+    report = _current_run.get()
+    if report is not None:
+        report.add_db(name, seconds, rows)
+
+
+# ============ LLM CALLS ============
+def _prompt_chars(messages) -> int:
+    if isinstance(messages, str):
+        return len(messages)
+    return sum(len(str(m.get("content", "") if isinstance(m, dict) else getattr(m, "content", m))) for m in messages)
+
+def record_llm_call(priority: str, seconds: float, messages, result):
+    """Latency, token and cost accounting for one provider call"""
+    chars = _prompt_chars(messages)
+    usage = getattr(result, "usage_metadata", None) or {}
+    prompt_tokens = usage.get("input_tokens") or (chars + 3) // 4
+    completion_tokens = usage.get("output_tokens") or (len(str(getattr(result, "content", ""))) + 3) // 4
+    cost = prompt_tokens / 1000 * LLM_COST_PER_1K_PROMPT + completion_tokens / 1000 * LLM_COST_PER_1K_COMPLETION
+
+    report = _current_run.get()
+    workflow = report.workflow if report is not None else "none"
+    LLM_SECONDS.observe(seconds, workflow=workflow, priority=priority)
+    LLM_TOKENS.inc(prompt_tokens, workflow=workflow, direction="prompt")
+    LLM_TOKENS.inc(completion_tokens, workflow=workflow, direction="completion")
+    LLM_PROMPT_CHARS.observe(chars, workflow=workflow)
+    if cost:
+        LLM_COST.inc(cost, workflow=workflow)
+    if report is not None:
+        report.add_llm(seconds, prompt_tokens, completion_tokens, chars, cost)
@@ -0,0 +1,204 @@
+import hmac
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ============ CONFIG ============
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes", "on")
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_MAX_STORED = int(os.getenv("PROFILING_MAX_STORED", "20"))
+PROFILING_DIR = os.getenv("PROFILING_DIR")  # Optional: also write <id>.folded files here
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY = "profile"
+
+
+# ============ ACCESS ============
+def is_authorized(token: str) -> bool:
+    """Profiling needs PROFILING_ENABLED and the admin PROFILING_TOKEN"""
+    if not PROFILING_ENABLED or not PROFILING_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token, PROFILING_TOKEN)
+
+def request_token(request) -> str:
+    return request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY) or ""
+
+
+# ============ SAMPLING PROFILER ============
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    for marker in ("/Backend/", "/site-packages/"):
+        idx = filename.rfind(marker)
+        if idx >= 0:
+            filename = filename[idx + len(marker):]
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples every thread's stack and keeps those running the target endpoint"""
+
+    def __init__(self, target_code=None, interval_s: float = None):
+        self.target_code = target_code
+        self.interval_s = interval_s or PROFILING_INTERVAL_MS / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self.started = None
+        self.elapsed_s = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                # Only threads currently inside the profiled endpoint (sync worker thread or event loop)
+                if self.target_code is not None and self.target_code not in codes:
+                    continue
+                self.stacks[";".join(_frame_label(code) for code in reversed(codes))] += 1
+                self.samples += 1
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed_s = time.perf_counter() - self.started
+        return self
+
+    def collapsed(self) -> str:
+        """Brendan Gregg collapsed-stack format, readable by flamegraph.pl and speedscope"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+# ============ STORAGE ============
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+
+def store_profile(route: str, profiler: SamplingProfiler) -> str:
+    profile_id = uuid.uuid4().hex[:12]
+    entry = {
+        "id": profile_id,
+        "route": route,
+        "created_at": time.time(),
+        "elapsed_s": round(profiler.elapsed_s, 4),
+        "samples": profiler.samples,
+        "interval_ms": profiler.interval_s * 1000,
+        "collapsed": profiler.collapsed(),
+    }
+    with _profiles_lock:
+        _profiles[profile_id] = entry
+        while len(_profiles) > PROFILING_MAX_STORED:
+            _profiles.popitem(last=False)
+    if PROFILING_DIR:
+        os.makedirs(PROFILING_DIR, exist_ok=True)
+        with open(os.path.join(PROFILING_DIR, f"{profile_id}.folded"), "w", encoding="utf-8") as f:
+            f.write(entry["collapsed"])
+    return profile_id
+
+def get_profile(profile_id: str):
+    with _profiles_lock:
+        return _profiles.get(profile_id)
+
+def list_profiles() -> list:
+    with _profiles_lock:
+        return [{k: v for k, v in entry.items() if k != "collapsed"} for entry in reversed(_profiles.values())]
+
+
+# ============ MIDDLEWARE ============
+def _endpoint_code(app, scope):
+    """Code object of the route that will serve this request (routing has not run yet)"""
+    from starlette.routing import Match
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            endpoint = getattr(route, "endpoint", None)
+            return getattr(endpoint, "__code__", None), getattr(route, "path", scope.get("path"))
+    return None, scope.get("path")
+
+async def profiling_middleware(request, call_next):
+    """Profile a single request when it carries a valid admin profiling token"""
+    token = request_token(request)
+    if not token or not is_authorized(token):
+        return await call_next(request)
+
+    target_code, route = _endpoint_code(request.app, request.scope)
+    profiler = SamplingProfiler(target_code).start()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+    profile_id = store_profile(route, profiler)
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+# ============ TRACEMALLOC ============
+_baseline = None
+_tracemalloc_lock = threading.Lock()
+
+def tracemalloc_action(action: str, top: int = 20, frames: int = 1) -> dict:
+    """start | snapshot (set baseline) | diff (current vs baseline) | top | stop"""
+    global _baseline
+    with _tracemalloc_lock:
+        if action == "start":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(max(frames, 1))
+            _baseline = tracemalloc.take_snapshot()
+            return {"tracing": True, "baseline": "set"}
+
+        if action == "stop":
+            tracemalloc.stop()
+            _baseline = None
+            return {"tracing": False}
+
+        if not tracemalloc.is_tracing():
+            return {"tracing": False, "error": "tracemalloc is not running, call action=start first"}
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        result = {"tracing": True, "current_bytes": current, "peak_bytes": peak}
+
+        if action == "snapshot":
+            _baseline = snapshot
+            result["baseline"] = "set"
+        elif action == "diff":
+            if _baseline is None:
+                result["error"] = "no baseline, call action=snapshot first"
+                return result
+            result["diff"] = [
+                {
+                    "location": str(stat.traceback),
+                    "size_diff_bytes": stat.size_diff,
+                    "size_bytes": stat.size,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in snapshot.compare_to(_baseline, "traceback" if frames > 1 else "lineno")[:top]
+            ]
+        else:
+            result["top"] = [
+                {"location": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:top]
+            ]
+        return result
@@ -0,0 +1,108 @@
+import functools
+import threading
+import time
+
+from ..Observability import metrics
+
+# ============ METRICS ============
+HTTP_REQUESTS = metrics.counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_SECONDS = metrics.histogram("http_request_seconds", "HTTP request latency by route", ("method", "route"))
+HTTP_IN_FLIGHT = metrics.gauge("http_requests_in_flight", "HTTP requests currently being served")
+INGEST_ROWS = metrics.counter("monitoring_ingest_total", "Monitoring readings accepted", ("source",))
+INGEST_REJECTS = metrics.counter("monitoring_ingest_rejected_total", "Monitoring readings rejected", ("reason",))
+EMBEDDING_SECONDS = metrics.histogram("embedding_seconds", "Latency of embedding calls", ("operation",))
+EMBEDDING_TEXTS = metrics.counter("embedding_texts_total", "Texts sent to the embedding model", ("operation",))
+
+_pools = {}
+_caches = {}
+_registry_lock = threading.Lock()
+
+
+# ============ HTTP MIDDLEWARE ============
+def _route_template(request) -> str:
+    # Label by the matched route template (/monitoring/{equipment_serial}), never the raw path
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+async def metrics_middleware(request, call_next):
+    """Count and time every request; register with app.middleware("http")"""
+    start = time.perf_counter()
+    HTTP_IN_FLIGHT.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        route = _route_template(request)
+        HTTP_REQUESTS.inc(method=request.method, route=route, status=status)
+        HTTP_SECONDS.observe(time.perf_counter() - start, method=request.method, route=route)
+
+
+# ============ DATABASE POOL ============
+def register_pool(name: str, engine):
+    """Expose a SQLAlchemy engine's pool usage, read at scrape time"""
+    with _registry_lock:
+        _pools[name] = engine
+
+def _pool_stats() -> dict:
+    stats = {}
+    for name, engine in list(_pools.items()):
+        pool = engine.pool
+        for state, reader in (("size", "size"), ("checked_out", "checkedout"), ("checked_in", "checkedin"), ("overflow", "overflow")):
+            fn = getattr(pool, reader, None)
+            if fn is not None:
+                try:
+                    stats[(name, state)] = fn()
+                except Exception:
+                    continue  # e.g. StaticPool does not track size
+    return stats
+
+metrics.gauge("db_pool_connections", "SQLAlchemy pool connections by state", ("engine", "state"), callback=_pool_stats)
+
+
+# ============ CACHES ============
+def register_cache(name: str, stats_fn):
+    """Expose a cache's hit ratio; stats_fn() returns a dict with 'hits' and 'misses'"""
+    with _registry_lock:
+        _caches[name] = stats_fn
+
+def _cache_values(key: str) -> dict:
+    values = {}
+    for name, stats_fn in list(_caches.items()):
+        stats = stats_fn()
+        if key == "ratio":
+            total = stats.get("hits", 0) + stats.get("misses", 0)
+            values[name] = stats.get("hits", 0) / total if total else 0.0
+        else:
+            values[name] = stats.get(key, 0)
+    return values
+
+metrics.gauge("cache_hits", "Cache hits", ("cache",), callback=lambda: _cache_values("hits"))
+metrics.gauge("cache_misses", "Cache misses", ("cache",), callback=lambda: _cache_values("misses"))
+metrics.gauge("cache_hit_ratio", "Cache hit ratio", ("cache",), callback=lambda: _cache_values("ratio"))
+
+
+# ============ INGEST ============
+def record_ingest(rows: int = 1, source: str = "api"):
+    INGEST_ROWS.inc(rows, source=source)
+
+def record_ingest_reject(reason: str, rows: int = 1):
+    INGEST_REJECTS.inc(rows, reason=reason)
+
+
+# ============ EMBEDDINGS ============
+def timed_embedding(operation: str):
+    """Time an embedding call; the first argument is the text or list of texts"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(texts, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(texts, *args, **kwargs)
+            finally:
+                EMBEDDING_SECONDS.observe(time.perf_counter() - start, operation=operation)
+                EMBEDDING_TEXTS.inc(1 if isinstance(texts, str) else len(texts), operation=operation)
+        return wrapper
+    return decorator
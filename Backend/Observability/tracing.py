@@ -0,0 +1,232 @@
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ============ CONFIG ============
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")  # none | memory | file | both; off unless opted in
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_MAX_TRACES = int(os.getenv("TRACING_MAX_TRACES", "200"))
+TRACING_MAX_SPANS_PER_TRACE = int(os.getenv("TRACING_MAX_SPANS_PER_TRACE", "5000"))
+
+
+# ============ SPANS ============
+class Span:
+    """OpenTelemetry-style span: ids, parent, wall-clock start/end, attributes and status"""
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status", "thread")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, attributes: dict = None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.status = "ok"
+        self.thread = threading.current_thread().name
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_error(self, error: BaseException):
+        self.status = "error"
+        self.attributes["error"] = f"{type(error).__name__}: {error}"[:300]
+
+    @property
+    def traceparent(self) -> str:
+        """W3C trace context header value"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            "attributes": self.attributes,
+            "status": self.status,
+            "thread": self.thread,
+        }
+
+
+class _NoopSpan:
+    trace_id = span_id = parent_id = None
+    traceparent = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, error):
+        pass
+
+_NOOP = _NoopSpan()
+
+
+# ============ EXPORTERS ============
+class InMemoryExporter:
+    """Keeps the most recent traces for the /debug/traces endpoints"""
+
+    def __init__(self, max_traces: int = TRACING_MAX_TRACES):
+        self.max_traces = max_traces
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            if len(spans) < TRACING_MAX_SPANS_PER_TRACE:
+                spans.append(span)
+
+    def get_trace(self, trace_id: str):
+        with self._lock:
+            spans = list(self._traces.get(trace_id, []))
+        return spans or None
+
+    def list_traces(self, limit: int = 50) -> list:
+        with self._lock:
+            items = [(trace_id, list(spans)) for trace_id, spans in reversed(self._traces.items())][:limit]
+        summaries = []
+        for trace_id, spans in items:
+            root = next((s for s in spans if s.parent_id is None), None) or min(spans, key=lambda s: s.start_ns)
+            start = min(s.start_ns for s in spans)
+            end = max(s.end_ns or s.start_ns for s in spans)
+            summaries.append({
+                "trace_id": trace_id,
+                "root": root.name,
+                "spans": len(spans),
+                "errors": sum(s.status == "error" for s in spans),
+                "duration_ms": round((end - start) / 1e6, 3),
+                "started_at": start / 1e9,
+            })
+        return summaries
+
+
+class FileExporter:
+    """Appends finished spans as JSON lines"""
+
+    def __init__(self, path: str = TRACING_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+memory_exporter = InMemoryExporter()
+_exporters = []
+if TRACING_EXPORTER in ("memory", "both"):
+    _exporters.append(memory_exporter)
+if TRACING_EXPORTER in ("file", "both"):
+    _exporters.append(FileExporter())
+
+
+def add_exporter(exporter):
+    """Register any object with an export(span) method"""
+    _exporters.append(exporter)
+
+
+# ============ CONTEXT ============
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+def current_span():
+    return _current_span.get()
+
+def parse_traceparent(value: str):
+    """(trace_id, parent span_id) from a W3C traceparent header, or None"""
+    parts = (value or "").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+@contextmanager
+def span(name: str, traceparent: str = None, **attributes):
+    """Child of the current span (or a new trace); context variables carry it into copied contexts and tasks"""
+    if not _exporters:
+        yield _NOOP
+        return
+
+    parent = _current_span.get()
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        remote = parse_traceparent(traceparent)
+        trace_id, parent_id = remote if remote else (secrets.token_hex(16), None)
+
+    current = Span(name, trace_id, parent_id, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        for exporter in _exporters:
+            exporter.export(current)
+
+def traced(name: str = None):
+    """Decorator form of span()"""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ============ HTTP MIDDLEWARE ============
+async def tracing_middleware(request, call_next):
+    """Root span per request, continuing an incoming traceparent header"""
+    with span(f"{request.method} {request.url.path}", traceparent=request.headers.get("traceparent"), kind="server") as root:
+        response = await call_next(request)
+        route = getattr(request.scope.get("route"), "path", None)
+        if route and root.trace_id:
+            root.name = f"{request.method} {route}"  # Template, not the raw path
+        root.set_attribute("route", route)
+        root.set_attribute("status", response.status_code)
+        if root.trace_id:
+            response.headers["traceparent"] = root.traceparent
+        return response
+
+
+# ============ WATERFALL ============
+def waterfall(trace_id: str):
+    """Spans of one trace ordered by start, with offsets and depth for a waterfall view"""
+    spans = memory_exporter.get_trace(trace_id)
+    if not spans:
+        return None
+    spans.sort(key=lambda s: s.start_ns)
+    t0 = spans[0].start_ns
+    depth = {}
+    rows = []
+    for s in spans:
+        depth[s.span_id] = depth.get(s.parent_id, -1) + 1
+        row = s.to_dict()
+        row["offset_ms"] = round((s.start_ns - t0) / 1e6, 3)
+        row["depth"] = depth[s.span_id]
+        rows.append(row)
+    return rows
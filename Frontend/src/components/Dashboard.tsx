@@ -14,6 +14,7 @@ import {
   Loader2
 } from "lucide-react";
 import { useEquipments } from "@/hooks/useEquipments";
+import { useEquipmentSnapshots } from "@/hooks/useEquipmentSnapshots";
 import { useOpenMaintenanceLogs } from "@/hooks/useOpenMaintenanceLogs";
 import { MonitoringDialog } from "./MonitoringDialog";
 import { useToast } from "@/hooks/use-toast";
@@ -45,6 +46,7 @@ import { useMaintenanceList } from "@/hooks/useMaintenanceList";
 
 const Dashboard = () => {
   const { data: equipments, isLoading, error } = useEquipments();
+  const { data: snapshots } = useEquipmentSnapshots();
   const [showAllEquipments, setShowAllEquipments] = useState(false);
   const [selectedSerial, setSelectedSerial] = useState<string | null>(null);
   const [selectedName, setSelectedName] = useState<string | null>(null);
@@ -371,6 +373,11 @@ const Dashboard = () => {
                         <p className="text-xs text-muted-foreground">
                           SN: {equipment.serial}
                         </p>
+                        {snapshots?.[equipment.serial]?.attention && (
+                          <p className="text-xs text-error">
+                            {snapshots[equipment.serial].readings.filter(reading => reading.breach).length} sensor(s) outside thresholds
+                          </p>
+                        )}
                       </div>
                     </div>
                     <div className="text-right">
@@ -43,6 +43,11 @@ const QueryInterface = () => {
 
   const [currentQuery, setCurrentQuery] = useState("");
   const [isLoading, setIsLoading] = useState(false);
+  // Id of the AI message currently receiving streamed tokens
+  const [streamingId, setStreamingId] = useState<string | null>(null);
+
+  // Conversation id issued by the backend, kept for the browser tab
+  const sessionIdRef = useRef<string | null>(sessionStorage.getItem("chatSessionId"));
 
   const querySuggestions: QuerySuggestion[] = [
     {
@@ -97,29 +102,67 @@ const QueryInterface = () => {
     setCurrentQuery("");
     setIsLoading(true);
 
+    const aiId = (Date.now() + 1).toString();
+    let aiStarted = false;
+
+    // Create the AI message on the first token, then grow it in place
+    const updateAiMessage = (content: string, append: boolean) => {
+      if (!aiStarted) {
+        aiStarted = true;
+        setStreamingId(aiId);
+        setMessages(prev => [...prev, { id: aiId, type: "ai", content, timestamp: new Date().toISOString() }]);
+        return;
+      }
+      setMessages(prev => prev.map(m => m.id === aiId ? { ...m, content: append ? m.content + content : content } : m));
+    };
+
     try {
-      const response = await fetch(`http://localhost:8448/response?input=${encodeURIComponent(input)}`, {
+      const sessionParam = sessionIdRef.current ? `&session_id=${encodeURIComponent(sessionIdRef.current)}` : "";
+      const response = await fetch(`http://localhost:8448/response/stream?input=${encodeURIComponent(input)}${sessionParam}`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json"
         }
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error("Failed to get AI response");
       }
 
-      const data = await response.json();
-
-      const aiResponse: ChatMessage = {
-        id: (Date.now() + 1).toString(),
-        type: "ai",
-        content: data.message || "I apologize, but I couldn't process your request.",
-        timestamp: new Date().toISOString(),
-        // suggestedActions: ["View detailed report", "Schedule maintenance"] // Optional: Add if backend provides or keep static
+      // NDJSON: one event per line (session, node, token, done or error)
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      const handleEvent = (event: any) => {
+        switch (event.type) {
+          case "session":
+            sessionIdRef.current = event.session_id;
+            sessionStorage.setItem("chatSessionId", event.session_id);
+            break;
+          case "token":
+            updateAiMessage(event.content, true);
+            break;
+          case "done":
+            // The final message is authoritative (covers retried calls)
+            updateAiMessage(event.message || "I apologize, but I couldn't process your request.", false);
+            break;
+          case "error":
+            throw new Error(event.detail || "Failed to get AI response");
+        }
       };
 
-      setMessages(prev => [...prev, aiResponse]);
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop() ?? "";
+        for (const line of lines) {
+          if (line.trim()) handleEvent(JSON.parse(line));
+        }
+      }
+      if (buffer.trim()) handleEvent(JSON.parse(buffer));
 
     } catch (error) {
       toast({
@@ -138,6 +181,7 @@ const QueryInterface = () => {
       setMessages(prev => [...prev, errorMessage]);
     } finally {
       setIsLoading(false);
+      setStreamingId(null);
     }
   };
 
@@ -318,7 +362,7 @@ const QueryInterface = () => {
                   </div>
                 ))}
 
-                {isLoading && (
+                {isLoading && !streamingId && (
                   <div className="flex justify-start">
                     <div className="bg-card text-card-foreground rounded-lg p-3 shadow-sm">
                       <div className="flex items-center gap-2">
@@ -0,0 +1,23 @@
+import { useQuery } from "@tanstack/react-query";
+import { EquipmentSnapshot } from "../types/equipment";
+
+// Snapshots keyed by equipment serial, for per-row lookups in the dashboard
+export const useEquipmentSnapshots = () => {
+    return useQuery({
+        queryKey: ["equipment-snapshots"],
+        queryFn: async (): Promise<Record<string, EquipmentSnapshot>> => {
+            const response = await fetch("/equipments/snapshots");
+            if (!response.ok) {
+                throw new Error("Failed to fetch equipment snapshots");
+            }
+            const data = await response.json();
+
+            const snapshots: EquipmentSnapshot[] = Array.isArray(data?.snapshots) ? data.snapshots : [];
+            const bySerial: Record<string, EquipmentSnapshot> = {};
+            for (const snapshot of snapshots) {
+                bySerial[snapshot.equipment.serial] = snapshot;
+            }
+            return bySerial;
+        },
+    });
+};
@@ -1,3 +1,5 @@
+import { MonitoringLog } from "./monitoring";
+
 export interface Equipment {
     id: string;
     name: string;
@@ -9,3 +11,26 @@ export interface Equipment {
     status: string;
     maintenance_status: string;
 }
+
+export interface LatestReading extends MonitoringLog {
+    breach: boolean;
+}
+
+export interface EquipmentSnapshot {
+    equipment: Equipment;
+    readings: LatestReading[];
+    monitoring: {
+        readings: number;
+        breaches: number;
+        last_reading_at: string | null;
+        last_breach_at: string | null;
+    } | null;
+    maintenance: {
+        total: number;
+        by_status: Record<string, number>;
+        by_severity: Record<string, number>;
+        last_reported: string | null;
+    } | null;
+    attention: boolean;
+    updated_at: string;
+}
@@ -0,0 +1,48 @@
+"""Tests run offline: stub chat model and embeddings, and a throwaway SQLite database instead of Postgres"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_tmp = tempfile.mkdtemp(prefix="maintenance-tests-")
+
+os.environ.update({
+    "DB_URL": f"sqlite:///{os.path.join(_tmp, 'maintenance.db')}",
+    "LLM_BACKEND": "stub",
+    "EMBEDD_BACKEND": "stub",
+    "STUB_LLM_LATENCY": "fixed",
+    "STUB_LLM_LATENCY_MS": "1",
+    "CHAT_STORE_BACKEND": "memory",
+    "EMBEDDING_CACHE_PATH": "",
+    "TRACING_EXPORTER": "none",
+})
+
+# Resource paths (intent rules, vector index) are relative to the repository root
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+@pytest.fixture
+def db():
+    """Empty tables for every test"""
+    from Backend.Model import equipments as eq
+
+    eq.connection.rollback()  # The shared write connection may hold a failed transaction from an earlier test
+    eq.metadata.drop_all(eq.engine)
+    eq.metadata.create_all(eq.engine)
+    eq._fleet_indexes_ready = False
+    return eq
+
+
+@pytest.fixture
+def seed(db):
+    """seed(serial, values) adds an equipment and one hourly vibration reading per value"""
+    def add(serial: str, values=(), threshold_min: float = 0.0, threshold_max: float = 4.5, start: datetime = datetime(2024, 1, 1)):
+        db.insert_equipments(f"Pump {serial}", "Acme", "M1", serial, "2022-01-01", "Plant")
+        for k, value in enumerate(values):
+            status = "normal" if threshold_min <= value <= threshold_max else "warning"
+            db.insert_monitoring_data(serial, "vibration", value, "mm/s", "DE", status, start + timedelta(hours=k), threshold_min, threshold_max)
+    return add
@@ -0,0 +1,100 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from langchain_core.messages import AIMessage
+
+from Backend.LLM_Model import answer_cache, chatbot, conversation_store, serial_index
+from Backend.LLM_Model.answer_cache import AnswerCache, DataVersions
+
+
+@pytest.fixture
+def fleet(db, seed):
+    seed("SN-0001", [2.0])
+    seed("SN-0002", [2.0])
+    serial_index.invalidate()
+    answer_cache.cache.clear()
+    return db
+
+
+def put(cache, intent, serial=None):
+    embedding = np.ones(8)
+    versions = DataVersions().capture(answer_cache.INTENT_DEPENDENCIES[intent])
+    cache.put(embedding, (intent, serial), intent, "question", "answer", versions)
+    return embedding
+
+
+def test_entries_expire_with_the_tables_they_read(fleet):
+    cache = AnswerCache(size=4)
+    embedding = put(cache, "monitoring_query", "SN-0001")
+    assert cache.find(embedding, ("monitoring_query", "SN-0001"), DataVersions()) is not None
+
+    fleet.insert_monitoring_data("SN-0002", "vibration", 2.5, "mm/s", "DE", "normal", datetime(2024, 2, 1), 0.0, 4.5)
+
+    assert cache.find(embedding, ("monitoring_query", "SN-0001"), DataVersions()) is None
+    assert cache.stats["stale"] == 1
+
+def test_unrelated_writes_keep_entries(fleet):
+    cache = AnswerCache(size=4)
+    embedding = put(cache, "list_equipments")
+
+    fleet.insert_monitoring_data("SN-0001", "vibration", 2.5, "mm/s", "DE", "normal", datetime(2024, 2, 1), 0.0, 4.5)
+    assert cache.find(embedding, ("list_equipments", None), DataVersions()) is not None
+
+    fleet.insert_equipments("Pump 3", "Acme", "M1", "SN-0003", "2022-01-01", "Plant")
+    assert cache.find(embedding, ("list_equipments", None), DataVersions()) is None
+
+def test_entries_only_answer_their_own_key(fleet):
+    cache = AnswerCache(size=4)
+    embedding = put(cache, "monitoring_query", "SN-0001")
+
+    assert cache.find(embedding, ("monitoring_query", "SN-0002"), DataVersions()) is None
+
+def test_lookup_store_round_trip(fleet):
+    question = "show me monitoring data of SN-0001"
+    missed = answer_cache.lookup(question)
+    assert missed["answer"] is None and missed["key"] == ("monitoring_query", "SN-0001")
+
+    answer_cache.store(missed, "monitoring_query", "SN-0001", "all readings normal")
+    assert answer_cache.lookup(question)["answer"] == "all readings normal"
+
+    fleet.insert_monitoring_data("SN-0001", "vibration", 9.0, "mm/s", "DE", "warning", datetime(2024, 2, 1), 0.0, 4.5)
+    assert answer_cache.lookup(question)["answer"] is None
+
+@pytest.mark.parametrize("intent, serial, standalone", [
+    ("list_equipments", None, True),          # The graph routed differently than the lookup key
+    ("monitoring_query", "SN-0002", True),    # ... or answered about another serial
+    ("monitoring_query", "SN-0001", False),   # Earlier turns were in context
+])
+def test_store_skips_answers_the_key_does_not_describe(fleet, intent, serial, standalone):
+    missed = answer_cache.lookup("show me monitoring data of SN-0001")
+
+    answer_cache.store(missed, intent, serial, "some answer", standalone)
+
+    assert answer_cache.cache.describe()["entries"] == 0
+
+def test_follow_up_in_a_session_with_history_misses(fleet, monkeypatch):
+    question = "show me monitoring data of SN-0001"
+    answer_cache.store(answer_cache.lookup(question), "monitoring_query", "SN-0001", "cached answer")
+    with conversation_store.get_store().session("history") as conversation:
+        conversation["messages"] += [{"role": "user", "content": "only count critical readings"},
+                                     {"role": "assistant", "content": "ok"}]
+
+    class Graph:
+        def invoke(self, state):
+            return {"messages": [AIMessage("fresh answer")], "errors": []}
+    monkeypatch.setattr(chatbot, "graph", Graph())
+
+    assert chatbot.chat_model(question, session_id="history") == "fresh answer"
+    assert chatbot.chat_model(question, session_id="new") == "cached answer"
+
+def test_status_update_by_another_worker_expires_entries(fleet):
+    cache = AnswerCache(size=4)
+    embedding = put(cache, "list_equipments")
+
+    # Another worker: its in-process write counts never reach this one
+    counts = dict(fleet._write_counts)
+    fleet.update_equipment_status("SN-0001", "under_maintenance", "in_progress")
+    fleet._write_counts.update(counts)
+
+    assert cache.find(embedding, ("list_equipments", None), DataVersions()) is None
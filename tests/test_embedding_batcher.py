@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from Backend.Embedd.embedding_batcher import EmbeddingBatcher
+
+
+def embed_all(batcher, texts):
+    """Every caller's result or exception, from concurrent embed() calls"""
+    def one(text):
+        try:
+            return batcher.embed(text)
+        except Exception as e:
+            return e
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        return list(pool.map(one, texts))
+
+
+def test_concurrent_requests_share_batches():
+    sizes = []
+    def embed_batch(texts):
+        sizes.append(len(texts))
+        time.sleep(0.02)
+        return [[float(len(text))] for text in texts]
+
+    batcher = EmbeddingBatcher(embed_batch, max_size=64, wait_ms=10, max_inflight=1)
+    texts = [f"question {i}" * (i % 3 + 1) for i in range(32)]
+
+    assert embed_all(batcher, texts) == [[float(len(text))] for text in texts]
+    assert len(sizes) < len(texts)
+
+def test_provider_error_reaches_every_caller_in_the_batch():
+    def embed_batch(texts):
+        time.sleep(0.02)
+        raise ConnectionError("provider down")
+
+    batcher = EmbeddingBatcher(embed_batch, wait_ms=10, max_inflight=1, timeout_s=5)
+    results = embed_all(batcher, [f"q{i}" for i in range(8)])
+
+    assert all(isinstance(r, ConnectionError) for r in results)
+    assert batcher.stats["failed_batches"] >= 1
+
+def test_short_response_fails_instead_of_misassigning_vectors():
+    batcher = EmbeddingBatcher(lambda texts: [[1.0]] * (len(texts) - 1), wait_ms=10, max_inflight=1, timeout_s=5)
+
+    results = embed_all(batcher, ["a", "b", "c"])
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_hung_provider_times_out_the_caller():
+    release = threading.Event()
+    def embed_batch(texts):
+        release.wait(5)
+        return [[0.0]] * len(texts)
+
+    batcher = EmbeddingBatcher(embed_batch, max_inflight=1, timeout_s=0.1)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        batcher.embed("stuck")
+    assert time.monotonic() - start < 1.0
+    release.set()
+
+def test_batcher_recovers_after_a_failure():
+    calls = []
+    def embed_batch(texts):
+        calls.append(texts)
+        if len(calls) == 1:
+            raise ConnectionError("blip")
+        return [[2.0]] * len(texts)
+
+    batcher = EmbeddingBatcher(embed_batch, max_inflight=1, timeout_s=5)
+    with pytest.raises(ConnectionError):
+        batcher.embed("first")
+    assert batcher.embed("second") == [2.0]
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from Backend.LLM_Model import forecasting
+
+
+def series(values, reading_type="temperature", threshold_max=100.0, start=datetime(2024, 1, 1)):
+    return [
+        {"timestamp": start + timedelta(days=k), "reading_type": reading_type, "location": "DE", "value": value,
+         "threshold_min": 0.0, "threshold_max": threshold_max}
+        for k, value in enumerate(values)
+    ]
+
+
+@pytest.mark.parametrize("method", ["ewma", "theil_sen"])
+def test_linear_rise_crosses_on_schedule(method):
+    logs = {"SN-1": series([50.0 + 2.0 * k for k in range(16)])}  # 80 on the last day, +2/day
+
+    forecast = forecasting.forecast_fleet(logs, method=method)["SN-1"]
+
+    assert forecast.threshold == "max"
+    assert forecast.slope_per_day == pytest.approx(2.0, rel=1e-6)
+    assert forecast.days_to_threshold == pytest.approx(10.0, rel=1e-6)
+    assert forecast.date_predicted == datetime(2024, 1, 26)
+    assert forecast.date_lower <= forecast.date_predicted <= (forecast.date_upper or datetime.max)
+
+def test_flat_series_has_no_date():
+    forecast = forecasting.forecast_fleet({"SN-1": series([50.0] * 16)})["SN-1"]
+
+    assert forecast.date_predicted is None
+    assert "No threshold crossing" in forecasting.describe_forecast(forecast)
+
+def test_earliest_sensor_wins():
+    logs = {"SN-1": series([50.0 + k for k in range(16)], "temperature") + series([50.0 + 3 * k for k in range(16)], "pressure")}
+
+    assert forecasting.forecast_fleet(logs)["SN-1"].reading_type == "pressure"
+
+def test_matrix_keeps_the_newest_readings_in_time_order():
+    rows = series([float(k) for k in range(20)])
+    rows.reverse()
+    rows.append({"timestamp": "not a date", "value": 1.0})
+
+    matrix = forecasting.build_series_matrix({"SN-1": rows, "SN-2": "fetch failed"}, window=4)
+
+    assert matrix["keys"] == [("SN-1", "temperature", "DE")]
+    np.testing.assert_array_equal(matrix["v"][0], [16.0, 17.0, 18.0, 19.0])
+    assert matrix["threshold_max"][0] == 100.0
+
+def test_database_columns_match_the_dict_path(db, seed):
+    seed("SN-1", [1.0 + 0.2 * k for k in range(20)])
+    seed("SN-2", [2.0] * 3)
+    db.insert_monitoring_data("SN-1", "temperature", 40.0, "C", "NDE", "normal", datetime(2024, 1, 1), 0.0, None)
+    logs = {serial: [row._asdict() for row in db.list_equipment_monitoring_data(serial)] for serial in ("SN-1", "SN-2")}
+
+    expected = forecasting.build_series_matrix(logs)
+    matrix = forecasting.series_matrix_from_rows(db.list_recent_reading_columns(forecasting.FORECAST_WINDOW))
+
+    order = [expected["keys"].index(key) for key in matrix["keys"]]  # The query returns series sorted by key
+    assert sorted(matrix["keys"]) == sorted(expected["keys"])
+    for name in ("t", "v", "threshold_min", "threshold_max"):
+        np.testing.assert_allclose(matrix[name], expected[name][order], atol=1e-6)
+
+    from_db = forecasting.forecast_fleet_from_db(["SN-1", "SN-2"])
+    expected = forecasting.forecast_fleet(logs)
+    assert from_db["SN-2"] == expected["SN-2"]  # Flat, no date
+    assert (from_db["SN-1"].reading_type, from_db["SN-1"].threshold) == (expected["SN-1"].reading_type, expected["SN-1"].threshold)
+    assert from_db["SN-1"].days_to_threshold == pytest.approx(expected["SN-1"].days_to_threshold)
+    # SQLite's julianday() is only exact to tens of microseconds
+    assert abs(from_db["SN-1"].date_predicted - expected["SN-1"].date_predicted) < timedelta(seconds=1)
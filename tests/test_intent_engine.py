@@ -0,0 +1,32 @@
+import pytest
+
+from Backend.LLM_Model import intent_engine
+
+
+@pytest.mark.parametrize("message, serial", [
+    ("Has SN-0007 had any repair", "SN-0007"),
+    ("details of sn0007 please", "sn0007"),
+    ("pump SN-0012, how is it doing", "SN-0012"),
+    ("status of serial ABC123", "ABC123"),
+    ("maintenance for serial number AC2022-34567", "AC2022-34567"),
+    ("s/n: KR2022-87412 monitoring", "KR2022-87412"),
+    ("repairs on #AC2022-34567", "AC2022-34567"),
+    ("any snow on the roof?", None),
+    ("what is a serial number", None),
+    ("show all equipment", None),
+])
+def test_serial_patterns(message, serial):
+    assert intent_engine.classify(message)["serial_number"] == serial
+
+def test_serial_decides_serial_bound_intents():
+    assert intent_engine.classify("Has SN-0007 had any repair")["intent"] == "maintenance_query"
+    assert intent_engine.classify("any snow repair?")["intent"] == "general_chat"
+
+def test_resolver_replaces_the_regex_candidate():
+    seen = []
+    def resolver(text, candidate):
+        seen.append(candidate)
+        return "SN-0007"
+
+    assert intent_engine.classify("repair history for the compressor", serial_resolver=resolver)["serial_number"] == "SN-0007"
+    assert seen == [None]
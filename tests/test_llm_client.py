@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from Backend.LLM_Model import llm_client, llm_scheduler
+from Backend.LLM_Model.llm_stub import StubChatModel
+
+
+PROMPT = "Equipment: Pump (SN-0001)"
+
+def client(model, **config):
+    return llm_client.LLMClient(llm_client.LLMClientConfig(**{"backoff_base_s": 0.001, **config}), model=model)
+
+
+class ScriptedModel:
+    """invoke() sleeps for the next scripted delay, honouring the request timeout like a provider SDK"""
+
+    def __init__(self, *delays):
+        self.delays = list(delays)
+        self.timeouts = []
+        self.finished = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, messages, timeout=None, **kwargs):
+        with self._lock:
+            delay = self.delays.pop(0) if self.delays else 0.0
+            call = len(self.timeouts)
+            self.timeouts.append(timeout)
+        try:
+            if timeout is not None and delay > timeout:
+                time.sleep(timeout)
+                raise TimeoutError("request timed out")
+            time.sleep(delay)
+            return f"answer {call}"
+        finally:
+            with self._lock:
+                self.finished += 1
+
+
+def test_breaker_opens_fails_fast_and_recovers():
+    stub = StubChatModel(latency="fixed", latency_ms=1, failure_rate=1.0)
+    llm = client(stub, max_retries=0, breaker_failures=3, breaker_reset_s=0.2, hedge_interactive=False)
+
+    for _ in range(3):
+        with pytest.raises(llm_client.LLMError):
+            llm.invoke(PROMPT)
+    assert llm.breaker.state == "open"
+    with pytest.raises(llm_client.LLMUnavailableError):
+        llm.invoke(PROMPT)
+
+    stub.failure_rate = 0.0
+    time.sleep(0.25)
+    llm.invoke(PROMPT)  # Half-open probe succeeds
+    assert llm.breaker.state == "closed"
+    assert llm.metrics()["rejected"] == 1
+
+def test_retries_transient_failures():
+    stub = StubChatModel(latency="fixed", latency_ms=1, failure_rate=0.5, seed=3)
+    llm = client(stub, max_retries=5, breaker_failures=100, hedge_interactive=False)
+
+    for _ in range(10):
+        llm.invoke(PROMPT)
+    assert llm.metrics()["succeeded"] == 10
+    assert llm.metrics()["retries"] > 0
+
+def test_hedge_wins_over_a_stalled_primary():
+    model = ScriptedModel(5.0, 0.01)
+    llm = client(model, timeout_interactive_s=2.0, max_retries=0, hedge_min_delay_s=0.05)
+
+    start = time.monotonic()
+    assert llm.invoke(PROMPT, priority="interactive") == "answer 1"
+    assert time.monotonic() - start < 1.0
+    assert llm.metrics()["hedged"] == 1 and llm.metrics()["hedge_wins"] == 1
+
+def test_stalled_call_gets_the_deadline_and_frees_its_slot():
+    model = ScriptedModel(30.0)
+    llm = client(model, timeout_batch_s=0.3, max_retries=0, breaker_failures=100)
+
+    start = time.monotonic()
+    with pytest.raises(llm_client.LLMTimeoutError):
+        llm.invoke(PROMPT, priority="batch")
+    assert time.monotonic() - start < 1.0
+
+    assert 0 < model.timeouts[0] <= 0.3  # The provider request itself is bounded by the deadline
+    assert llm_scheduler.scheduler_metrics()["in_flight"] == 0
+    time.sleep(0.1)
+    assert model.finished == 1  # The worker thread is free again, not stuck for 30s
+
+def test_queue_timeout_during_half_open_probe_allows_another_probe():
+    stub = StubChatModel(latency="fixed", latency_ms=1, failure_rate=1.0)
+    llm = client(stub, max_retries=0, breaker_failures=1, breaker_reset_s=0.05, hedge_interactive=False)
+    with pytest.raises(llm_client.LLMError):
+        llm.invoke(PROMPT)
+    assert llm.breaker.state == "open"
+    time.sleep(0.1)
+
+    # The probe never gets a scheduler slot
+    scheduler = llm_scheduler.get_scheduler()
+    held = [scheduler.acquire("interactive") for _ in range(scheduler.max_concurrency)]
+    try:
+        with pytest.raises(llm_client.LLMQueueTimeoutError):
+            llm.invoke(PROMPT, timeout=0.05)
+    finally:
+        for waiter in held:
+            scheduler.release(waiter)
+    assert llm.breaker.state == "half_open"
+
+    stub.failure_rate = 0.0
+    for _ in range(3):
+        llm.invoke(PROMPT)
+    assert llm.breaker.state == "closed"
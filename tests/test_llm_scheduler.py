@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+
+from Backend.LLM_Model.llm_scheduler import LLMScheduler, QueueTimeoutError, TokenBucket
+
+
+def wait_for_queue(scheduler, depth: int):
+    for _ in range(200):
+        metrics = scheduler.metrics()
+        if metrics["interactive"]["queue_depth"] + metrics["batch"]["queue_depth"] == depth:
+            return
+        time.sleep(0.005)
+    raise AssertionError("waiters never queued")
+
+
+def test_interactive_goes_before_queued_batch():
+    scheduler = LLMScheduler(max_concurrency=1, interactive_reserved=0, requests_per_min=0, tokens_per_min=0)
+    holder = scheduler.acquire("batch")
+    order = []
+
+    def call(priority):
+        waiter = scheduler.acquire(priority)
+        order.append(priority)
+        scheduler.release(waiter)
+
+    threads = [threading.Thread(target=call, args=("batch",)), threading.Thread(target=call, args=("interactive",))]
+    threads[0].start()
+    wait_for_queue(scheduler, 1)
+    threads[1].start()
+    wait_for_queue(scheduler, 2)
+
+    scheduler.release(holder)
+    for thread in threads:
+        thread.join(1)
+    assert order == ["interactive", "batch"]
+
+def test_reserved_slots_stay_free_for_interactive():
+    scheduler = LLMScheduler(max_concurrency=2, interactive_reserved=1, requests_per_min=0, tokens_per_min=0)
+    scheduler.acquire("batch")
+
+    with pytest.raises(QueueTimeoutError):
+        scheduler.acquire("batch", deadline=time.monotonic() + 0.05)
+    scheduler.acquire("interactive", deadline=time.monotonic() + 0.05)
+    assert scheduler.metrics()["batch"]["timed_out"] == 1
+
+def test_release_is_idempotent():
+    scheduler = LLMScheduler(max_concurrency=2, requests_per_min=0, tokens_per_min=0)
+    waiter = scheduler.acquire("interactive")
+    scheduler.release(waiter)
+    scheduler.release(waiter)
+    assert scheduler.in_flight == 0
+
+def test_rate_limits():
+    assert TokenBucket(0).wait_time(1_000_000, time.monotonic()) == 0.0  # 0 = no limit
+
+    bucket = TokenBucket(60)  # One per second
+    now = time.monotonic()
+    bucket.take(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0, abs=0.05)
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from Backend.LLM_Model.prescreen import PrescreenRules, prescreen_fleet
+
+
+def readings(values, status="normal", threshold_min=0.0, threshold_max=10.0):
+    start = datetime(2024, 1, 1)
+    return [
+        {"timestamp": str(start + timedelta(hours=6 * k)), "reading_type": "vibration", "location": "DE", "value": value,
+         "status": status, "threshold_min": threshold_min, "threshold_max": threshold_max}
+        for k, value in enumerate(values)
+    ]
+
+
+def test_decisions():
+    logs = {
+        "FLAT": readings([5.0, 5.1, 4.9, 5.0, 5.05, 4.95]),
+        "BREACHING": readings([5.0, 11.0, 12.0, 5.0, 11.5, 12.5]),
+        "CRITICAL": readings([5.0] * 6, status="critical"),
+        "CLIMBING": readings([5.0, 5.5, 6.0, 6.5, 7.0, 7.5]),
+        "EMPTY": [],
+        "FETCH_FAILED": {"error": "timeout"},
+    }
+    results = prescreen_fleet(logs, PrescreenRules())
+
+    assert results["FLAT"].verdict == "healthy" and not results["FLAT"].needs_llm
+    assert results["BREACHING"].verdict == "at_risk" and results["BREACHING"].breach_ratio > 0.5
+    assert results["CRITICAL"].verdict == "at_risk" and results["CRITICAL"].critical_latest
+    assert results["CLIMBING"].needs_llm and results["CLIMBING"].days_to_threshold < 30
+    assert results["EMPTY"].verdict == "no_data"
+    assert results["FETCH_FAILED"].verdict == "no_data"
+
+def test_only_the_recent_window_is_screened():
+    old_breaches = readings([12.0, 12.0, 5.0, 5.0, 5.0, 5.0])
+    for row, days in zip(old_breaches, [0, 1, 20, 20.1, 20.2, 20.3]):
+        row["timestamp"] = str(datetime(2024, 1, 1) + timedelta(days=days))
+
+    assert prescreen_fleet({"SN-1": old_breaches}, PrescreenRules(window_days=7))["SN-1"].verdict == "healthy"
+    assert prescreen_fleet({"SN-1": old_breaches}, PrescreenRules(window_days=30))["SN-1"].needs_llm
+
+def test_healthy_reason_reports_tolerated_breaches():
+    logs = {"CLEAN": readings([5.0] * 10), "ONE_BREACH": readings([5.0] * 4 + [11.0] + [5.0] * 5)}
+    results = prescreen_fleet(logs, PrescreenRules(max_breach_ratio=0.2))
+
+    assert results["ONE_BREACH"].verdict == "healthy"
+    assert "at most 10% of readings breached" in results["ONE_BREACH"].reason
+    assert "no breaches" in results["CLEAN"].reason
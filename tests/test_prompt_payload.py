@@ -0,0 +1,36 @@
+import re
+
+import pytest
+
+from Backend.LLM_Model.prompt_payload import ReportBuilder, estimate_tokens, fit_lines
+
+
+LINES = [f"vibration@DE sensor {i}: mean 2.{i} max 4.{i} mm/s" for i in range(40)]
+
+def cost(lines) -> int:
+    return sum(estimate_tokens(line) + 1 for line in lines)
+
+
+def test_everything_fits_without_a_note():
+    assert fit_lines(LINES, cost(LINES)) == LINES
+
+@pytest.mark.parametrize("budget", [12, 13, 20, 50, 100, 200, cost(LINES) - 1])
+def test_note_counts_against_the_budget(budget):
+    kept = fit_lines(LINES, budget, "series")
+
+    assert cost(kept) <= budget
+    omitted = int(re.fullmatch(r"\.\.\. (\d+) more series omitted", kept[-1]).group(1))
+    assert kept[:-1] == LINES[:len(kept) - 1]
+    assert len(kept) - 1 + omitted == len(LINES)
+
+def test_budget_below_the_note_still_reports_the_omission():
+    assert fit_lines(LINES, 0) == [f"... {len(LINES)} more lines omitted"]
+
+@pytest.mark.parametrize("budget", [0, 12, 20, 50, 100, cost(LINES) - 1])
+def test_report_builder_note_counts_against_the_budget(budget):
+    report = ReportBuilder(budget)
+    kept = report.add_blocks(iter(LINES), len(LINES))
+
+    assert report.used <= max(budget, estimate_tokens(f"... {len(LINES)} more equipments omitted") + 1)
+    assert report.blocks == LINES[:kept]
+    assert report.getvalue().endswith(f"... {len(LINES) - kept} more equipments omitted")
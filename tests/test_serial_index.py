@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+import pytest
+
+from Backend.LLM_Model import intent_engine, serial_index
+from Backend.LLM_Model.serial_index import SerialIndex
+
+
+@pytest.fixture
+def index():
+    return SerialIndex.from_rows([
+        SimpleNamespace(serial="SN-0007", name="Cooling Pump", model="CP-200"),
+        SimpleNamespace(serial="AC2022-34567", name="Screw Compressor", model="GA-37"),
+        SimpleNamespace(serial="KR2022-87412", name="Screw Compressor", model="GA-55"),
+    ])
+
+
+@pytest.mark.parametrize("message, serial", [
+    ("Has SN-0007 had any repair", "SN-0007"),
+    ("status of sn 0007", "SN-0007"),
+    ("monitoring for ac2022-34567", "AC2022-34567"),
+    ("monitoring for AC2022-3456", "AC2022-34567"),    # prefix
+    ("monitoring for AC2O22-34567", "AC2022-34567"),   # typo
+    ("how is the cooling pump", "SN-0007"),            # equipment name
+])
+def test_best_mention(index, message, serial):
+    assert index.best(message) == serial
+
+def test_ambiguous_and_unknown_mentions_resolve_to_nothing(index):
+    assert index.best("how is the screw compressor") is None  # Two equipments share the name
+    assert index.best("any status update on the snow") is None
+    assert index.best("what about XYZ-9999") is None
+
+def test_resolve_serial_falls_back_to_the_regex_candidate(monkeypatch):
+    monkeypatch.setattr(serial_index, "get_index", lambda: None)
+    assert serial_index.resolve_serial("Has SN-0007 had any repair", "SN-0007") == "SN-0007"
+
+def test_chat_resolution_against_the_database(seed):
+    seed("SN-0007", [1.0])
+    serial_index.invalidate()
+
+    result = intent_engine.classify("Has sn0007 had any repair", serial_resolver=serial_index.resolve_serial)
+    assert (result["intent"], result["serial_number"]) == ("maintenance_query", "SN-0007")
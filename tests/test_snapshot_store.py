@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pytest
+
+from Backend.LLM_Model import fleet_report, snapshot_store
+
+
+def reading(value, timestamp, reading_type="vibration", status="normal"):
+    return {
+        "id": 0, "equipment_serial": "SN-1", "timestamp": timestamp, "status": status, "reading_type": reading_type,
+        "value": value, "unit": "mm/s", "location": "DE", "threshold_min": 0.0, "threshold_max": 4.5
+    }
+
+@pytest.fixture
+def snapshot(seed):
+    seed("SN-1", [2.0, 2.1, 2.2])  # Hourly from 2024-01-01 00:00
+    return snapshot_store.render(fleet_report.load_fleet_status(serial="SN-1")[0])
+
+
+def test_newer_breach_replaces_the_latest_reading(snapshot):
+    updated = snapshot_store.apply_reading(snapshot, reading(9.9, datetime(2024, 1, 2)))
+
+    assert [r["value"] for r in updated["readings"]] == [9.9]
+    assert updated["attention"] is True
+    assert updated["monitoring"]["readings"] == 4
+    assert updated["monitoring"]["breaches"] == 1
+    assert updated["monitoring"]["last_breach_at"] == datetime(2024, 1, 2)
+    assert "9.9" in updated["monitoring_text"]
+    # Snapshots are never mutated, readers may still hold the old one
+    assert snapshot["readings"][0]["value"] == 2.2 and snapshot["monitoring"]["readings"] == 3
+
+def test_late_older_reading_only_changes_counts(snapshot):
+    updated = snapshot_store.apply_reading(snapshot, reading(9.9, datetime(2023, 12, 31)))
+
+    assert updated["readings"] == snapshot["readings"]
+    assert updated["monitoring"]["readings"] == 4
+    assert updated["monitoring"]["last_reading_at"] == snapshot["monitoring"]["last_reading_at"]
+    assert updated["attention"] is False
+
+def test_new_series_is_added_in_order(snapshot):
+    updated = snapshot_store.apply_reading(snapshot, reading(60.0, datetime(2024, 1, 2), reading_type="temperature"))
+
+    assert [r["reading_type"] for r in updated["readings"]] == ["temperature", "vibration"]
+
+def test_applied_writes_match_a_fresh_load(db, seed):
+    seed("SN-1", [2.0, 2.1])
+    store = snapshot_store.store
+    store.rebuild()
+
+    db.insert_monitoring_data("SN-1", "vibration", 7.5, "mm/s", "DE", "warning", datetime(2024, 1, 5), 0.0, 4.5)
+    db.insert_monitoring_data("SN-1", "temperature", 40.0, "C", "DE", "normal", datetime(2024, 1, 5), 0.0, 90.0)
+
+    applied = store.get("SN-1")
+    fresh = fleet_report.load_fleet_status(serial="SN-1")[0]
+    for field in ("monitoring", "attention"):
+        assert applied[field] == fresh[field]
+    assert [(r["reading_type"], r["value"], r["breach"]) for r in applied["readings"]] == \
+        [(r["reading_type"], r["value"], r["breach"]) for r in fresh["readings"]]
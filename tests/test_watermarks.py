@@ -0,0 +1,58 @@
+import sqlalchemy as sql
+
+from Backend.LLM_Model import agents
+
+
+def fetched_state(eq, serial):
+    """State as fetch_monitoring_node leaves it: the rows the analysis read"""
+    monitoring = [{"id": row.id, "timestamp": str(row.timestamp)} for row in eq.list_equipment_monitoring_data(serial)]
+    maintenance = [{"id": row.id} for row in eq.list_equipment_maintenance_logs(serial)]
+    return {
+        "monitoring_logs": {serial: monitoring},
+        "maintenance_logs": {serial: maintenance},
+        "analyzed_serials": [serial],
+        "created_logs": [],
+    }
+
+def changed(eq):
+    return [row.serial for row in eq.list_changed_equipments()]
+
+
+def test_upsert_keeps_one_row_per_serial(db, seed):
+    seed("SN-1", [1.0])
+    db.upsert_analysis_watermarks({"SN-1": (1, None, 0, 0)})
+    db.upsert_analysis_watermarks({"SN-1": (7, None, 3, 2)})
+
+    rows = db.read_rows(sql.select(db.analysis_watermark_table))
+    assert [(r.equipment_serial, r.last_monitoring_id, r.last_maintenance_id, r.maintenance_log_count) for r in rows] == [("SN-1", 7, 3, 2)]
+
+def test_watermark_covers_own_logs(db, seed):
+    seed("SN-1", [1.0, 1.1])
+    db.insert_maintenance_log("Tech", "SN-1", "Bearing noise", "low", "2024-01-02", status="closed")
+    state = fetched_state(db, "SN-1")
+
+    own_id = db.insert_maintenance_log("AI System", "SN-1", "AI-detected issue", "medium", "2024-01-03")
+    state["created_logs"] = [{"equipment_serial": "SN-1", "log_created": True, "log_id": own_id}]
+    agents.update_watermarks_node(state)
+
+    assert changed(db) == []
+
+def test_log_written_during_analysis_stays_changed(db, seed):
+    seed("SN-1", [1.0, 1.1])
+    state = fetched_state(db, "SN-1")
+
+    db.insert_maintenance_log("Tech", "SN-1", "Written while the analysis ran", "low", "2024-01-03")
+    agents.update_watermarks_node(state)
+
+    assert changed(db) == ["SN-1"]
+
+def test_upsert_without_native_upsert(db, seed, monkeypatch):
+    seed("SN-1", [1.0])
+    seed("SN-2", [1.0])
+    db.upsert_analysis_watermarks({"SN-1": (1, None, 0, 0)})
+    monkeypatch.setattr(db.engine.dialect, "name", "generic")
+
+    db.upsert_analysis_watermarks({"SN-1": (7, None, 3, 2), "SN-2": (4, None, 0, 0)})
+
+    rows = db.read_rows(sql.select(db.analysis_watermark_table).order_by(db.analysis_watermark_table.c.equipment_serial))
+    assert [(r.equipment_serial, r.last_monitoring_id) for r in rows] == [("SN-1", 7), ("SN-2", 4)]